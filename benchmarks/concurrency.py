@@ -0,0 +1,216 @@
+"""
+Load test the write path with many concurrent writers.
+
+Starts a throwaway PostgreSQL server with testing.postgresql and runs a pool of writer processes against it.
+Every writer repeatedly loads an account, changes it and saves it with a new activity, each save in its own
+transaction. With probability ``--contention`` a save targets one of a small set of hot accounts shared by
+all writers; otherwise it targets one of the writer's own accounts, which nobody else touches.
+
+Saves that fail because another writer got there first (a clock or exclusion constraint violation) or because
+of a deadlock or serialization failure are retried from a fresh read, up to ``--max-retries`` times. While
+the writers run, pg_locks is sampled to see how often saves are waiting on each other's locks.
+
+Usage::
+
+    python -m benchmarks.concurrency --workers 8 --operations 200 --contention 0.1
+    python -m benchmarks.concurrency --workers 8 --contention 0.5 --select-for-update
+"""
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+
+import testing.postgresql
+
+
+DEADLOCK_DETECTED = '40P01'
+SERIALIZATION_FAILURE = '40001'
+
+
+def _setup_django(dsn: dict, installed_apps: list = ('benchmarks.load_app',)):
+    from django.conf import settings
+    settings.configure(
+        INSTALLED_APPS=list(installed_apps),
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': dsn['database'],
+            'USER': dsn['user'],
+            'HOST': dsn['host'],
+            'PORT': dsn['port'],
+        }},
+    )
+
+    import django
+    django.setup()
+
+
+def _create_schema():
+    from django.core.management import call_command
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def _create_accounts(count: int) -> list:
+    from benchmarks.load_app.models import Account, LoadActivity
+
+    ids = []
+    for i in range(count):
+        account = Account(title='Account %s' % i, balance=0)
+        account.save(activity=LoadActivity(description='Open account'))
+        ids.append(account.pk)
+    return ids
+
+
+def _save_once(account_id: int, select_for_update: bool):
+    from django.db import transaction
+
+    from benchmarks.load_app.models import Account, LoadActivity
+
+    with transaction.atomic():
+        accounts = Account.objects.all()
+        if select_for_update:
+            accounts = accounts.select_for_update()
+        account = accounts.get(pk=account_id)
+        account.balance += 1
+        account.title = 'Account %s at %s' % (account_id, account.balance)
+        account.save(activity=LoadActivity(description='Deposit'))
+
+
+def _run_writer(task: tuple) -> dict:
+    """Writer process: run the saves assigned to this writer and collect what happened"""
+    from django.db import IntegrityError, OperationalError, connection
+
+    seed, operations, hot_ids, own_ids, contention, max_retries, select_for_update = task
+    rng = random.Random(seed)
+    result = {'latencies': [], 'retries': 0, 'constraint_violations': 0, 'deadlocks': 0,
+              'serialization_failures': 0, 'failed': 0, 'started': time.time()}
+
+    for _ in range(operations):
+        account_id = rng.choice(hot_ids if rng.random() < contention else own_ids)
+        start = time.perf_counter()
+        for attempt in range(max_retries + 1):
+            try:
+                _save_once(account_id, select_for_update)
+            except IntegrityError:
+                result['constraint_violations'] += 1
+            except OperationalError as e:
+                pgcode = getattr(e.__cause__, 'pgcode', None)
+                if pgcode == DEADLOCK_DETECTED:
+                    result['deadlocks'] += 1
+                elif pgcode == SERIALIZATION_FAILURE:
+                    result['serialization_failures'] += 1
+                else:
+                    raise
+            else:
+                result['latencies'].append(time.perf_counter() - start)
+                break
+
+            if attempt == max_retries:
+                result['failed'] += 1
+            else:
+                result['retries'] += 1
+
+    result['finished'] = time.time()
+    connection.close()
+    return result
+
+
+def _sample_lock_waits(stop: threading.Event, samples: list, interval: float):
+    """Count the lock requests waiting to be granted until stopped"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        while not stop.is_set():
+            cursor.execute('SELECT count(*) FROM pg_locks WHERE NOT granted')
+            samples.append(cursor.fetchone()[0])
+            time.sleep(interval)
+    connection.close()
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _report(results: list, lock_samples: list):
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    elapsed = max(r['finished'] for r in results) - min(r['started'] for r in results)
+
+    def total(key):
+        return sum(result[key] for result in results)
+
+    print('saves:                  %d in %.2fs (%.1f/s)' % (
+        len(latencies), elapsed, len(latencies) / elapsed))
+    print('latency (ms):           p50 %.2f  p95 %.2f  p99 %.2f  max %.2f' % tuple(
+        _percentile(latencies, p) * 1000 for p in (50, 95, 99, 100)))
+    print('retries:                %d' % total('retries'))
+    print('constraint violations:  %d' % total('constraint_violations'))
+    print('deadlocks:              %d' % total('deadlocks'))
+    print('serialization failures: %d' % total('serialization_failures'))
+    print('failed after retries:   %d' % total('failed'))
+
+    waiting = [count for count in lock_samples if count]
+    print('lock waits:             waiting in %d of %d samples (%.1f%%), at most %d at once' % (
+        len(waiting), len(lock_samples), 100.0 * len(waiting) / max(len(lock_samples), 1),
+        max(lock_samples or [0])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8, help='number of writer processes')
+    parser.add_argument('--operations', type=int, default=200, help='saves per writer')
+    parser.add_argument('--contention', type=float, default=0.1,
+                        help='fraction of saves that target the shared hot accounts, from 0 to 1')
+    parser.add_argument('--hot-accounts', type=int, default=4,
+                        help='number of accounts shared by all writers')
+    parser.add_argument('--accounts-per-worker', type=int, default=50,
+                        help='number of accounts only saved by each writer')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--select-for-update', action='store_true',
+                        help='lock each account when loading it, serializing saves instead of retrying them')
+    parser.add_argument('--lock-sample-interval', type=float, default=0.005,
+                        help='seconds between samples of pg_locks')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    assert 0 <= args.contention <= 1, '--contention must be between 0 and 1'
+
+    with testing.postgresql.Postgresql() as postgresql:
+        dsn = postgresql.dsn()
+        _setup_django(dsn)
+        _create_schema()
+
+        hot_ids = _create_accounts(args.hot_accounts)
+        tasks = [
+            (args.seed + worker, args.operations, hot_ids, _create_accounts(args.accounts_per_worker),
+             args.contention, args.max_retries, args.select_for_update)
+            for worker in range(args.workers)
+        ]
+
+        from django.db import connection
+        connection.close()
+
+        # Fresh interpreters, so the writers don't share the parent's database connection
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(args.workers, initializer=_setup_django, initargs=(dsn,)) as pool:
+            stop = threading.Event()
+            lock_samples = []  # type: list
+            sampler = threading.Thread(target=_sample_lock_waits,
+                                       args=(stop, lock_samples, args.lock_sample_interval))
+            sampler.start()
+            try:
+                results = pool.map(_run_writer, tasks, chunksize=1)
+            finally:
+                stop.set()
+                sampler.join()
+
+    _report(results, lock_samples)
+
+
+if __name__ == '__main__':
+    main()
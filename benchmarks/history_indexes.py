@@ -0,0 +1,106 @@
+"""
+Compare the cost of the history index strategies available to add_clock.
+
+Starts a throwaway PostgreSQL server with testing.postgresql and writes the same history to models that only
+differ in their history indexes: the default exclusion constraints, the defaults plus a BRIN index on when
+each value took effect, and that BRIN index without the vclock exclusion constraint. For each it reports how
+long the saves took, the size of the history tables and their indexes, and how long it takes to scan the
+history for the changes in a recent time window.
+
+Usage::
+
+    python -m benchmarks.history_indexes --objects 1000 --updates 10
+"""
+import argparse
+import time
+
+import testing.postgresql
+
+from benchmarks.concurrency import _create_schema, _setup_django
+
+STRATEGIES = ['DefaultItem', 'BrinItem', 'LeanItem']
+
+
+def _write_history(model: type, objects: int, updates: int) -> float:
+    """Create objects and save each of them repeatedly, each save in its own transaction"""
+    start = time.perf_counter()
+    items = []
+    for i in range(objects):
+        item = model(title='Item %s' % i, num=0)
+        item.save()
+        items.append(item)
+    for update in range(1, updates + 1):
+        for item in items:
+            item.title = 'Item %s, version %s' % (item.pk, update)
+            item.num = update
+            item.save()
+    return time.perf_counter() - start
+
+
+def _history_sizes(model: type) -> tuple:
+    """The total size in bytes of the model's history tables, and of their indexes"""
+    from django.db import connection
+
+    table_size = index_size = 0
+    with connection.cursor() as cursor:
+        for history_model in model.temporal_options.history_models.values():
+            cursor.execute('VACUUM ANALYZE %s' % history_model._meta.db_table)
+            cursor.execute('SELECT pg_table_size(%s::regclass), pg_indexes_size(%s::regclass)',
+                           [history_model._meta.db_table] * 2)
+            table, indexes = cursor.fetchone()
+            table_size += table
+            index_size += indexes
+    return table_size, index_size
+
+
+def _time_window_scan(model: type, fraction: float, repeat: int) -> tuple:
+    """Time reading the history that took effect in the last ``fraction`` of the time it was written in"""
+    first, last = [
+        tick.timestamp for tick in (model.temporal_options.clock_model.objects.order_by(order).first()
+                                    for order in ('timestamp', '-timestamp'))
+    ]
+    since = last - (last - first) * fraction
+
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = sum(
+            history_model.objects.filter(effective__startswith__gte=since).count()
+            for history_model in model.temporal_options.history_models.values()
+        )
+    return (time.perf_counter() - start) / repeat, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--objects', type=int, default=1000, help='objects to create per strategy')
+    parser.add_argument('--updates', type=int, default=10, help='saves of every object after creating it')
+    parser.add_argument('--window', type=float, default=0.05,
+                        help='fraction of the history to scan, from the most recent changes back')
+    parser.add_argument('--repeat', type=int, default=20, help='times to repeat each time-window scan')
+    args = parser.parse_args()
+    assert 0 < args.window <= 1, '--window must be between 0 and 1'
+
+    with testing.postgresql.Postgresql() as postgresql:
+        _setup_django(postgresql.dsn(), ['benchmarks.index_app'])
+        _create_schema()
+
+        from django.apps import apps
+
+        print('%-12s %10s %12s %12s %14s %10s' % (
+            'strategy', 'saves/s', 'table (kB)', 'index (kB)', 'scan (ms)', 'rows'))
+        for name in STRATEGIES:
+            model = apps.get_model('index_app', name)
+            elapsed = _write_history(model, args.objects, args.updates)
+            table_size, index_size = _history_sizes(model)
+            scan_time, rows = _time_window_scan(model, args.window, args.repeat)
+            print('%-12s %10.1f %12d %12d %14.2f %10d' % (
+                name, args.objects * (args.updates + 1) / elapsed, table_size // 1024, index_size // 1024,
+                scan_time * 1000, rows))
+
+        from django.db import connection
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
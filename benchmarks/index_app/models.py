@@ -0,0 +1,27 @@
+"""
+Clocked models with different history index strategies, for the history index benchmark.
+"""
+from django.db import models
+
+from temporal_django import Clocked, add_clock
+
+
+@add_clock('title', 'num')
+class DefaultItem(Clocked):
+    """The default indexes: both exclusion constraints on every history table"""
+    title = models.TextField()
+    num = models.IntegerField()
+
+
+@add_clock('title', 'num', history_indexes={'title': ['brin'], 'num': ['brin']})
+class BrinItem(Clocked):
+    """The default indexes, plus a BRIN index on when each value took effect"""
+    title = models.TextField()
+    num = models.IntegerField()
+
+
+@add_clock('title', 'num', history_indexes={'title': ['brin'], 'num': ['brin']}, vclock_exclusion=False)
+class LeanItem(Clocked):
+    """A BRIN index on when each value took effect, without the vclock exclusion constraint"""
+    title = models.TextField()
+    num = models.IntegerField()
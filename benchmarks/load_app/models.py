@@ -0,0 +1,16 @@
+"""
+Clocked models for the concurrent-writer load test.
+"""
+from django.db import models
+
+from temporal_django import Clocked, add_clock
+
+
+class LoadActivity(models.Model):
+    description = models.TextField()
+
+
+@add_clock('title', 'balance', activity_model=LoadActivity)
+class Account(Clocked):
+    title = models.TextField()
+    balance = models.IntegerField()
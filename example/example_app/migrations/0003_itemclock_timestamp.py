@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import temporal_django.db_extensions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('example_app', '0002_itemclock_entity_tick'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemclock',
+            index=temporal_django.db_extensions.ExpressionIndex(fields=['"timestamp"'], name='example_app_item_clock_timestamp'),
+        ),
+    ]
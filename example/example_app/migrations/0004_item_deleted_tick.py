@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('example_app', '0003_itemclock_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='deleted_tick',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import temporal_django.db_extensions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('example_app', '0004_item_deleted_tick'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemhistory_effective_date',
+            index=temporal_django.db_extensions.ExpressionIndex(fields=['"entity_id", lower(vclock)'], name='example_app_item_history_effective_date_entity_vclock'),
+        ),
+        migrations.AddIndex(
+            model_name='itemhistory_number',
+            index=temporal_django.db_extensions.ExpressionIndex(fields=['"entity_id", lower(vclock)'], name='example_app_item_history_number_entity_vclock'),
+        ),
+        migrations.AddIndex(
+            model_name='itemhistory_title',
+            index=temporal_django.db_extensions.ExpressionIndex(fields=['"entity_id", lower(vclock)'], name='example_app_item_history_title_entity_vclock'),
+        ),
+    ]
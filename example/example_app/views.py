@@ -4,15 +4,17 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.generic.list import ListView
 
+from temporal_django.conditional import ClockConditionalMixin
+
 from .models import Item, ItemActivity
 from .forms import ItemForm
 
 
-class ItemDetailView(DetailView):
+class ItemDetailView(ClockConditionalMixin, DetailView):
     model = Item
 
 
-class ItemUpdateView(UpdateView):
+class ItemUpdateView(ClockConditionalMixin, UpdateView):
     model = Item
     form_class = ItemForm
 
@@ -35,7 +35,7 @@ setuptools.setup(
     author='Clover Health Engineering',
     author_email='engineering@cloverhealth.com',
     url='https://github.com/cloverhealth/temporal-django',
-    packages=['temporal_django'],
+    packages=setuptools.find_packages(include=['temporal_django', 'temporal_django.*']),
     license='BSD',
     platforms=['any'],
     keywords='django postgresql orm temporal',
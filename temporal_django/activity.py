@@ -0,0 +1,113 @@
+"""
+Queries across every clocked model that records an activity model.
+
+Activity models can be shared by several clocked models, so answering "what did this activity change" means
+reading the clock and history tables of all of them. activity_changes does this with a single UNION query.
+"""
+import collections
+import typing
+
+from django.db import connection, models
+
+from .registry import clocked_models
+
+
+ActivityChange = typing.NamedTuple('ActivityChange', [
+    ('model', type),
+    ('entity_id', typing.Any),
+    ('tick', int),
+    ('timestamp', typing.Any),
+    ('changed_fields', typing.Dict[str, typing.Any]),
+])
+
+
+def activity_changes(activity: models.Model) -> typing.List[ActivityChange]:
+    """
+    Returns every change recorded with an activity, across all clocked models
+
+    The clock tables are searched by their activity index, and the history rows written at each matching tick
+    are found with the GiST index on the history tables. All of it is done in one query. Deletions are
+    included as ticks that changed no fields.
+
+    Values are read as JSON, so they come back as the types JSON can represent, e.g. dates and times as ISO
+    8601 strings.
+
+    Args:
+        activity (models.Model): the activity to look up
+
+    Returns:
+        typing.List[ActivityChange]: one entry per tick recorded with the activity, in the order they were
+        recorded, with the new values of the fields changed in that tick
+    """
+    models_by_label = {model._meta.label_lower: model for model in clocked_models(type(activity))}
+    selects = []
+    params = []
+    for label, model in models_by_label.items():
+        # Every tick, including deletions, which write no history
+        selects.append(_tick_select_sql(model))
+        params.extend([label, activity.pk])
+        for field in model.temporal_options.temporal_fields:
+            selects.append(_change_select_sql(model, field))
+            params.extend([label, field, activity.pk])
+
+    if not selects:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT * FROM (%s) AS changes ORDER BY timestamp, model, entity_id, tick' % (
+                ' UNION ALL '.join(selects)),
+            params
+        )
+        rows = cursor.fetchall()
+
+    changes = collections.OrderedDict()  # type: typing.MutableMapping[tuple, ActivityChange]
+    for label, entity_id, tick, timestamp, field, value in rows:
+        key = (label, entity_id, tick)
+        if key not in changes:
+            model = models_by_label[label]
+            changes[key] = ActivityChange(model=model,
+                                          entity_id=model._meta.pk.to_python(entity_id),
+                                          tick=tick,
+                                          timestamp=timestamp,
+                                          changed_fields={})
+        if field is not None:
+            changes[key].changed_fields[field] = value
+
+    return list(changes.values())
+
+
+def _tick_select_sql(model: type) -> str:
+    """Select the ticks of an activity, with no field"""
+    return """
+        SELECT %s::text AS model, clock.entity_id::text AS entity_id, clock.tick, clock.timestamp,
+               NULL::text AS field, NULL::jsonb AS value
+        FROM {clock_table} AS clock
+        WHERE clock.activity_id = %s
+    """.format(clock_table=connection.ops.quote_name(model.temporal_options.clock_model._meta.db_table))
+
+
+def _change_select_sql(model: type, field: str) -> str:
+    """Select the history rows of a field written at the ticks of an activity"""
+    temporal_options = model.temporal_options
+    history_model = temporal_options.history_models[field]
+    quote_name = connection.ops.quote_name
+
+    entity_key = 'history.entity_id = clock.entity_id'
+    if isinstance(model._meta.pk, models.UUIDField):
+        # Match the expression the GiST index is built on
+        entity_key = 'history.entity_id::text = clock.entity_id::text'
+
+    return """
+        SELECT %s::text AS model, clock.entity_id::text AS entity_id, clock.tick, clock.timestamp,
+               %s::text AS field, to_jsonb(history.{column}) AS value
+        FROM {clock_table} AS clock
+        JOIN {history_table} AS history
+            ON {entity_key} AND history.vclock @> clock.tick AND lower(history.vclock) = clock.tick
+        WHERE clock.activity_id = %s
+    """.format(
+        column=quote_name(history_model._meta.get_field(field).column),
+        clock_table=quote_name(temporal_options.clock_model._meta.db_table),
+        history_table=quote_name(history_model._meta.db_table),
+        entity_key=entity_key,
+    )
@@ -0,0 +1,86 @@
+"""
+Running history reads from asyncio code.
+
+The Django ORM is synchronous, so the ``a``-prefixed read methods of ``Clocked`` run their queries on a
+bounded pool of threads instead of the event loop. Reads that need several independent queries, like a
+timeline's clock and field histories, run them at the same time on different threads, so they take about as
+long as the slowest of them rather than all of them together.
+
+Each thread keeps its own database connections open between reads, whatever ``CONN_MAX_AGE`` is, so a read
+doesn't pay for connecting. A connection that had errors is checked before the next read and replaced if it is
+no longer usable. The threads can't see writes the calling thread hasn't committed yet.
+
+Set ``TEMPORAL_ASYNC_READ_THREADS`` in your Django settings to change the number of threads, which defaults to
+4 and bounds the number of connections each process keeps open for reads. Set it to 0 to run the reads on the
+calling thread instead, blocking the event loop while they run. ``close_read_threads`` stops the threads and
+closes their connections, e.g. before forking.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import threading
+import typing
+
+from django.conf import settings
+from django.db import connections
+
+
+_executor = None  # type: typing.Optional[concurrent.futures.ThreadPoolExecutor]
+_executor_threads = 0
+_executor_lock = threading.Lock()
+
+
+def read_executor() -> typing.Optional[concurrent.futures.ThreadPoolExecutor]:
+    """The pool of threads history reads are run on, created when first used, or None if reads are inline"""
+    global _executor, _executor_threads
+    with _executor_lock:
+        if _executor is None:
+            _executor_threads = getattr(settings, 'TEMPORAL_ASYNC_READ_THREADS', 4)
+            if not _executor_threads:
+                return None
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=_executor_threads)
+        return _executor
+
+
+def close_read_threads():
+    """Stop the read threads once their reads finish, closing their connections"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        # None of these can finish until all have started, so every thread runs one of them
+        barrier = threading.Barrier(_executor_threads)
+        for _ in range(_executor_threads):
+            executor.submit(_close_connections, barrier)
+        executor.shutdown(wait=True)
+
+
+async def run_read(func: typing.Callable, *args, **kwargs) -> typing.Any:
+    """Run a function that reads from the database on the read threads, without blocking the event loop"""
+    executor = read_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+    loop = asyncio.get_event_loop()
+    call = functools.partial(_run_with_connection, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
+
+
+async def gather_reads(*funcs: typing.Callable) -> typing.List[typing.Any]:
+    """Run functions that read from the database on the read threads at the same time, returning results"""
+    return await asyncio.gather(*(run_read(func) for func in funcs))
+
+
+def _run_with_connection(func: typing.Callable, *args, **kwargs) -> typing.Any:
+    for connection in connections.all():
+        # Unlike close_old_connections, keep healthy connections open whatever their age
+        if connection.connection is not None and connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+    return func(*args, **kwargs)
+
+
+def _close_connections(barrier: threading.Barrier):
+    barrier.wait()
+    connections.close_all()
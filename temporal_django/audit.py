@@ -0,0 +1,122 @@
+"""
+A single, time-ordered stream of every change to every clocked model.
+
+audit_stream reads the ticks in a time window from an ordered server-side cursor per clock table, merges the
+cursors lazily by timestamp, and looks up the changed fields of each batch of merged ticks with one query per
+history table. Memory use depends on the batch size, not on the size of the window.
+"""
+import datetime
+import heapq
+import itertools
+import typing
+
+from django.db import connection, models
+
+from .batch import _values_list_sql
+from .registry import clocked_models
+
+
+AuditEntry = typing.NamedTuple('AuditEntry', [
+    ('model', type),
+    ('entity_id', typing.Any),
+    ('tick', int),
+    ('timestamp', datetime.datetime),
+    ('activity_id', typing.Any),
+    ('changed_fields', typing.Dict[str, typing.Any]),
+])
+
+
+def audit_stream(since: datetime.datetime,
+                 until: datetime.datetime,
+                 models: typing.Optional[typing.List[type]] = None,
+                 batch_size: int = 1000) -> typing.Iterator[AuditEntry]:
+    """
+    Stream every tick recorded between two times, across clocked models, in time order
+
+    Ticks with the same timestamp are ordered by model, entity and tick.
+
+    Args:
+        since (datetime.datetime): start of the window, inclusive
+        until (datetime.datetime): end of the window, exclusive
+        models (typing.Optional[typing.List[type]]): the clocked models to include, defaulting to all of them
+        batch_size (int): the number of ticks to look up changed fields for at a time
+
+    Returns:
+        typing.Iterator[AuditEntry]: one entry per tick, with the new values of the fields changed in it
+    """
+    if models is None:
+        models = clocked_models()
+
+    ticks = heapq.merge(*[_iter_clock(model, since, until) for model in models])
+    while True:
+        batch = list(itertools.islice(ticks, batch_size))
+        if not batch:
+            return
+
+        changed_fields = _load_changed_fields(batch)
+        for timestamp, label, entity_id, tick, activity_id, model in batch:
+            yield AuditEntry(model=model,
+                             entity_id=entity_id,
+                             tick=tick,
+                             timestamp=timestamp,
+                             activity_id=activity_id,
+                             changed_fields=changed_fields.get((model, entity_id, tick), {}))
+
+
+def _iter_clock(model: type, since: datetime.datetime, until: datetime.datetime) -> typing.Iterator[tuple]:
+    """Read the ticks of a model in a time window from a server-side cursor, as tuples in merge order"""
+    temporal_options = model.temporal_options
+    columns = ['timestamp', 'entity_id', 'tick']
+    if temporal_options.activity_model is not None:
+        columns.append('activity_id')
+
+    label = model._meta.label_lower
+    rows = temporal_options.clock_model.objects \
+        .filter(timestamp__gte=since, timestamp__lt=until) \
+        .order_by('timestamp', 'entity_id', 'tick') \
+        .values_list(*columns) \
+        .iterator()
+    for row in rows:
+        yield (row[0], label, row[1], row[2], row[3] if len(row) > 3 else None, model)
+
+
+def _load_changed_fields(batch: typing.List[tuple]) -> typing.Dict[tuple, typing.Dict[str, typing.Any]]:
+    """Look up the values written at a batch of ticks, with one query per history table"""
+    ticks_by_model = {}  # type: typing.Dict[type, typing.List[tuple]]
+    for _, _, entity_id, tick, _, model in batch:
+        ticks_by_model.setdefault(model, []).append((entity_id, tick))
+
+    changed_fields = {}  # type: typing.Dict[tuple, typing.Dict[str, typing.Any]]
+    for model, ticks in ticks_by_model.items():
+        for field, history_model in model.temporal_options.history_models.items():
+            for entity_id, tick, value in _history_values(model, history_model, field, ticks):
+                changed_fields.setdefault((model, entity_id, tick), {})[field] = value
+    return changed_fields
+
+
+def _history_values(model: type,
+                    history_model: models.Model,
+                    field: str,
+                    ticks: typing.List[tuple]) -> typing.List[tuple]:
+    """The rows of (entity_id, tick, value) of a history table written at the given ticks"""
+    quote_name = connection.ops.quote_name
+
+    entity_key = 'history.entity_id = v.entity_id'
+    if isinstance(model._meta.pk, models.UUIDField):
+        # Match the expression the GiST index is built on
+        entity_key = 'history.entity_id::text = v.entity_id::text'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """ SELECT history.entity_id, v.tick, history.{column}
+                FROM {table_name} AS history
+                JOIN (VALUES {values}) AS v (entity_id, tick)
+                    ON {entity_key} AND history.vclock @> v.tick
+                    AND lower(history.vclock) = v.tick
+            """.format(column=quote_name(history_model._meta.get_field(field).column),
+                       table_name=quote_name(history_model._meta.db_table),
+                       values=_values_list_sql(ticks),
+                       entity_key=entity_key),
+            [value for row in ticks for value in row]
+        )
+        return cursor.fetchall()
@@ -0,0 +1,223 @@
+"""
+Batching of clock and history writes.
+
+Implements the temporal_batch context manager, which applies one activity to every Clocked save made inside it
+and defers the clock and history writes of all of those saves to a handful of multi-row statements at exit.
+"""
+import collections
+import contextlib
+import threading
+import typing
+
+from django.db import connections, models, transaction
+from django.utils import timezone
+import psycopg2.extras as psql_extras
+
+from .outbox import TickEvent, publish_tick_events
+
+
+_local = threading.local()
+
+
+PendingTick = typing.NamedTuple('PendingTick', [
+    ('clocked', models.Model),
+    ('tick', int),
+    ('activity', typing.Optional[models.Model]),
+    ('changed_fields', typing.Dict[str, typing.Any]),
+])
+
+
+class TemporalBatch:
+    """Clock and history writes deferred until the end of a temporal_batch block"""
+
+    def __init__(self, activity: typing.Optional[models.Model] = None):
+        self.activity = activity
+        self._ticks = collections.OrderedDict()  # type: typing.MutableMapping[tuple, PendingTick]
+
+    def pending_tick(self, clocked: models.Model) -> typing.Optional[PendingTick]:
+        """Returns the tick already recorded for an object in this batch, if any"""
+        return self._ticks.get((type(clocked), clocked.pk))
+
+    def add(self, clocked: models.Model, tick: int, changed_fields: typing.Dict[str, typing.Any]):
+        """Defer writing a new tick for an object"""
+        self._ticks[(type(clocked), clocked.pk)] = PendingTick(
+            clocked=clocked,
+            tick=tick,
+            activity=clocked.activity,
+            changed_fields=dict(changed_fields),
+        )
+
+    def merge(self, clocked: models.Model, changed_fields: typing.Dict[str, typing.Any]):
+        """
+        Fold further changes to an object into the tick it already has in this batch
+
+        An activity can only be used once per object, so saving an object several times in a batch results in
+        a single tick with its final values.
+        """
+        self.pending_tick(clocked).changed_fields.update(changed_fields)
+
+    def flush(self):
+        """Write all deferred ticks using one multi-row statement per table"""
+        if not self._ticks:
+            return
+
+        timestamp = timezone.now()
+        ticks_by_table = collections.OrderedDict()  # type: typing.Dict[tuple, typing.List[PendingTick]]
+        for (model, _), pending in self._ticks.items():
+            using, _ = pending.clocked._temporal_databases()
+            ticks_by_table.setdefault((model, using), []).append(pending)
+
+        for (model, using), pending_ticks in ticks_by_table.items():
+            _write_ticks(model, pending_ticks, timestamp, using)
+
+        self._ticks.clear()
+
+
+def current_batch() -> typing.Optional[TemporalBatch]:
+    """Returns the innermost active temporal_batch, if any"""
+    batches = getattr(_local, 'batches', None)
+    return batches[-1] if batches else None
+
+
+@contextlib.contextmanager
+def temporal_batch(activity: typing.Optional[models.Model] = None):
+    """
+    Apply one activity to many saves and write their history in bulk
+
+    The activity is saved once and attached to every save of a Clocked model with an activity model inside the
+    block. Clock and history rows are written with multi-row statements when the block exits, all with the
+    same timestamp. Everything happens in a single transaction.
+
+    Saving the same object more than once inside the block results in a single tick. A nested block first
+    writes the ticks recorded so far by the enclosing one, so that its own ticks come after them.
+
+    Args:
+        activity (typing.Optional[models.Model]): activity to attach to every save in the block
+    """
+    with transaction.atomic():
+        if activity is not None and not activity.pk:
+            activity.save()
+
+        outer_batch = current_batch()
+        if outer_batch is not None:
+            outer_batch.flush()
+
+        batch = TemporalBatch(activity)
+        if not hasattr(_local, 'batches'):
+            _local.batches = []
+        _local.batches.append(batch)
+        try:
+            yield batch
+        finally:
+            _local.batches.pop()
+
+        batch.flush()
+
+
+def _write_ticks(model: type, pending_ticks: typing.List[PendingTick], timestamp, using: str):
+    temporal_options = model.temporal_options
+
+    clock_model = temporal_options.clock_model
+    clocks = [
+        clock_model(entity=pending.clocked, tick=pending.tick, timestamp=timestamp, activity=pending.activity)
+        if temporal_options.activity_model is not None else
+        clock_model(entity=pending.clocked, tick=pending.tick, timestamp=timestamp)
+        for pending in pending_ticks
+    ]
+    _insert_clocks(clocks, using)
+    for pending, clock in zip(pending_ticks, clocks):
+        pending.clocked._cache_tick(clock)
+
+    for field, history_model in temporal_options.history_models.items():
+        changed = [pending for pending in pending_ticks if field in pending.changed_fields]
+        if not changed:
+            continue
+
+        _close_open_ranges(history_model, [
+            (pending.clocked.pk, pending.tick, timestamp) for pending in changed if pending.tick > 1
+        ], using)
+        history_model.objects.using(using).bulk_create([
+            history_model(**{field: pending.changed_fields[field]},
+                          entity=pending.clocked,
+                          vclock=psql_extras.NumericRange(pending.tick, None),
+                          effective=psql_extras.DateTimeTZRange(timestamp, None))
+            for pending in changed
+        ])
+
+    publish_tick_events(model, [
+        TickEvent(
+            clocked=pending.clocked,
+            tick=pending.tick,
+            activity=pending.activity,
+            changed_fields=list(pending.changed_fields),
+        )
+        for pending in pending_ticks
+    ], timestamp, using)
+
+    _update_vclocks(model, [(pending.clocked.pk, pending.tick) for pending in pending_ticks], using)
+
+
+def _values_list_sql(rows: typing.List[tuple]) -> str:
+    return ', '.join(['(%s)' % ', '.join(['%s'] * len(rows[0]))] * len(rows))
+
+
+def _insert_clocks(clocks: typing.List[models.Model], using: str):
+    """
+    Insert many clock models in one statement
+
+    Unlike ``bulk_create``, this keeps the timestamp set on each clock instead of letting ``auto_now_add``
+    replace it, so that the clocks agree with the effective ranges of the history written with them.
+    """
+    if not clocks:
+        return
+
+    connection = connections[using]
+    fields = clocks[0]._meta.local_concrete_fields
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {table_name} ({columns}) VALUES {values}'.format(
+                table_name=connection.ops.quote_name(clocks[0]._meta.db_table),
+                columns=', '.join(connection.ops.quote_name(field.column) for field in fields),
+                values=_values_list_sql([fields] * len(clocks))),
+            [field.get_db_prep_save(getattr(clock, field.attname), connection)
+             for clock in clocks for field in fields]
+        )
+
+    for clock in clocks:
+        clock._state.adding = False
+        clock._state.db = using
+
+
+def _close_open_ranges(history_model: models.Model, rows: typing.List[tuple], using: str):
+    """Set the upper bounds of the open history ranges of many entities in one statement"""
+    if not rows:
+        return
+
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """ UPDATE {table_name} AS history
+                SET vclock = int4range(lower(history.vclock), v.tick),
+                    effective = tstzrange(lower(history.effective), v.timestamp)
+                FROM (VALUES {values}) AS v (entity_id, tick, timestamp)
+                WHERE history.entity_id = v.entity_id AND upper(history.vclock) IS NULL
+            """.format(table_name=connection.ops.quote_name(history_model._meta.db_table),
+                       values=_values_list_sql(rows)),
+            [value for row in rows for value in row]
+        )
+
+
+def _update_vclocks(model: type, rows: typing.List[tuple], using: str):
+    """Store the new vclock of many entities in one statement"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """ UPDATE {table_name} AS entity
+                SET vclock = v.vclock
+                FROM (VALUES {values}) AS v (id, vclock)
+                WHERE entity.{pk} = v.id
+            """.format(table_name=connection.ops.quote_name(model._meta.db_table),
+                       pk=connection.ops.quote_name(model._meta.pk.column),
+                       values=_values_list_sql(rows)),
+            [value for row in rows for value in row]
+        )
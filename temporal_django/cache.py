@@ -0,0 +1,91 @@
+"""
+Caching of reconstructed history.
+
+History is append-only: once a tick has been recorded, the values in effect at that tick never change, and a
+timeline up to a given vclock is always the same list of ticks. The HistoryCache exploits this to serve
+repeated reads of old versions without touching the database.
+"""
+import collections
+import threading
+import typing
+
+from django.core.cache import caches
+
+
+_MISSING = object()
+
+
+class HistoryCache:
+    """
+    LRU cache for timeline and point-in-time reads of clocked objects
+
+    Entries are keyed by model, primary key and the clock tick or timestamp they describe. Only reads that can
+    no longer change are stored, so entries never need to expire. Timelines are keyed by the vclock they were
+    read at and the previous one is evicted whenever a new tick is recorded.
+
+    Pass ``cache_alias`` to back the in-process LRU with one of the caches configured in Django's ``CACHES``
+    setting, so that history is shared between processes.
+    """
+
+    def __init__(self, max_entries: int = 1024, cache_alias: typing.Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self._entries = collections.OrderedDict()  # type: typing.MutableMapping[str, typing.Any]
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> typing.Any:
+        """Returns the cached value for a key, or None if it isn't cached"""
+        with self._lock:
+            value = self._entries.pop(key, _MISSING)
+            if value is not _MISSING:
+                self._entries[key] = value
+                return value
+
+        if self.cache_alias is not None:
+            value = caches[self.cache_alias].get(key, _MISSING)
+            if value is not _MISSING:
+                self._store_local(key, value)
+                return value
+
+        return None
+
+    def set(self, key: str, value: typing.Any):
+        """Cache a value indefinitely"""
+        self._store_local(key, value)
+        if self.cache_alias is not None:
+            caches[self.cache_alias].set(key, value, timeout=None)
+
+    def delete(self, key: str):
+        """Remove a value from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_alias is not None:
+            caches[self.cache_alias].delete(key)
+
+    def clear(self):
+        """Empty the in-process LRU"""
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, key: str, value: typing.Any):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def history_cache_key(kind: str, clocked, point: typing.Any) -> str:
+    """
+    Build the cache key for a history read of a clocked object
+
+    Args:
+        kind (str): the type of read, e.g. ``timeline`` or ``as_of``
+        clocked (Clocked): the object that history is being read for
+        point (typing.Any): the clock tick or timestamp the read describes
+
+    Returns:
+        str: a key that is safe to use with any of Django's cache backends
+    """
+    point_key = point.isoformat() if hasattr(point, 'isoformat') else str(point)
+    return 'temporal:%s:%s:%s:%s' % (clocked._meta.label_lower, clocked.pk, kind, point_key)
@@ -12,13 +12,23 @@ from django.contrib.postgres.fields.ranges import DateTimeRangeField, IntegerRan
 from django.db import models
 from django.db.models.signals import post_init
 
-from .db_extensions import GistExclusionConstraint
+from .db_extensions import BrinIndex, ExpressionIndex, GistExclusionConstraint, GistIndex, HashIndex
 
-from .models import (Clocked, EntityClock, FieldHistory)
+from .models import (Clocked, EntityClock, FieldHistory, TickOutbox)
 from .clocked_option import InternalClockedOption
-
-
-def add_clock(*fields, activity_model=None, temporal_schema='public'):
+from .registry import register_clocked_model
+
+
+def add_clock(*fields,
+              activity_model=None,
+              temporal_schema='public',
+              history_cache=None,
+              digest_fields=None,
+              outbox=False,
+              notify_channel=None,
+              history_indexes=None,
+              coalesce_saves=False,
+              vclock_exclusion=True):
     """
     This decorator adds a clock model and field history to a Django model.
 
@@ -28,16 +38,43 @@ def add_clock(*fields, activity_model=None, temporal_schema='public'):
         *fields (typing.List[str]): A list of field names for which to track history
         activity_model (models.Model): The model to associate with each clock tick
         temporal_schema (typing.Optional[str]): The schema into which to put your temporal tables
+        history_cache (typing.Optional[HistoryCache]): A cache to put in front of timeline and
+            point-in-time reads
+        digest_fields (typing.Optional[typing.Dict[str, int]]): Fields whose original values should only be
+            kept as a digest when they are larger than the given size, to bound memory use on large values
+        outbox (bool): Whether to write an event for every tick to an outbox table
+        notify_channel (typing.Optional[str]): A channel to pg_notify with every tick
+        history_indexes (typing.Optional[typing.Dict[str, typing.List[str]]]): Extra indexes on the values
+            in field history tables, by field. Each can be ``btree``, ``hash`` or ``gist``, which indexes the
+            value together with the effective range, or ``brin``, which indexes when each value took effect
+            for scanning the history in a time window.
+        coalesce_saves (bool): Whether to fold every save of an object after the first in a transaction into
+            the tick recorded by the first, instead of recording a tick per save
+        vclock_exclusion (bool): Whether to constrain the vclock ranges of an object's history not to
+            overlap. The unique ticks of the clock table already stop saves from writing overlapping ranges,
+            so this can be turned off to make history writes cheaper if nothing else writes history. The
+            tradeoff is that history written by other means, e.g. raw SQL, can then overlap in ticks without
+            an error, and finding the row that contains a tick, e.g. for ``temporal_as_of``, can no longer use
+            the constraint's GiST index. Reads of an object's history in tick order, e.g. for timelines, use
+            the btree index on ``(entity_id, lower(vclock))`` that every history table has either way.
     """
     def make_temporal(cls):
         assert issubclass(cls, Clocked), 'add temporal_django.Clocked to %s' % cls.__name__
 
-        model_fields = set([f.name for f in cls._meta.fields])
+        model_fields = {f.name: f for f in cls._meta.fields}
         for field in fields:
             assert field in model_fields, '%s is not a field on %s' % (field, cls.__name__)
-
-        history_models = {f: _build_field_history_model(cls, f, temporal_schema) for f in fields}
+        for field in list(digest_fields or {}) + list(history_indexes or {}):
+            assert field in fields, '%s is not a temporal field on %s' % (field, cls.__name__)
+
+        value_indexes = history_indexes or {}
+        history_models = {
+            f: _build_field_history_model(
+                cls, model_fields[f], temporal_schema, value_indexes.get(f, []), vclock_exclusion)
+            for f in fields
+        }
         clock_model = _build_entity_clock_model(cls, temporal_schema, activity_model)
+        outbox_model = _build_outbox_model(cls, temporal_schema, activity_model) if outbox else None
 
         cls.temporal_options = InternalClockedOption(
             cls,
@@ -45,10 +82,16 @@ def add_clock(*fields, activity_model=None, temporal_schema='public'):
             history_models=history_models,
             clock_model=clock_model,
             activity_model=activity_model,
+            history_cache=history_cache,
+            digest_fields=digest_fields,
+            outbox_model=outbox_model,
+            notify_channel=notify_channel,
+            coalesce_saves=coalesce_saves,
         )
 
         post_init.connect(_save_initial_state_post_init, sender=cls)
         _disable_bulk_create(cls)
+        register_clocked_model(cls)
 
         return cls
 
@@ -91,6 +134,12 @@ def _build_entity_clock_model(
             'ordering': ['tick'],  # Sort by tick so that first_tick and latest_tick work correctly
             'db_table': clock_table_name,
             'unique_together': unique_constraints,
+            'indexes': [
+                _build_clock_entity_index(clock_table_name, activity_model is not None),
+                # For reading the ticks of all entities in a time window, e.g. for audit_stream
+                ExpressionIndex(fields=['"timestamp"'],
+                                name=_truncate_identifier(clock_table_name + '_timestamp')),
+            ],
         }),
         __module__=cls.__module__
     )
@@ -101,18 +150,82 @@ def _build_entity_clock_model(
     return clock_model
 
 
-def _build_field_history_model(cls: typing.Type[Clocked], field: str, schema: str) -> FieldHistory:
+def _build_clock_entity_index(table_name: str, has_activity: bool) -> ExpressionIndex:
+    """
+    Build the index for reading an entity's ticks in order
+
+    The index leads with the entity so that first_tick, latest_tick and timelines are a range scan, and
+    carries the timestamp and activity so that they can be read without visiting the table.
+
+    Args:
+        table_name (str): the clock table
+        has_activity (bool): whether the clock table has an activity column
+
+    Returns:
+        ExpressionIndex: the index to add to the clock model
+    """
+    columns = ['entity_id', 'tick', 'timestamp'] + (['activity_id'] if has_activity else [])
+    return ExpressionIndex(
+        fields=[', '.join('"%s"' % column for column in columns)],
+        name=_truncate_identifier(table_name + '_entity_tick'),
+    )
+
+
+def _build_outbox_model(
+        cls: typing.Type[Clocked],
+        schema: str,
+        activity_model: models.Model = None) -> TickOutbox:
+    """
+    Build a Django model for the outbox of a given model
+
+    Args:
+        cls (typing.Type[Clocked]): class to refer back to
+        schema (str): schema to use for outbox table
+        activity_model (models.Model): model to use to record metadata for a tick
+
+    Returns:
+        TickOutbox: Outbox model for the given model
+    """
+    outbox_table_name = _truncate_identifier("%s_outbox" % cls._meta.db_table)
+    attrs = dict(
+        entity=models.ForeignKey(cls, related_name='+'),
+        activity=models.ForeignKey(activity_model, related_name='+') if activity_model else None,
+        Meta=type('Meta', (), {
+            'app_label': cls._meta.app_label,
+            # Events are consumed in the order their transactions started, see outbox.read_outbox
+            'ordering': ['txid', 'id'],
+            'db_table': outbox_table_name,
+            'indexes': [
+                ExpressionIndex(fields=['"txid", "id"'],
+                                name=_truncate_identifier(outbox_table_name + '_txid_id')),
+            ],
+        }),
+        __module__=cls.__module__
+    )
+
+    return type('%sOutbox' % cls.__name__, (TickOutbox,), attrs)
+
+
+def _build_field_history_model(
+        cls: typing.Type[Clocked],
+        model_field: models.Field,
+        schema: str,
+        value_indexes: typing.List[str] = (),
+        vclock_exclusion: bool = True) -> FieldHistory:
     """
     Build a Django model for the temporal history of a given field
 
     Args:
         cls (typing.Type[Clocked]): class to refer back to
-        field (str): field for which to to build a history class
+        model_field (models.Field): field for which to to build a history class
         schema (str): schema to use for history table
+        value_indexes (typing.List[str]): kinds of index to add on the field's values
+        vclock_exclusion (bool): whether to add the constraint that vclock ranges don't overlap
 
     Returns:
         FieldHistory: History model for the given field
     """
+    field = model_field.name
     class_name = "%s%s_%s" % (cls.__name__, 'History', field)
     table_name = _truncate_identifier('%s_%s_%s' % (cls._meta.db_table, 'history', field))
 
@@ -121,6 +234,23 @@ def _build_field_history_model(cls: typing.Type[Clocked], field: str, schema: st
         # Due to a limitation of postgres, UUIDs cannot be used in a GiST index
         gist_exclusion_key = '(entity_id::text)'
 
+    indexes = [
+        GistExclusionConstraint(
+            fields=['(%s) WITH =, effective WITH &&' % gist_exclusion_key],
+            name=_truncate_identifier(table_name + '_excl_effective'),
+        ),
+        # For reading an entity's history in tick order, e.g. for timeline pages. The exclusion constraints
+        # can't serve this for UUID primary keys, which they index as text.
+        ExpressionIndex(fields=['"entity_id", lower(vclock)'],
+                        name=_truncate_identifier(table_name + '_entity_vclock')),
+    ]
+    if vclock_exclusion:
+        indexes.append(GistExclusionConstraint(
+            fields=['(%s) WITH =, vclock WITH &&' % gist_exclusion_key],
+            name=_truncate_identifier(table_name + '_excl_vclock'),
+        ))
+    indexes.extend(_build_value_index(table_name, model_field.column, kind) for kind in value_indexes)
+
     attrs = dict(
         id=models.UUIDField(primary_key=True, default=uuid.uuid4),
         entity=models.ForeignKey(
@@ -132,26 +262,45 @@ def _build_field_history_model(cls: typing.Type[Clocked], field: str, schema: st
         Meta=type('Meta', (), {
             'app_label': cls._meta.app_label,
             'db_table': table_name,
-            'indexes': [
-                GistExclusionConstraint(
-                    fields=['(%s) WITH =, effective WITH &&' % gist_exclusion_key],
-                    name=_truncate_identifier(table_name + '_excl_effective'),
-                ),
-                GistExclusionConstraint(
-                    fields=['(%s) WITH =, vclock WITH &&' % gist_exclusion_key],
-                    name=_truncate_identifier(table_name + '_excl_vclock'),
-                )
-            ]
+            'indexes': indexes,
         }),
         __module__=cls.__module__,
     )
 
-    attrs[field] = next(f for f in cls._meta.fields if f.name == field)
+    attrs[field] = model_field
 
     model = type(class_name, (FieldHistory,), attrs)
     return model
 
 
+def _build_value_index(table_name: str, column: str, kind: str) -> ExpressionIndex:
+    """
+    Build an index on the values of a field history table
+
+    Args:
+        table_name (str): the field history table
+        column (str): the column holding the field's values
+        kind (str): ``btree`` or ``hash`` to index the values, ``gist`` to index them with the effective
+            range for "had this value during" queries, or ``brin`` to index the start of the effective range
+            for time-window scans. History rows are appended in time order, so a BRIN index is a tiny
+            fraction of the size of the others and barely slows down writes.
+
+    Returns:
+        ExpressionIndex: the index to add to the history model
+    """
+    index_types = {
+        'btree': (ExpressionIndex, '"%s"' % column, column),
+        'hash': (HashIndex, '"%s"' % column, column),
+        'gist': (GistIndex, '"%s", effective' % column, column),
+        'brin': (BrinIndex, 'lower(effective)', 'effective'),
+    }
+    assert kind in index_types, '%s is not a kind of history index' % kind
+
+    index_class, expression, indexed = index_types[kind]
+    index_name = _truncate_identifier('%s_%s_%s' % (table_name, indexed, kind))
+    return index_class(fields=[expression], name=index_name)
+
+
 def _save_initial_state_post_init(sender: typing.Type[Clocked], instance: Clocked, **kwargs):
     """
     After initializing a Clocked object, record initial field values.
@@ -162,9 +311,11 @@ def _save_initial_state_post_init(sender: typing.Type[Clocked], instance: Clocke
         sender (typing.Type[Clocked])
         instance (Clocked)
     """
-    fields = sender.temporal_options.temporal_fields
+    temporal_options = sender.temporal_options
+    instance._state._django_temporal_ticks = {}
     instance._state._django_temporal_previous = {
-        f: instance._meta.get_field(f).value_from_object(instance) for f in fields
+        f: temporal_options.snapshot_value(f, model_field.value_from_object(instance))
+        for f, model_field in temporal_options.temporal_model_fields
     }
 
 
@@ -178,8 +329,9 @@ def _disable_bulk_create(cls: typing.Type[Clocked]):
             'You cannot use bulk_create on temporal models. ' +
             'If you are SURE that you know what you\'re doing, you can use unsafe_bulk_create')
 
-    cls.objects.unsafe_bulk_create = cls.objects.bulk_create
-    cls.objects.bulk_create = disabled_bulk_create
+    for manager in (cls.objects, cls.all_objects):
+        manager.unsafe_bulk_create = manager.bulk_create
+        manager.bulk_create = disabled_bulk_create
 
 
 def _truncate_identifier(ident, max_len=63):
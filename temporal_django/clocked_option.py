@@ -2,14 +2,45 @@
 Implements the private ClockedOption API, which is ultimately responsible for handling
 writing history.
 """
+import datetime
+import functools
+import hashlib
+import json
 import typing
 
-from django.db import models, connection, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, connections, transaction
 from django.db.models.signals import pre_save, post_save, pre_delete
 from django.utils import timezone
 import psycopg2.extras as psql_extras
 
-from .models import (Clocked, EntityClock, FieldHistory, ClockedOption)
+from .batch import current_batch
+from .cache import HistoryCache, history_cache_key
+from .coalesce import CoalescibleTick, coalescible_tick, remember_tick
+from .models import (Clocked, EntityClock, FieldHistory, ClockedOption, TickOutbox)
+from .outbox import TickEvent, publish_tick_events, republish_tick_event
+from .statements import execute_prepared, insert_prepared
+
+
+ValueDigest = typing.NamedTuple('ValueDigest', [
+    ('size', int),
+    ('digest', str),
+])
+
+
+def _value_size_and_bytes(value: typing.Any) -> typing.Tuple[int, bytes]:
+    """The size of a value, in characters or bytes, and a stable binary representation to digest"""
+    if isinstance(value, str):
+        return len(value), value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value), bytes(value)
+    serialized = json.dumps(value, sort_keys=True, cls=DjangoJSONEncoder)
+    return len(serialized), serialized.encode('utf-8')
+
+
+def _digest_value(value: typing.Any) -> ValueDigest:
+    size, value_bytes = _value_size_and_bytes(value)
+    return ValueDigest(size=size, digest=hashlib.sha256(value_bytes).hexdigest())
 
 
 class InternalClockedOption(ClockedOption):
@@ -18,11 +49,23 @@ class InternalClockedOption(ClockedOption):
                  history_models: typing.Dict[str, FieldHistory],
                  temporal_fields: typing.List[str],
                  clock_model: EntityClock,
-                 activity_model: typing.Optional[models.Model] = None):
+                 activity_model: typing.Optional[models.Model] = None,
+                 history_cache: typing.Optional[HistoryCache] = None,
+                 digest_fields: typing.Optional[typing.Dict[str, int]] = None,
+                 outbox_model: typing.Optional[TickOutbox] = None,
+                 notify_channel: typing.Optional[str] = None,
+                 coalesce_saves: bool = False):
         self.history_models = history_models
         self.temporal_fields = temporal_fields
         self.clock_model = clock_model
         self.activity_model = activity_model
+        self.history_cache = history_cache
+        self.digest_fields = digest_fields or {}
+        self.outbox_model = outbox_model
+        self.notify_channel = notify_channel
+        self.coalesce_saves = coalesce_saves
+        # Looked up once here rather than on every post_init, which runs for each instance loaded
+        self.temporal_model_fields = [(f, target_class._meta.get_field(f)) for f in temporal_fields]
 
         pre_save.connect(receiver=self.pre_save_receiver, sender=target_class)
         post_save.connect(receiver=self.post_save_receiver, sender=target_class)
@@ -42,9 +85,34 @@ class InternalClockedOption(ClockedOption):
 
     def pre_delete_receiver(self, sender, **kwargs):
         """receiver for pre_delete signal on a Clocked subclass"""
-        raise ValueError("You cannot delete temporal objects. Consider an is_deleted boolean.")
+        raise ValueError('You cannot delete temporal objects from the database. Call delete() on the object, '
+                         'or on a queryset from its default manager, to soft delete it instead.')
+
+    def snapshot_value(self, field: str, value: typing.Any) -> typing.Any:
+        """
+        The representation of a field's value to keep for detecting changes at save time
+
+        Values of digest fields that are larger than the configured size are replaced with a fixed-size
+        digest, so that the memory kept per instance doesn't grow with the size of the field.
+        """
+        threshold = self.digest_fields.get(field)
+        if threshold is None or value is None:
+            return value
+
+        size, value_bytes = _value_size_and_bytes(value)
+        if size <= threshold:
+            return value
+        return ValueDigest(size=size, digest=hashlib.sha256(value_bytes).hexdigest())
+
+    def has_changed(self, field: str, new_val: typing.Any, snapshot: typing.Any) -> bool:
+        """Compare a field's current value against the snapshot taken by snapshot_value"""
+        if isinstance(snapshot, ValueDigest):
+            # Only digest the new value if it could possibly be the same size as the original
+            if new_val is None or (isinstance(new_val, str) and len(new_val) != snapshot.size):
+                return True
+            return _digest_value(new_val) != snapshot
+        return new_val != snapshot
 
-    @transaction.atomic
     def _record_history(self, clocked: Clocked):
         """
         Record all history for a given clocked object
@@ -52,82 +120,196 @@ class InternalClockedOption(ClockedOption):
         Args:
             clocked (Clocked): instance of clocked object
         """
+        with transaction.atomic(using=clocked._state.db):
+            self._check_activity(clocked)
 
-        #
-        # Check for activity misuse
-        #
-        if clocked.temporal_options.activity_model is not None and clocked.activity is None:
+            changed_fields = self._changed_fields(clocked)
+            if changed_fields:
+                self._record_tick(clocked, changed_fields)
+
+    def _record_tick(self, clocked: Clocked, changed_fields: typing.Dict[str, typing.Any]):
+        """
+        Record a new tick with the given changes, or fold them into the object's tick in the current batch
+
+        Args:
+            clocked (Clocked): instance of clocked object
+            changed_fields (typing.Dict[str, typing.Any]): new values of the fields changed in this tick
+        """
+        # History is written to the same database as the object, as Model.save would pick it
+        using, _ = clocked._temporal_databases()
+        batch = current_batch()
+        pending_tick = batch.pending_tick(clocked) if batch is not None else None
+        coalesced_tick = coalescible_tick(clocked, using) if self.coalesce_saves and batch is None else None
+        if pending_tick is not None:
+            # This object already has a tick in the batch, so fold these changes into it
+            clocked.vclock = pending_tick.tick
+            batch.merge(clocked, changed_fields)
+        elif coalesced_tick is not None:
+            # This object already has a tick in the current transaction, so fold these changes into it
+            self._amend_tick(clocked, coalesced_tick, changed_fields, using)
+        else:
+            #
+            # Increment the clock and write the next tick, or leave it to the batch
+            #
+            if self.history_cache is not None:
+                # The timeline cached for the current vclock is about to be superseded
+                self.history_cache.delete(history_cache_key('timeline', clocked, clocked.vclock))
+            clocked.vclock += 1
+
+            if batch is not None:
+                batch.add(clocked, clocked.vclock, changed_fields)
+            else:
+                self._write_tick(clocked, clocked.vclock, changed_fields, using)
+
+        # Update the stored state to detect future changes
+        clocked._state._django_temporal_previous.update({
+            field: self.snapshot_value(field, new_val) for field, new_val in changed_fields.items()
+        })
+
+        # Reset the activity so it can't be accidentally reused easily
+        clocked.activity = None
+
+    def _check_activity(self, clocked: Clocked):
+        """Check for activity misuse"""
+        if self.activity_model is not None and clocked.activity is None:
             raise ValueError('An activity is required when saving a %s' %
                              type(clocked).__name__)
-        if clocked.temporal_options.activity_model is None and clocked.activity is not None:
+        if self.activity_model is None and clocked.activity is not None:
             raise ValueError('There is no activity model for %s; you cannot supply an activity' %
                              type(clocked).__name__)
 
-        #
-        # Determine which fields have changed
-        #
+    def _changed_fields(self, clocked: Clocked) -> typing.Dict[str, typing.Any]:
+        """Determine which fields have changed, and their new values"""
         changed_fields = {}
-        for field, history_model in self.history_models.items():
-            new_val = clocked._meta.get_field(field).value_from_object(clocked)
+        for field, model_field in self.temporal_model_fields:
+            new_val = model_field.value_from_object(clocked)
             prev_val = clocked._state._django_temporal_previous[field]
-            if new_val != prev_val or clocked._state._django_temporal_add:
-                changed_fields[(field, history_model)] = new_val
+            if self.has_changed(field, new_val, prev_val) or clocked._state._django_temporal_add:
+                changed_fields[field] = new_val
+        return changed_fields
 
-        if not changed_fields:
-            return
+    def _write_tick(self,
+                    clocked: Clocked,
+                    new_tick: int,
+                    changed_fields: typing.Dict[str, typing.Any],
+                    using: str):
+        """
+        Write the clock and field history for a new tick
 
-        #
-        # Increment the clock and build the effective and vclock ranges for the next tick
-        #
+        Args:
+            clocked (Clocked): instance of clocked object
+            new_tick (int): the tick being recorded
+            changed_fields (typing.Dict[str, typing.Any]): new values of the fields changed in this tick
+            using (str): the database the object is written to
+        """
         timestamp = timezone.now()
-        clocked.vclock += 1
-        new_tick = clocked.vclock
 
         #
         # Create the EntityClock for this tick
         #
-        clock_model = type(clocked).temporal_options.clock_model
-        if clocked.temporal_options.activity_model is not None:
-            clock = clock_model(entity=clocked, activity=clocked.activity, tick=new_tick)
+        if self.activity_model is not None:
+            clock = self.clock_model(entity=clocked, activity=clocked.activity, tick=new_tick)
         else:
-            clock = clock_model(entity=clocked, tick=new_tick)
-        clock.save()
+            clock = self.clock_model(entity=clocked, tick=new_tick)
+        insert_prepared(clock)
+        clocked._cache_tick(clock)
 
         #
         # Create the field history for this tick
         #
-        for (field, history_model), new_val in changed_fields.items():
-            if new_tick > 1:
-                # This is an update, not a create, so update the upper bounds of the previous tick.
-                #
-                # This cannot be done with F expressions because of the range updates, unless we write our
-                # own implementations of int4range/tstzrange.
-                #
-                # Instead use .raw and force execution by wrapping with list(). This approach ensures that
-                # the update happens in the correct connection/transaction.
-                list(history_model.objects.raw(
-                    """ UPDATE {table_name}
-                        SET vclock = int4range(lower(vclock), %s),
-                            effective = tstzrange(lower(effective), %s)
-                        WHERE entity_id = %s AND upper(vclock) IS NULL
-                        RETURNING id;
-                    """.format(table_name=connection.ops.quote_name(history_model._meta.db_table)),
-                    [new_tick, timestamp, clocked.pk]
-                ))
-
-            hist = history_model(**{field: new_val},
-                                 entity=clocked,
-                                 vclock=psql_extras.NumericRange(new_tick, None),
-                                 effective=psql_extras.DateTimeTZRange(timestamp, None))
-            hist.save()
-
-            # Update the stored state for this field to detect future changes
-            clocked._state._django_temporal_previous[field] = new_val
+        for field, new_val in changed_fields.items():
+            self._write_field_history(clocked, field, new_val, new_tick, timestamp, using)
 
-        # Reset the activity so it can't be accidentally reused easily
-        clocked.activity = None
+        publish_tick_events(type(clocked), [TickEvent(
+            clocked=clocked,
+            tick=new_tick,
+            activity=clocked.activity,
+            changed_fields=list(changed_fields),
+        )], timestamp, using)
 
         # Update the vclock value without triggering a recursive `record_history`
-        type(clocked).objects \
+        type(clocked).objects.using(using) \
             .filter(**{clocked._meta.pk.name: getattr(clocked, clocked._meta.pk.name)}) \
             .update(vclock=new_tick)
+
+        if self.coalesce_saves:
+            remember_tick(clocked, clock, new_tick, timestamp, changed_fields, using)
+
+    def _amend_tick(self,
+                    clocked: Clocked,
+                    tick: CoalescibleTick,
+                    changed_fields: typing.Dict[str, typing.Any],
+                    using: str):
+        """
+        Fold further changes into a tick recorded earlier in the current transaction
+
+        Fields already changed in the tick have the value of their history row replaced, and the others get a
+        new history row starting at the tick. The tick keeps the activity and timestamp of the first save.
+
+        Args:
+            clocked (Clocked): instance of clocked object
+            tick (CoalescibleTick): the tick to fold the changes into
+            changed_fields (typing.Dict[str, typing.Any]): new values of the fields changed since the tick
+            using (str): the database the object is written to
+        """
+        connection = connections[using]
+        for field, new_val in changed_fields.items():
+            if field not in tick.changed_fields:
+                self._write_field_history(clocked, field, new_val, tick.tick, tick.timestamp, using)
+                tick.changed_fields.append(field)
+                continue
+
+            history_model = self.history_models[field]
+            history_field = history_model._meta.get_field(field)
+            execute_prepared(
+                """ UPDATE {table_name}
+                    SET {column} = %s
+                    WHERE entity_id = %s AND upper(vclock) IS NULL
+                """.format(table_name=connection.ops.quote_name(history_model._meta.db_table),
+                           column=connection.ops.quote_name(history_field.column)),
+                [history_field.get_db_prep_save(new_val, connection), clocked.pk],
+                using,
+            )
+
+        if self.history_cache is not None:
+            # Reads of the tick earlier in the transaction are cached when it commits, and are now stale
+            for kind in ('timeline', 'as_of'):
+                transaction.on_commit(functools.partial(
+                    self.history_cache.delete, history_cache_key(kind, clocked, tick.tick)), using=using)
+
+        republish_tick_event(type(clocked), TickEvent(
+            clocked=clocked,
+            tick=tick.tick,
+            activity=tick.activity,
+            changed_fields=list(tick.changed_fields),
+        ), using)
+
+    def _write_field_history(self,
+                             clocked: Clocked,
+                             field: str,
+                             new_val: typing.Any,
+                             tick: int,
+                             timestamp: datetime.datetime,
+                             using: str):
+        """Close the open history range of a field, if any, and write its new value starting at a tick"""
+        history_model = self.history_models[field]
+        if tick > 1:
+            # This is an update, not a create, so update the upper bounds of the previous tick.
+            #
+            # This cannot be done with F expressions because of the range updates, unless we write our
+            # own implementations of int4range/tstzrange.
+            execute_prepared(
+                """ UPDATE {table_name}
+                    SET vclock = int4range(lower(vclock), %s),
+                        effective = tstzrange(lower(effective), %s)
+                    WHERE entity_id = %s AND upper(vclock) IS NULL
+                """.format(table_name=connections[using].ops.quote_name(history_model._meta.db_table)),
+                [tick, timestamp, clocked.pk],
+                using,
+            )
+
+        hist = history_model(**{field: new_val},
+                             entity=clocked,
+                             vclock=psql_extras.NumericRange(tick, None),
+                             effective=psql_extras.DateTimeTZRange(timestamp, None))
+        insert_prepared(hist)
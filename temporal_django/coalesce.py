@@ -0,0 +1,78 @@
+"""
+Coalescing of repeated saves within a transaction.
+
+Clocked models created with ``add_clock(..., coalesce_saves=True)`` fold every save of an object after the
+first one in a transaction into the tick that first save recorded, instead of recording a new tick each time.
+This module keeps track of the ticks recorded in the current transaction that later saves can be folded into.
+
+Each tick is registered as an ``on_commit`` hook, which forgets the ticks once their transaction commits.
+Django gives no notice of rollbacks, so before a save is folded into a tick, the tick's clock row is checked
+to still exist on the database the object is written to; it doesn't if the transaction or the savepoint that
+recorded the tick was rolled back.
+"""
+import datetime
+import typing
+
+from django.db import connections, models, transaction
+
+
+class CoalescibleTick:
+    """A tick recorded in the current transaction, which later saves of the same object are folded into"""
+
+    def __init__(self,
+                 key: tuple,
+                 clock: models.Model,
+                 tick: int,
+                 timestamp: datetime.datetime,
+                 activity: typing.Optional[models.Model],
+                 changed_fields: typing.Iterable[str],
+                 using: str):
+        self.key = key
+        self.clock = clock
+        self.tick = tick
+        self.timestamp = timestamp
+        self.activity = activity
+        self.changed_fields = list(changed_fields)
+        self.using = using
+
+    def __call__(self):
+        """Called by Django when the transaction commits, after which no remembered tick can be changed"""
+        _transaction_ticks(self.using).clear()
+
+
+def coalescible_tick(clocked: models.Model, using: str) -> typing.Optional[CoalescibleTick]:
+    """The tick an object recorded earlier in the current transaction, if it is still its latest tick"""
+    tick = _transaction_ticks(using).get(_tick_key(clocked))
+    if tick is None or tick.tick != clocked.vclock:
+        return None
+    # Read from the database the tick was written to, as a replica can't see the uncommitted clock row
+    if not type(tick.clock)._base_manager.using(using).filter(pk=tick.clock.pk).exists():
+        # The tick was rolled back
+        del _transaction_ticks(using)[tick.key]
+        return None
+    return tick
+
+
+def remember_tick(clocked: models.Model,
+                  clock: models.Model,
+                  tick: int,
+                  timestamp: datetime.datetime,
+                  changed_fields: typing.Iterable[str],
+                  using: str):
+    """Remember a tick that has just been recorded, so later saves in the transaction can be folded into it"""
+    key = _tick_key(clocked)
+    coalescible = CoalescibleTick(key, clock, tick, timestamp, clocked.activity, changed_fields, using)
+    _transaction_ticks(using)[key] = coalescible
+    transaction.on_commit(coalescible, using=using)
+
+
+def _tick_key(clocked: models.Model) -> tuple:
+    return type(clocked), clocked.pk
+
+
+def _transaction_ticks(using: str) -> typing.Dict[tuple, CoalescibleTick]:
+    """The ticks recorded on a database since its last commit, by model and primary key"""
+    connection = connections[using]
+    if not hasattr(connection, '_temporal_coalescible_ticks'):
+        connection._temporal_coalescible_ticks = {}
+    return connection._temporal_coalescible_ticks
@@ -0,0 +1,164 @@
+"""
+Conditional requests for views of clocked objects.
+
+An object's ``vclock`` changes with every tick, so it makes a strong ETag, and the timestamp of its latest
+tick is its Last-Modified time. Both are read with one query that never touches the history tables, before
+the view runs. Saving fields that have no history records no tick, so for models with such fields the ETag
+also carries a digest of their values, computed by the same query, and there is no Last-Modified time.
+``If-None-Match`` and ``If-Modified-Since`` on GET and HEAD requests are then answered with 304
+Not Modified without rendering anything, and a stale ``If-Match`` or ``If-Unmodified-Since`` on any other
+request is answered with 412 Precondition Failed before the view can save anything.
+
+``ClockConditionalMixin`` adds this to a single object view, and ``ClockConditionalGetMiddleware`` adds it to
+every class-based view with a clocked ``model`` that looks its object up by primary key.
+"""
+import calendar
+import datetime
+import typing
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+from django.views.generic.detail import SingleObjectMixin
+
+from .models import Clocked
+
+
+ClockValidators = typing.NamedTuple('ClockValidators', [
+    ('etag', str),
+    ('last_modified', typing.Optional[datetime.datetime]),
+])
+
+
+def clock_validators(queryset: models.QuerySet, pk: typing.Any) -> typing.Optional[ClockValidators]:
+    """
+    Read the ETag and Last-Modified time of a clocked object with one query
+
+    Args:
+        queryset (models.QuerySet): the clocked objects the view can show
+        pk (typing.Any): the primary key of the object, e.g. from the URL
+
+    Returns:
+        typing.Optional[ClockValidators]: the validators, or None if the object isn't in the queryset
+    """
+    untracked_fields = _untracked_fields(queryset.model)
+    if untracked_fields:
+        # Saves of these fields don't tick, so only their values tell such saves apart, and they have no time
+        validator = models.Func(
+            models.Func(*untracked_fields, function='ROW', output_field=models.TextField()),
+            function='md5', template='%(function)s(%(expressions)s::text)', output_field=models.CharField())
+    else:
+        clock_model = queryset.model.temporal_options.clock_model
+        validator = models.Subquery(clock_model.objects
+                                    .filter(entity=models.OuterRef('pk'), tick=models.OuterRef('vclock'))
+                                    .values('timestamp'))
+    try:
+        row = queryset \
+            .filter(pk=pk) \
+            .annotate(temporal_validator=validator) \
+            .values_list('vclock', 'temporal_validator') \
+            .first()
+    except (ValueError, ValidationError):
+        # Not a valid primary key, so let the view respond as it would to any missing object
+        return None
+
+    if row is None:
+        return None
+    vclock, validator_value = row
+    if untracked_fields:
+        return ClockValidators(etag='"%s-%s-%s"' % (pk, vclock, validator_value), last_modified=None)
+    return ClockValidators(etag='"%s-%s"' % (pk, vclock), last_modified=validator_value)
+
+
+def _untracked_fields(model: type) -> typing.List[str]:
+    """The concrete fields of a clocked model that have no history"""
+    skipped_fields = {field.name for field in Clocked._meta.fields}
+    skipped_fields.update(model.temporal_options.temporal_fields)
+    return [field.name for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in skipped_fields]
+
+
+def conditional_response(request: HttpRequest, validators: ClockValidators) -> typing.Optional[HttpResponse]:
+    """The 304 or 412 response to a conditional request, or None if the view should handle it"""
+    return get_conditional_response(request, etag=validators.etag,
+                                    last_modified=_http_timestamp(validators.last_modified))
+
+
+def set_validator_headers(request: HttpRequest, response: HttpResponse, validators: ClockValidators):
+    """Add the ETag and Last-Modified headers to a successful response to a GET or HEAD request"""
+    if request.method not in ('GET', 'HEAD') or not 200 <= response.status_code < 300:
+        # Anything else may have changed the object, so the validators read before the view are stale
+        return
+    if not response.has_header('ETag'):
+        response['ETag'] = validators.etag
+    if validators.last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(_http_timestamp(validators.last_modified))
+
+
+def _http_timestamp(value: typing.Optional[datetime.datetime]) -> typing.Optional[int]:
+    if value is None:
+        return None
+    return calendar.timegm(value.utctimetuple())
+
+
+class ClockConditionalMixin:
+    """
+    Answer conditional requests to a single object view of a clocked model from the object's clock
+
+    Add it before the view class, e.g. ``class ItemDetailView(ClockConditionalMixin, DetailView)``. The object
+    is looked up in ``get_queryset()`` by the primary key in the URL; views that look objects up by slug are
+    left alone.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        validators = getattr(request, 'temporal_validators', None)
+        if validators is None and kwargs.get(self.pk_url_kwarg) is not None:
+            validators = clock_validators(self.get_queryset(), kwargs[self.pk_url_kwarg])
+            if validators is not None:
+                response = conditional_response(request, validators)
+                if response is not None:
+                    return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if validators is not None:
+            set_validator_headers(request, response, validators)
+        return response
+
+
+class ClockConditionalGetMiddleware(MiddlewareMixin):
+    """
+    Answer conditional requests to every single object view of a clocked model from the object's clock
+
+    Applies to class-based views whose ``model`` is clocked and whose URL has the object's primary key,
+    reading the object from the view's ``queryset`` or the model's default manager. Views that override
+    ``get_queryset`` are left alone, since the middleware can't know which objects they show; add
+    ``ClockConditionalMixin`` to them instead.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        model = getattr(view_class, 'model', None)
+        pk = view_kwargs.get(getattr(view_class, 'pk_url_kwarg', 'pk'))
+        if not (isinstance(model, type) and issubclass(model, Clocked)) or pk is None:
+            return None
+        if getattr(view_class, 'get_queryset', None) is not SingleObjectMixin.get_queryset:
+            return None
+
+        queryset = getattr(view_class, 'queryset', None)
+        if queryset is None:
+            queryset = model._default_manager.all()
+        validators = clock_validators(queryset, pk)
+        if validators is None:
+            return None
+
+        request.temporal_validators = validators
+        return conditional_response(request, validators)
+
+    def process_response(self, request, response):
+        validators = getattr(request, 'temporal_validators', None)
+        if validators is not None:
+            set_validator_headers(request, response, validators)
+        return response
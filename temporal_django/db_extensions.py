@@ -21,3 +21,46 @@ class GistExclusionConstraint(Index):
         drop_constraint_sql = 'ALTER TABLE %s DROP CONSTRAINT %s;'
         table_name = model._meta.db_table
         return drop_constraint_sql % (table_name, self.name)
+
+
+class ExpressionIndex(Index):
+    """
+    Generate an index over a raw SQL expression with a given access method
+
+    Like GistExclusionConstraint, the expression is passed as the only entry in ``fields``.
+    """
+
+    suffix = 'idx'
+    max_name_length = 63
+    method = 'btree'
+
+    def create_sql(self, model, schema_editor, using='', concurrently=False):
+        create_index_sql = 'CREATE INDEX %s%s ON %s USING %s (%s);'
+        table_name = model._meta.db_table
+        return create_index_sql % (
+            'CONCURRENTLY ' if concurrently else '', self.name, table_name, self.method, self.fields[0])
+
+    def remove_sql(self, model, schema_editor, concurrently=False):
+        drop_index_sql = 'DROP INDEX %s%s;'
+        return drop_index_sql % ('CONCURRENTLY IF EXISTS ' if concurrently else '', self.name)
+
+
+class HashIndex(ExpressionIndex):
+    """Generate a hash index, which is compact and fast for equality lookups"""
+
+    suffix = 'hash'
+    method = 'hash'
+
+
+class GistIndex(ExpressionIndex):
+    """Generate a GiST index, e.g. to combine a value with a range"""
+
+    suffix = 'gist'
+    method = 'gist'
+
+
+class BrinIndex(ExpressionIndex):
+    """Generate a BRIN index, which is tiny and cheap to maintain on columns that grow with insertion order"""
+
+    suffix = 'brin'
+    method = 'brin'
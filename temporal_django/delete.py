@@ -0,0 +1,123 @@
+"""
+Soft deletion of clocked objects.
+
+History refers to the objects it belongs to, so clocked objects are never removed from the database. Deleting
+one instead records a tombstone tick that closes the open history range of every tracked field, and stores
+that tick in the object's ``deleted_tick``, which hides it from the default manager. Implements the set-based
+deletion behind ``Clocked.delete`` and ``ClockedQuerySet.delete``.
+"""
+import itertools
+import typing
+
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.utils import timezone
+
+from .batch import _close_open_ranges, _insert_clocks, current_batch
+from .outbox import TickEvent, publish_tick_events
+
+
+def delete_queryset(queryset: models.QuerySet,
+                    activity: typing.Optional[models.Model] = None,
+                    chunk_size: int = 1000) -> int:
+    """
+    Soft delete every object in a queryset that isn't deleted yet
+
+    The objects are never loaded. Their primary keys and vclocks are read in chunks, and the tombstone ticks
+    of each chunk are written with one statement per clock and history table and one for the objects.
+
+    Args:
+        queryset (models.QuerySet): the objects to delete
+        activity (typing.Optional[models.Model]): activity to record the tombstone ticks with
+        chunk_size (int): the number of objects to delete at a time
+
+    Returns:
+        int: the number of objects that were deleted
+    """
+    assert queryset.query.can_filter(), "Cannot use 'limit' or 'offset' with delete."
+
+    deleted = 0
+    with transaction.atomic(using=queryset.db):
+        activity = _prepare_delete(queryset.model, activity)
+        rows = queryset.filter(deleted_tick__isnull=True) \
+            .order_by('pk') \
+            .select_for_update() \
+            .values_list('pk', 'vclock') \
+            .iterator()
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return deleted
+
+            _write_tombstones(queryset.model, chunk, activity, queryset.db)
+            deleted += len(chunk)
+
+
+def delete_entities(model: type,
+                    rows: typing.List[typing.Tuple[typing.Any, int]],
+                    activity: typing.Optional[models.Model] = None,
+                    using: str = DEFAULT_DB_ALIAS) -> typing.List[models.Model]:
+    """
+    Record tombstone ticks for many objects
+
+    Args:
+        model (type): the clocked model
+        rows (typing.List[typing.Tuple[typing.Any, int]]): the primary key and current vclock of each object
+        activity (typing.Optional[models.Model]): activity to record the tombstone ticks with, defaulting to
+            the activity of the current temporal_batch
+        using (str): the database the objects are written to
+
+    Returns:
+        typing.List[models.Model]: the clock models of the tombstone ticks, in the order of the rows
+    """
+    with transaction.atomic(using=using):
+        activity = _prepare_delete(model, activity)
+        return _write_tombstones(model, rows, activity, using)
+
+
+def _prepare_delete(model: type, activity: typing.Optional[models.Model]) -> typing.Optional[models.Model]:
+    """Check and save the activity to delete with, and write the ticks of the current batch before deleting"""
+    temporal_options = model.temporal_options
+    batch = current_batch()
+    if activity is None and batch is not None and temporal_options.activity_model is not None:
+        activity = batch.activity
+    if temporal_options.activity_model is not None and activity is None:
+        raise ValueError('An activity is required when deleting a %s' % model.__name__)
+    if temporal_options.activity_model is None and activity is not None:
+        raise ValueError('There is no activity model for %s; you cannot supply an activity' % model.__name__)
+
+    if batch is not None:
+        # Write the ticks recorded so far in the batch, so that the tombstones come after them
+        batch.flush()
+    if activity is not None and not activity.pk:
+        activity.save()
+    return activity
+
+
+def _write_tombstones(model: type,
+                      rows: typing.List[typing.Tuple[typing.Any, int]],
+                      activity: typing.Optional[models.Model],
+                      using: str) -> typing.List[models.Model]:
+    """Write the tombstone ticks of many objects with one statement per table"""
+    temporal_options = model.temporal_options
+    timestamp = timezone.now()
+    tombstones = [(pk, vclock + 1) for pk, vclock in rows]
+
+    clock_model = temporal_options.clock_model
+    extra = {'activity': activity} if temporal_options.activity_model is not None else {}
+    clocks = [clock_model(entity_id=pk, tick=tick, timestamp=timestamp, **extra) for pk, tick in tombstones]
+    _insert_clocks(clocks, using)
+
+    for history_model in temporal_options.history_models.values():
+        _close_open_ranges(history_model, [(pk, tick, timestamp) for pk, tick in tombstones], using)
+
+    if temporal_options.outbox_model is not None or temporal_options.notify_channel:
+        publish_tick_events(model, [
+            TickEvent(clocked=model(pk=pk), tick=tick, activity=activity, changed_fields=[])
+            for pk, tick in tombstones
+        ], timestamp, using)
+
+    model._base_manager.using(using) \
+        .filter(pk__in=[pk for pk, _ in rows]) \
+        .update(vclock=models.F('vclock') + 1, deleted_tick=models.F('vclock') + 1)
+
+    return clocks
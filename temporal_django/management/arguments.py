@@ -0,0 +1,35 @@
+"""
+Parsing of the arguments shared by the management commands.
+"""
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def datetime_argument(value: str) -> datetime.datetime:
+    """Parse an ISO 8601 date or datetime, made aware in the current time zone if time zones are enabled"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is not None:
+            parsed = datetime.datetime.combine(date, datetime.time())
+    if parsed is None:
+        raise CommandError('%r is not a valid ISO 8601 date or datetime' % value)
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def clocked_model_argument(label: str) -> type:
+    """Look up a clocked model by its ``app_label.ModelName`` label"""
+    try:
+        model = apps.get_model(label)
+    except (LookupError, ValueError):
+        raise CommandError('Unknown model %r' % label)
+    if not hasattr(model, 'temporal_options'):
+        raise CommandError('%r is not a clocked model' % label)
+    return model
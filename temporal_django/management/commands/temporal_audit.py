@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from temporal_django.audit import audit_stream
+from temporal_django.management.arguments import clocked_model_argument, datetime_argument
+
+
+class Command(BaseCommand):
+    """
+    Streams the changes to clocked models in a time window
+
+    temporal_django isn't a Django app, so expose this command from one of your own apps by importing it in
+    that app's ``management/commands/temporal_audit.py``.
+    """
+    help = 'Write every change to clocked models in a time window as JSON lines, in time order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', required=True, help='start of the window (ISO 8601), inclusive')
+        parser.add_argument('--until', required=True, help='end of the window (ISO 8601), exclusive')
+        parser.add_argument('--model', action='append', dest='models', metavar='APP_LABEL.MODEL',
+                            help='only include this clocked model; may be given more than once')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of changes to look up changed fields for at a time')
+
+    def handle(self, *args, **options):
+        since = datetime_argument(options['since'])
+        until = datetime_argument(options['until'])
+        models = None
+        if options['models']:
+            models = [clocked_model_argument(label) for label in options['models']]
+
+        for entry in audit_stream(since, until, models=models, batch_size=options['batch_size']):
+            self.stdout.write(json.dumps({
+                'model': entry.model._meta.label_lower,
+                'entity_id': entry.entity_id,
+                'tick': entry.tick,
+                'timestamp': entry.timestamp,
+                'activity_id': entry.activity_id,
+                'changed_fields': entry.changed_fields,
+            }, cls=DjangoJSONEncoder, sort_keys=True))
@@ -0,0 +1,75 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from temporal_django.management.arguments import clocked_model_argument, datetime_argument
+from temporal_django.synthetic import generate_history
+
+
+class Command(BaseCommand):
+    """
+    Creates objects of a clocked model with synthetic history, for testing at production scale
+
+    temporal_django isn't a Django app, so expose this command from one of your own apps by importing it in
+    that app's ``management/commands/temporal_generate_history.py``.
+    """
+    help = 'Create objects of a clocked model with many ticks each, writing their history with COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', metavar='APP_LABEL.MODEL', help='the clocked model to create objects of')
+        parser.add_argument('--entities', type=int, default=1000, help='number of objects to create')
+        parser.add_argument('--ticks', type=int, default=10, help='number of ticks of each object')
+        parser.add_argument('--change-rate', action='append', dest='change_rates', default=[],
+                            metavar='FIELD=RATE',
+                            help='probability from 0 to 1 that a tick changes the field; '
+                                 'may be given more than once')
+        parser.add_argument('--default-change-rate', type=float, default=0.5,
+                            help='probability that a tick changes any other tracked field')
+        parser.add_argument('--start', help='when the first ticks happen (ISO 8601), by default early enough '
+                                            'for the latest ticks to happen around now')
+        parser.add_argument('--mean-interval', type=float, default=3600,
+                            help='mean number of seconds between the ticks of an object')
+        parser.add_argument('--seed', type=int, help='seed for the random generator')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='number of objects to write with each COPY')
+
+    def handle(self, *args, **options):
+        model = clocked_model_argument(options['model'])
+        if options['entities'] < 1 or options['ticks'] < 1:
+            raise CommandError('--entities and --ticks must be at least 1')
+
+        change_rates = {}
+        for change_rate in options['change_rates']:
+            field, _, rate = change_rate.partition('=')
+            if field not in model.temporal_options.temporal_fields:
+                raise CommandError('%r is not a tracked field of %s' % (field, model._meta.label))
+            change_rates[field] = self._parse_rate(rate)
+        self._parse_rate(str(options['default_change_rate']))
+
+        try:
+            generated = generate_history(
+                model,
+                entities=options['entities'],
+                ticks=options['ticks'],
+                change_rates=change_rates,
+                default_change_rate=options['default_change_rate'],
+                start=datetime_argument(options['start']) if options['start'] else None,
+                mean_interval=datetime.timedelta(seconds=options['mean_interval']),
+                seed=options['seed'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('Created %d %s objects with %d ticks and %d history rows in %.1fs' % (
+            generated.entities, model._meta.label, generated.ticks, generated.history_rows,
+            generated.seconds))
+
+    def _parse_rate(self, value):
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = None
+        if rate is None or not 0 <= rate <= 1:
+            raise CommandError('%r is not a change rate from 0 to 1' % value)
+        return rate
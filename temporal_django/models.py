@@ -1,8 +1,19 @@
 import datetime
+import functools
+import operator
 import typing  # noqa
 
-from django.db import models, transaction
-from django.contrib.postgres.fields import DateTimeRangeField, IntegerRangeField
+from django.db import models, router, transaction
+from django.contrib.postgres.fields import ArrayField, DateTimeRangeField, IntegerRangeField
+from psycopg2.extras import NumericRange
+
+from .async_reads import gather_reads, run_read
+from .batch import current_batch
+from .cache import HistoryCache, history_cache_key
+from .delete import delete_entities
+from .query import (ClockedManager, ClockedQuerySet, activity_clock_query, history_value_subquery,
+                    iter_with_prefetch)
+from .routers import read_database
 
 
 class EntityClock(models.Model):
@@ -14,6 +25,18 @@ class EntityClock(models.Model):
         abstract = True
 
 
+class TickOutbox(models.Model):
+    """Model for an outbox table, recording an event for every clock tick"""
+    id = models.BigAutoField(primary_key=True)
+    tick = models.IntegerField()
+    timestamp = models.DateTimeField()
+    changed_fields = ArrayField(models.TextField())
+    txid = models.BigIntegerField()
+
+    class Meta:
+        abstract = True
+
+
 TimelineFieldHistory = typing.NamedTuple('TimelineFieldHistory', [
     ('value', typing.Any),
     ('label', str),
@@ -26,6 +49,46 @@ TimelineTick = typing.NamedTuple('TimelineTick', [
 ])
 
 
+class LightweightTimelineTick:
+    """
+    A tick of a lightweight timeline
+
+    Built straight from database rows, without instantiating the clock and history models. ``changed_fields``
+    maps the name of each field changed in the tick to its new value.
+    """
+    __slots__ = ('tick', 'timestamp', 'activity_id', 'changed_fields')
+
+    def __init__(self, tick: int, timestamp: datetime.datetime, activity_id: typing.Any,
+                 changed_fields: typing.Dict[str, typing.Any]):
+        self.tick = tick
+        self.timestamp = timestamp
+        self.activity_id = activity_id
+        self.changed_fields = changed_fields
+
+    def __eq__(self, other):
+        return isinstance(other, LightweightTimelineTick) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return 'LightweightTimelineTick(tick=%r, timestamp=%r, activity_id=%r, changed_fields=%r)' % (
+            self.tick, self.timestamp, self.activity_id, self.changed_fields)
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """The tick as a dict, e.g. for serializing to JSON"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+TemporalSnapshot = typing.NamedTuple('TemporalSnapshot', [
+    ('clock', EntityClock),
+    ('values', typing.Dict[str, typing.Any])
+])
+
+
+TemporalFieldDiff = typing.NamedTuple('TemporalFieldDiff', [
+    ('before', typing.Any),
+    ('after', typing.Any),
+])
+
+
 class FieldHistory(models.Model):
     """Model for a column/field history table"""
     entity = None  # type: models.ForeignKey
@@ -46,6 +109,9 @@ class Clocked(models.Model):
     vclock = models.IntegerField(default=0)
     """The current clock tick for this object"""
 
+    deleted_tick = models.IntegerField(null=True, blank=True, editable=False)
+    """The tombstone tick this object was deleted at, if it has been deleted"""
+
     clock = None  # type: models.ForeignKey
     """The clock history of this object"""
 
@@ -55,16 +121,99 @@ class Clocked(models.Model):
     activity = None  # type: models.Model
     """Use this to set the activity for the next save"""
 
+    objects = ClockedManager()
+    """Manager of the objects that haven't been deleted"""
+
+    all_objects = ClockedManager(include_deleted=True)
+    """Manager of all objects, including deleted ones"""
+
     class Meta:
         abstract = True
 
     def first_tick(self) -> EntityClock:
-        """The clock object for the earliest tick of this object's history"""
-        return self.clock.first()
+        """
+        The clock object for the earliest tick of this object's history
+
+        The result is cached on the instance, so repeated calls only query once.
+        """
+        ticks = self._state._django_temporal_ticks
+        if 'first' not in ticks:
+            ticks['first'] = self._load_edge_tick(latest=False)
+        return ticks['first']
 
     def latest_tick(self) -> EntityClock:
-        """The clock object for the most recent tick of this object's history"""
-        return self.clock.last()
+        """
+        The clock object for the most recent tick of this object's history
+
+        The result is cached on the instance and replaced whenever a new tick is recorded by saving it.
+        """
+        ticks = self._state._django_temporal_ticks
+        if 'latest' not in ticks:
+            ticks['latest'] = self._load_edge_tick(latest=True)
+        return ticks['latest']
+
+    async def afirst_tick(self) -> EntityClock:
+        """Async version of ``first_tick``, reading on the async read threads"""
+        ticks = self._state._django_temporal_ticks
+        if 'first' not in ticks:
+            ticks['first'] = await run_read(self._load_edge_tick, latest=False)
+        return ticks['first']
+
+    async def alatest_tick(self) -> EntityClock:
+        """Async version of ``latest_tick``, reading on the async read threads"""
+        ticks = self._state._django_temporal_ticks
+        if 'latest' not in ticks:
+            ticks['latest'] = await run_read(self._load_edge_tick, latest=True)
+        return ticks['latest']
+
+    def refresh_from_db(self, *args, **kwargs):
+        """Reloads the object from the database, forgetting its cached first and latest ticks"""
+        super().refresh_from_db(*args, **kwargs)
+        self._state._django_temporal_ticks.clear()
+
+    def _load_edge_tick(self, latest: bool) -> typing.Optional[EntityClock]:
+        """Load the first or latest tick, from the read database unless it is missing ticks of this object"""
+        def load(using):
+            clock_query = self._temporal_clock_query().using(using)
+            return clock_query.last() if latest else clock_query.first()
+
+        primary, read_alias = self._temporal_databases()
+        if read_alias is not None:
+            clock = load(read_alias)
+            replayed_tick = clock.tick if clock is not None else 0
+            if replayed_tick >= (self.vclock if latest else min(self.vclock, 1)):
+                return clock
+        return load(primary)
+
+    def _temporal_databases(self) -> typing.Tuple[str, typing.Optional[str]]:
+        """The database this object is written to, and the database to read its history from if different"""
+        primary = router.db_for_write(type(self), instance=self)
+        read_alias = read_database()
+        return primary, read_alias if read_alias != primary else None
+
+    def _temporal_read_database(self, tick: int) -> str:
+        """
+        The database to read this object's history up to a tick from
+
+        That is the read database if one is configured and it has replayed the object up to that tick, which
+        is checked against the object's vclock there. Otherwise it is the primary.
+        """
+        primary, read_alias = self._temporal_databases()
+        if read_alias is None:
+            return primary
+        if tick > 0:
+            replayed_vclock = type(self)._base_manager.using(read_alias).filter(pk=self.pk) \
+                .values_list('vclock', flat=True).first()
+            if replayed_vclock is None or replayed_vclock < tick:
+                return primary
+        return read_alias
+
+    def _cache_tick(self, clock: EntityClock):
+        """Remember a tick that has just been recorded for this object as its latest, and maybe first, tick"""
+        ticks = self._state._django_temporal_ticks
+        ticks['latest'] = clock
+        if clock.tick == 1:
+            ticks['first'] = clock
 
     def date_created(self) -> datetime.datetime:
         """Returns the date and time this object was created"""
@@ -78,19 +227,51 @@ class Clocked(models.Model):
         if latest_tick:
             return latest_tick.timestamp
 
-    @transaction.atomic
     def save(self, *args, activity=None, **kwargs):
         """
         Overrides save to force atomic transactions for temporal and to allow a convenience method for
         specifying an action.
         """
-        if activity:
-            if not activity.pk:
-                activity.save()
-            self.activity = activity
-        super().save(*args, **kwargs)
+        if self.deleted_tick is not None:
+            raise ValueError('%s has been deleted; deleted temporal objects cannot be saved' % self)
+        if activity is None and self.activity is None and type(self).temporal_options.activity_model:
+            batch = current_batch()
+            activity = batch.activity if batch is not None else None
+        with transaction.atomic(using=kwargs.get('using') or self._temporal_databases()[0]):
+            if activity:
+                if not activity.pk:
+                    activity.save()
+                self.activity = activity
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False,
+               activity=None) -> typing.Tuple[int, typing.Dict[str, int]]:
+        """
+        Overrides delete to soft delete the object
 
-    def temporal_timeline(self) -> typing.List[TimelineTick]:
+        A tombstone tick is recorded with the activity, closing the open history ranges of every tracked
+        field, and the object's ``deleted_tick`` is set. The object is then hidden from ``objects``, but can
+        still be loaded through ``all_objects`` and read at earlier ticks and times.
+        """
+        assert self.pk is not None, \
+            '%s object can\'t be deleted because its %s attribute is set to None.' % (
+                self._meta.object_name, self._meta.pk.attname)
+        if self.deleted_tick is not None:
+            raise ValueError('%s has already been deleted' % self)
+
+        using = using or self._temporal_databases()[0]
+        clock, = delete_entities(type(self), [(self.pk, self.vclock)], activity or self.activity, using)
+        self.vclock = self.deleted_tick = clock.tick
+        self._cache_tick(clock)
+        self.activity = None
+        return 1, {self._meta.label: 1}
+
+    def temporal_timeline(self,
+                          since_tick: typing.Optional[int] = None,
+                          until_tick: typing.Optional[int] = None,
+                          limit: typing.Optional[int] = None,
+                          reverse: bool = False,
+                          lightweight: bool = False) -> typing.List[TimelineTick]:
         """
         Returns a timeline of field changes grouped by clock tick
 
@@ -105,36 +286,326 @@ class Clocked(models.Model):
                 }
             }
         }
+
+        The timeline can be paginated on clock ticks. ``since_tick`` and ``until_tick`` are inclusive bounds,
+        ``limit`` caps the number of ticks returned and ``reverse`` returns the most recent ticks first. To
+        fetch the next page, pass the tick after the last one returned as ``since_tick`` (or the tick before
+        it as ``until_tick`` when reversed).
+
+        With ``lightweight``, the timeline is a list of ``LightweightTimelineTick`` records instead, holding
+        the tick, timestamp, activity id and new values of the changed fields. They are built from plain rows
+        without instantiating any models, and are much cheaper for long timelines that are only serialized.
         """
-        temporal_options = type(self).temporal_options
-        timeline = []
+        history_cache = type(self).temporal_options.history_cache
+        paginated = since_tick is not None or until_tick is not None or limit is not None or reverse
+        if history_cache is None or paginated or lightweight:
+            return list(self.iter_temporal_timeline(since_tick, until_tick, limit, reverse, lightweight))
+
+        # A timeline up to a given vclock never changes, so it can be cached under that vclock
+        cache_key = history_cache_key('timeline', self, self.vclock)
+        timeline = history_cache.get(cache_key)
+        if timeline is None:
+            timeline = list(self.iter_temporal_timeline(until_tick=self.vclock))
+            self._cache_history(history_cache, cache_key, timeline)
+        return list(timeline)
+
+    def iter_temporal_timeline(self,
+                               since_tick: typing.Optional[int] = None,
+                               until_tick: typing.Optional[int] = None,
+                               limit: typing.Optional[int] = None,
+                               reverse: bool = False,
+                               lightweight: bool = False) -> typing.Iterator[TimelineTick]:
+        """
+        Iterates over a timeline of field changes grouped by clock tick
+
+        Takes the same arguments as ``temporal_timeline``, but streams the ticks instead of building a list.
+        The clock and the history of each field are read from ordered server-side cursors in lockstep, so the
+        memory used does not depend on the length of the timeline.
+        """
+        last_tick = min(until_tick, self.vclock) if until_tick is not None else self.vclock
+        using = self._temporal_read_database(last_tick)
+
+        tick_of = operator.itemgetter(0) if lightweight else operator.attrgetter('tick')
+        clock_query = self._temporal_timeline_clock_query(using, lightweight) \
+            .order_by('-tick' if reverse else 'tick')
+        if since_tick is not None:
+            clock_query = clock_query.filter(tick__gte=since_tick)
+        if until_tick is not None:
+            clock_query = clock_query.filter(tick__lte=until_tick)
+
+        if limit is not None:
+            # Read the page of clock ticks first, then only the history within that page
+            clocks = list(clock_query[:limit])
+            if not clocks:
+                return
+            since_tick, until_tick = sorted((tick_of(clocks[0]), tick_of(clocks[-1])))
+            clocks = iter(clocks)
+        else:
+            clocks = clock_query.iterator() if lightweight else iter_with_prefetch(clock_query)
+
+        # Rows of (first tick, value) for each field
         field_history = {
-            field: getattr(self, '%s_history' % field).all()
-            for field in
-            temporal_options.temporal_fields
+            field: self._temporal_history_values(field, since_tick, until_tick, reverse, using, lightweight)
+            for field in type(self).temporal_options.temporal_fields
+        }
+        yield from self._merge_timeline(clocks, field_history, lightweight)
+
+    async def atemporal_timeline(self,
+                                 since_tick: typing.Optional[int] = None,
+                                 until_tick: typing.Optional[int] = None,
+                                 limit: typing.Optional[int] = None,
+                                 reverse: bool = False,
+                                 lightweight: bool = False) -> typing.List[TimelineTick]:
+        """
+        Async version of ``temporal_timeline``
+
+        The clock and the history of each field are read at the same time on the async read threads, so the
+        timeline takes about as long as the slowest of those queries.
+        """
+        history_cache = type(self).temporal_options.history_cache
+        paginated = since_tick is not None or until_tick is not None or limit is not None or reverse
+        if history_cache is None or paginated or lightweight:
+            return await self._aload_temporal_timeline(since_tick, until_tick, limit, reverse, lightweight)
+
+        cache_key = history_cache_key('timeline', self, self.vclock)
+        timeline = await run_read(history_cache.get, cache_key)
+        if timeline is None:
+            # The read threads only see committed history, so the timeline can be cached right away
+            timeline = await self._aload_temporal_timeline(until_tick=self.vclock)
+            await run_read(history_cache.set, cache_key, timeline)
+        return list(timeline)
+
+    async def _aload_temporal_timeline(self,
+                                       since_tick: typing.Optional[int] = None,
+                                       until_tick: typing.Optional[int] = None,
+                                       limit: typing.Optional[int] = None,
+                                       reverse: bool = False,
+                                       lightweight: bool = False) -> typing.List[TimelineTick]:
+        last_tick = min(until_tick, self.vclock) if until_tick is not None else self.vclock
+        using = await run_read(self._temporal_read_database, last_tick)
+
+        clock_query = self._temporal_timeline_clock_query(using, lightweight) \
+            .order_by('-tick' if reverse else 'tick')
+        if since_tick is not None:
+            clock_query = clock_query.filter(tick__gte=since_tick)
+        if until_tick is not None:
+            clock_query = clock_query.filter(tick__lte=until_tick)
+
+        reads = []
+        if limit is not None:
+            # The page of clock ticks bounds the history to read, so it has to be read first
+            clocks = await run_read(list, clock_query[:limit])
+            if not clocks:
+                return []
+            tick_of = operator.itemgetter(0) if lightweight else operator.attrgetter('tick')
+            since_tick, until_tick = sorted((tick_of(clocks[0]), tick_of(clocks[-1])))
+        else:
+            reads.append(functools.partial(list, clock_query))
+
+        fields = type(self).temporal_options.temporal_fields
+        reads.extend(
+            functools.partial(_read_all, self._temporal_history_values,
+                              field, since_tick, until_tick, reverse, using, lightweight)
+            for field in fields
+        )
+        results = await gather_reads(*reads)
+        if limit is None:
+            clocks = results.pop(0)
+
+        field_history = {field: iter(rows) for field, rows in zip(fields, results)}
+        return list(self._merge_timeline(clocks, field_history, lightweight))
+
+    def _merge_timeline(self,
+                        clocks: typing.Iterable[typing.Any],
+                        field_history: typing.Dict[str, typing.Iterator[typing.Tuple[int, typing.Any]]],
+                        lightweight: bool) -> typing.Iterator[TimelineTick]:
+        """Group the history rows of each field, in tick order, with the clock ticks they start at"""
+        tick_of = operator.itemgetter(0) if lightweight else operator.attrgetter('tick')
+        labels = {field: type(self)._meta.get_field(field).verbose_name for field in field_history}
+
+        # Every history row starts at a clock tick and both are read in tick order, so the next row of each
+        # field either belongs to the current tick or to a later one.
+        next_history = {field: next(history, None) for field, history in field_history.items()}
+        for clock in clocks:
+            tick = tick_of(clock)
+            changed_fields = {}
+            for field, field_history_item in next_history.items():
+                if field_history_item is not None and field_history_item[0] == tick:
+                    changed_fields[field] = field_history_item[1]
+                    next_history[field] = next(field_history[field], None)
+
+            if lightweight:
+                activity_id = clock[2] if len(clock) > 2 else None
+                yield LightweightTimelineTick(tick, clock[1], activity_id, changed_fields)
+            else:
+                yield TimelineTick(clock=clock, changed_fields={
+                    field: TimelineFieldHistory(value=value, label=labels[field])
+                    for field, value in changed_fields.items()
+                })
+
+    def temporal_as_of(self,
+                       point: typing.Union[int, datetime.datetime]) -> typing.Optional[TemporalSnapshot]:
+        """
+        Returns the state of the tracked fields at a clock tick or timestamp
+
+        Integers are treated as clock ticks and datetimes as effective timestamps. Returns None if the object
+        did not exist yet, or had been deleted, at that point. Otherwise the return format is:
+
+        {
+            clock: Clocked,
+            values: {
+                [field_name]: any
+            }
         }
+        """
+        history_cache = type(self).temporal_options.history_cache
+        if history_cache is None:
+            return self._load_temporal_as_of(point)
+
+        cache_key = history_cache_key('as_of', self, point)
+        snapshot = history_cache.get(cache_key)
+        if snapshot is None:
+            snapshot = self._load_temporal_as_of(point)
+            if snapshot is not None and self._is_closed_point(point, snapshot.clock):
+                self._cache_history(history_cache, cache_key, snapshot)
+        return snapshot
+
+    async def atemporal_as_of(
+            self, point: typing.Union[int, datetime.datetime]) -> typing.Optional[TemporalSnapshot]:
+        """Async version of ``temporal_as_of``, reading on the async read threads"""
+        return await run_read(self.temporal_as_of, point)
+
+    def _cache_history(self, history_cache: HistoryCache, cache_key: str, value: typing.Any):
+        """
+        Cache a history read once the transaction it was read in commits
+
+        Reads in a transaction can see ticks it has recorded, which must not be cached if it rolls back.
+        Outside of a transaction the read is cached right away.
+        """
+        primary, _ = self._temporal_databases()
+        transaction.on_commit(functools.partial(history_cache.set, cache_key, value), using=primary)
+
+    def _is_closed_point(self, point: typing.Union[int, datetime.datetime], clock: EntityClock) -> bool:
+        """
+        Whether the state at a tick or timestamp can no longer change
+
+        The values at an existing tick are fixed forever. A timestamp is only settled once a later tick has
+        closed the ranges in effect at that time.
+        """
+        if isinstance(point, datetime.datetime):
+            return clock.tick < self.vclock
+        return point <= self.vclock
 
+    def _temporal_clock_query(self) -> models.QuerySet:
+        """The queryset used to load clock ticks, along with their activities"""
+        temporal_options = type(self).temporal_options
         if temporal_options.activity_model:
-            clock_query = self.clock.select_related('activity')
-            if hasattr(temporal_options.activity_model, 'temporal_queryset_options'):
-                temporal_options.activity_model.temporal_queryset_options(clock_query)
-            clock_query = clock_query.all()
+            return activity_clock_query(self.clock.all(), temporal_options.activity_model)
+        return self.clock.all()
+
+    def _temporal_timeline_clock_query(self, using: str, lightweight: bool) -> models.QuerySet:
+        """The clock ticks of a timeline, as models or as rows of (tick, timestamp[, activity_id])"""
+        if not lightweight:
+            return self._temporal_clock_query().using(using)
+
+        columns = ['tick', 'timestamp']
+        if type(self).temporal_options.activity_model:
+            columns.append('activity_id')
+        return self.clock.using(using).values_list(*columns)
+
+    def _temporal_history_query(self,
+                                field: str,
+                                since_tick: typing.Optional[int],
+                                until_tick: typing.Optional[int],
+                                reverse: bool,
+                                using: str) -> models.QuerySet:
+        """The history rows of a field that start between two ticks, in tick order"""
+        history_query = getattr(self, '%s_history' % field).using(using) \
+            .order_by('-vclock' if reverse else 'vclock')
+        if since_tick is not None or until_tick is not None:
+            upper = until_tick + 1 if until_tick is not None else None
+            history_query = history_query.filter(vclock__overlap=NumericRange(since_tick, upper))
+        # Bounding where the rows start lets the page be read from the index on (entity, lower(vclock))
+        if since_tick is not None:
+            history_query = history_query.filter(vclock__startswith__gte=since_tick)
+        if until_tick is not None:
+            history_query = history_query.filter(vclock__startswith__lte=until_tick)
+        return history_query
+
+    def _temporal_history_values(self,
+                                 field: str,
+                                 since_tick: typing.Optional[int],
+                                 until_tick: typing.Optional[int],
+                                 reverse: bool,
+                                 using: str,
+                                 lightweight: bool) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+        """Stream the first tick and value of the history rows of a field that start between two ticks"""
+        history_query = self._temporal_history_query(field, since_tick, until_tick, reverse, using)
+        if lightweight:
+            first_tick = models.Func('vclock', function='lower', output_field=models.IntegerField())
+            history_query = history_query.annotate(temporal_tick=first_tick)
+            return history_query.values_list('temporal_tick', field).iterator()
+        return ((history.vclock.lower, getattr(history, field)) for history in history_query.iterator())
+
+    def _load_temporal_as_of(
+            self, point: typing.Union[int, datetime.datetime]) -> typing.Optional[TemporalSnapshot]:
+        temporal_options = type(self).temporal_options
+        if isinstance(point, datetime.datetime):
+            using = self._temporal_read_database(self.vclock)
+            clock = self._temporal_clock_query().using(using).filter(timestamp__lte=point).last()
         else:
-            clock_query = self.clock.all()
+            using = self._temporal_read_database(min(point, self.vclock))
+            clock = self._temporal_clock_query().using(using).filter(tick__lte=point).last()
+        if clock is None or (self.deleted_tick is not None and clock.tick >= self.deleted_tick):
+            return None
+
+        annotations = {
+            'temporal_value_%s' % field: history_value_subquery(history_model, field, clock.tick)
+            for field, history_model in temporal_options.history_models.items()
+        }
+        row = ClockedQuerySet(model=type(self), using=using).filter(pk=self.pk) \
+            .annotate(**annotations).values(*annotations.keys()).get()
 
-        for clock in clock_query:
-            changed_fields = {}
-            for field, history in field_history.items():
-                for field_history_item in history:
-                    if field_history_item.vclock.lower == clock.tick:
-                        changed_fields[field] = TimelineFieldHistory(
-                            value=getattr(field_history_item, field),
-                            label=type(self)._meta.get_field(field).verbose_name,
-                        )
+        return TemporalSnapshot(
+            clock=clock,
+            values={field: row['temporal_value_%s' % field] for field in temporal_options.temporal_fields},
+        )
+
+    def revert_to(self,
+                  point: typing.Union[int, datetime.datetime],
+                  activity: typing.Optional[models.Model] = None):
+        """
+        Restores the tracked fields to their values at a clock tick or timestamp, and saves them as a new tick
+
+        Integers are treated as clock ticks and datetimes as effective timestamps. Nothing is recorded if the
+        values are already the same.
+        """
+        snapshot = self.temporal_as_of(point)
+        if snapshot is None:
+            raise ValueError('%s did not exist at %s' % (self, point))
+
+        for field, model_field in type(self).temporal_options.temporal_model_fields:
+            setattr(self, model_field.attname, snapshot.values[field])
+        self.save(activity=activity)
+
+    def temporal_diff(self,
+                      from_point: typing.Union[int, datetime.datetime],
+                      to_point: typing.Union[int, datetime.datetime]) -> typing.Dict[str, TemporalFieldDiff]:
+        """
+        Returns the tracked fields that differ between two clock ticks or timestamps
 
-            timeline.append(TimelineTick(clock=clock, changed_fields=changed_fields))
+        Integers are treated as clock ticks and datetimes as effective timestamps. The return format is a
+        sparse mapping of changed fields:
 
-        return timeline
+        {
+            [field_name]: {
+                before: any,
+                after: any
+            }
+        }
+        """
+        diffs = ClockedQuerySet(model=type(self)).filter(pk=self.pk).temporal_diff(from_point, to_point)
+        return diffs.get(self.pk, {})
 
 
 class ClockedOption:
@@ -149,5 +620,25 @@ class ClockedOption:
     clock_model = None  # type: EntityClock
     """The model of the entity clock for this entity"""
 
+    temporal_model_fields = None  # type: List[Tuple[str, models.Field]]
+    """The fields that have history, along with their model fields"""
+
     activity_model = None  # type: Optional[models.Model]
     """The model for activities for this entity"""
+
+    history_cache = None  # type: Optional[HistoryCache]
+    """The cache in front of timeline and point-in-time reads, if any"""
+
+    outbox_model = None  # type: Optional[TickOutbox]
+    """The model of the outbox that every tick is written to, if any"""
+
+    notify_channel = None  # type: Optional[str]
+    """The channel to pg_notify of every tick, if any"""
+
+    coalesce_saves = False  # type: bool
+    """Whether saves after the first in a transaction are folded into the first one's tick"""
+
+
+def _read_all(func: typing.Callable[..., typing.Iterator], *args) -> list:
+    """Call a function returning an iterator over query results, and read all of them"""
+    return list(func(*args))
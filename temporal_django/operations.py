@@ -0,0 +1,276 @@
+"""
+Migration operations for adding temporal indexes and constraints to large tables.
+
+``AddIndex`` builds indexes with a plain ``CREATE INDEX``, which blocks writes to the table for the whole
+build, and ``GistExclusionConstraint`` is added with ``ALTER TABLE ... ADD CONSTRAINT``, which blocks reads
+too. The operations here reduce that:
+
+- ``AddIndexConcurrently`` builds an ``ExpressionIndex`` (or ``HashIndex``/``GistIndex``) with
+  ``CREATE INDEX CONCURRENTLY``, which never blocks reads or writes.
+- ``AddValidatedExclusionConstraint`` checks the existing rows for conflicts first, reading the table without
+  blocking anything, and then adds the constraint with a ``lock_timeout`` so that it never queues behind
+  long transactions.
+
+PostgreSQL can't attach an existing index to an exclusion constraint or add one ``NOT VALID``, so adding the
+constraint holds an ACCESS EXCLUSIVE lock, blocking reads and writes of the table, for as long as its GiST
+index takes to build. ``lock_timeout`` only limits how long it waits to get that lock. Validating first means
+the build can't fail late on bad data, so the lock is held once, but it is still held for the whole build;
+schedule the migration accordingly.
+
+Both operations must run in a migration with ``atomic = False``. Progress is logged to the
+``temporal_django.operations`` logger.
+"""
+import logging
+import re
+import threading
+import typing
+
+import psycopg2
+from django.db import IntegrityError
+from django.db.migrations.operations import AddIndex
+
+from .db_extensions import ExpressionIndex, GistExclusionConstraint
+
+
+logger = logging.getLogger(__name__)
+
+
+class AddIndexConcurrently(AddIndex):
+    """Add an ExpressionIndex to a model with CREATE INDEX CONCURRENTLY"""
+
+    def __init__(self, model_name: str, index: ExpressionIndex):
+        assert isinstance(index, ExpressionIndex), \
+            'AddIndexConcurrently only supports ExpressionIndex indexes'
+        super().__init__(model_name, index)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            add_index_concurrently(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            _check_non_atomic(schema_editor)
+            schema_editor.execute(self.index.remove_sql(model, schema_editor, concurrently=True))
+
+    def describe(self):
+        return 'Create index %s concurrently on model %s' % (self.index.name, self.model_name)
+
+
+class AddValidatedExclusionConstraint(AddIndex):
+    """
+    Add a GistExclusionConstraint to a model, checking existing rows for conflicts before taking its lock
+
+    Args:
+        model_name (str): the model to add the constraint to
+        index (GistExclusionConstraint): the constraint
+        lock_timeout (str): how long to wait for the lock to add the constraint before giving up
+    """
+
+    def __init__(self, model_name: str, index: GistExclusionConstraint, lock_timeout: str = '5s'):
+        assert isinstance(index, GistExclusionConstraint), \
+            'AddValidatedExclusionConstraint only supports GistExclusionConstraint'
+        super().__init__(model_name, index)
+        self.lock_timeout = lock_timeout
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            add_validated_exclusion_constraint(schema_editor, model, self.index, self.lock_timeout)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        kwargs.update(lock_timeout=self.lock_timeout)
+        return name, args, kwargs
+
+    def describe(self):
+        return 'Create exclusion constraint %s on model %s after validating its rows' % (
+            self.index.name, self.model_name)
+
+
+def add_index_concurrently(schema_editor, model: type, index: ExpressionIndex):
+    """
+    Build an ExpressionIndex with CREATE INDEX CONCURRENTLY
+
+    A valid index of the same name is left alone, so this can be retried after a later step of the migration
+    fails. An invalid index left behind by an earlier build that failed is dropped and built again.
+
+    Args:
+        schema_editor: the schema editor of a non-atomic migration
+        model (type): the model to index
+        index (ExpressionIndex): the index to build
+    """
+    _check_non_atomic(schema_editor)
+    # When only collecting SQL, the index can't be looked up, so both statements are collected
+    valid = None if schema_editor.collect_sql else _index_validity(schema_editor, model, index.name)
+    if valid:
+        logger.info('%s: already built', index.name)
+        return
+    if valid is not None or schema_editor.collect_sql:
+        schema_editor.execute(index.remove_sql(model, schema_editor, concurrently=True))
+    sql = index.create_sql(model, schema_editor, concurrently=True)
+    _execute_with_progress(schema_editor, sql, index.name)
+
+
+def add_validated_exclusion_constraint(schema_editor,
+                                       model: type,
+                                       constraint: GistExclusionConstraint,
+                                       lock_timeout: str = '5s'):
+    """
+    Add a GistExclusionConstraint to a table that already has rows, failing before its lock if rows conflict
+
+    The rows are checked with one sorted scan of the table, which doesn't block reads or writes. The
+    constraint is then added under an ACCESS EXCLUSIVE lock held while its index builds, waiting at most
+    ``lock_timeout`` to get the lock.
+
+    Args:
+        schema_editor: the schema editor of a non-atomic migration
+        model (type): the model to add the constraint to
+        constraint (GistExclusionConstraint): the constraint, comparing one range with ``&&`` and any other
+            expressions with ``=``
+        lock_timeout (str): how long to wait for the lock to add the constraint, as a PostgreSQL interval
+
+    Raises:
+        IntegrityError: if existing rows conflict with each other, before the constraint's lock is taken
+    """
+    _check_non_atomic(schema_editor)
+    if not schema_editor.collect_sql:
+        conflicts = _count_conflicts(schema_editor, model, _exclusion_elements(constraint.fields[0]))
+        if conflicts:
+            raise IntegrityError('%d rows of %s conflict with earlier rows, so %s can\'t be added' % (
+                conflicts, model._meta.db_table, constraint.name))
+
+    schema_editor.execute("SET lock_timeout = '%s'" % lock_timeout.replace("'", "''"))
+    try:
+        logger.info('%s: adding the constraint, which blocks the table until its index is built',
+                    constraint.name)
+        schema_editor.execute(constraint.create_sql(model, schema_editor))
+    finally:
+        schema_editor.execute('RESET lock_timeout')
+    logger.info('%s: added', constraint.name)
+
+
+def _check_non_atomic(schema_editor):
+    assert not schema_editor.atomic_migration and not schema_editor.connection.in_atomic_block, \
+        'Concurrent index builds can\'t run in a transaction; set atomic = False on the migration'
+
+
+def _index_validity(schema_editor, model: type, index_name: str) -> typing.Optional[bool]:
+    """Whether an index on a model's table is valid, or None if there is no such index"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """ SELECT pg_index.indisvalid
+                FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                WHERE pg_index.indrelid = %s::regclass AND pg_class.relname = %s
+            """, [schema_editor.quote_name(model._meta.db_table), index_name])
+        row = cursor.fetchone()
+    return row[0] if row is not None else None
+
+
+def _exclusion_elements(expression: str) -> typing.List[typing.Tuple[str, str]]:
+    """Split the definition of an exclusion constraint into its (expression, operator) pairs"""
+    elements = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(expression + ','):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if char == ',' and depth == 0:
+            element, operator = re.split(r'\s+WITH\s+', expression[start:i].strip(), flags=re.IGNORECASE)
+            elements.append((element, operator))
+            start = i + 1
+    return elements
+
+
+def _count_conflicts(schema_editor, model: type, elements: typing.List[typing.Tuple[str, str]]) -> int:
+    """
+    Count the rows of a table that overlap an earlier row under an exclusion constraint
+
+    Rows are sorted by the constraint's ``=`` expressions and the lower bound of its range, and each row is
+    compared with the highest upper bound of the rows before it, so the check is one scan and sort of the
+    table rather than a lookup per row. Ranges are compared as half-open, as temporal_django writes them.
+    """
+    keys = [expression for expression, operator in elements if operator == '=']
+    ranges = [expression for expression, operator in elements if operator == '&&']
+    assert len(ranges) == 1 and len(keys) + 1 == len(elements), \
+        'Only exclusion constraints on one range with && and other expressions with = can be validated'
+    range_expression = ranges[0]
+
+    query = """
+        SELECT count(*) FROM (
+            SELECT lower_inf({range}) AS lower_inf, lower({range}) AS lower,
+                   count(*) OVER earlier AS earlier_rows,
+                   bool_or(upper_inf({range})) OVER earlier AS earlier_upper_inf,
+                   max(upper({range})) OVER earlier AS earlier_upper
+            FROM {table_name}
+            WHERE NOT isempty({range})
+            WINDOW earlier AS (
+                {partition} ORDER BY lower({range}) NULLS FIRST
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            )
+        ) AS sorted
+        WHERE earlier_rows > 0 AND (lower_inf OR earlier_upper_inf OR earlier_upper > lower)
+    """.format(
+        range=range_expression,
+        table_name=model._meta.db_table,
+        partition='PARTITION BY %s' % ', '.join(keys) if keys else '',
+    )
+
+    logger.info('%s: validating', model._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(query)
+        conflicts = cursor.fetchone()[0]
+    logger.info('%s: validated, %d conflicting rows', model._meta.db_table, conflicts)
+    return conflicts
+
+
+def _execute_with_progress(schema_editor, sql: str, index_name: str, interval: float = 5.0):
+    """Run an index build, logging its progress from pg_stat_progress_create_index while it runs"""
+    if schema_editor.collect_sql:
+        schema_editor.execute(sql)
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT pg_backend_pid()')
+        pid = cursor.fetchone()[0]
+
+    stop = threading.Event()
+    reporter = threading.Thread(
+        target=_report_index_progress,
+        args=(schema_editor.connection.get_connection_params(), pid, index_name, stop, interval),
+        daemon=True,
+    )
+    logger.info('%s: building', index_name)
+    reporter.start()
+    try:
+        schema_editor.execute(sql)
+    finally:
+        stop.set()
+        reporter.join()
+    logger.info('%s: built', index_name)
+
+
+def _report_index_progress(connection_params: dict,
+                           pid: int,
+                           index_name: str,
+                           stop: threading.Event,
+                           interval: float):
+    """Log the progress of the index build running in another backend until stopped"""
+    connection = psycopg2.connect(**connection_params)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            while not stop.wait(interval):
+                try:
+                    cursor.execute(
+                        """ SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total
+                            FROM pg_stat_progress_create_index WHERE pid = %s
+                        """, [pid])
+                except psycopg2.ProgrammingError:  # pragma: no cover
+                    # Progress reporting needs PostgreSQL 12
+                    return
+                row = cursor.fetchone()
+                if row is not None:
+                    logger.info('%s: %s, %d of %d blocks, %d of %d tuples', index_name, *row)
+    finally:
+        connection.close()
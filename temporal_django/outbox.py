@@ -0,0 +1,176 @@
+"""
+Change feed of clock ticks.
+
+Clocked models created with ``add_clock(..., outbox=True)`` write an event for every tick to an outbox table
+in the same transaction as the tick itself, and with ``notify_channel`` they also pg_notify listeners. This
+module writes those events and provides the consumer API for reading the outbox in batches from a checkpoint.
+"""
+import json
+import typing
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+
+TickEvent = typing.NamedTuple('TickEvent', [
+    ('clocked', models.Model),
+    ('tick', int),
+    ('activity', typing.Optional[models.Model]),
+    ('changed_fields', typing.List[str]),
+])
+
+
+OutboxEvent = typing.NamedTuple('OutboxEvent', [
+    ('id', int),
+    ('txid', int),
+    ('model', str),
+    ('entity_id', typing.Any),
+    ('tick', int),
+    ('timestamp', typing.Any),
+    ('changed_fields', typing.List[str]),
+    ('activity_id', typing.Any),
+])
+
+
+# The position of an event in the outbox, as the transaction id and event id of the last event consumed
+OutboxCheckpoint = typing.Tuple[int, int]
+
+
+def outbox_checkpoint(event: OutboxEvent) -> OutboxCheckpoint:
+    """The checkpoint to resume reading the outbox after an event"""
+    return event.txid, event.id
+
+
+def publish_tick_events(model: type, events: typing.List[TickEvent], timestamp, using: str):
+    """
+    Write tick events to the outbox and notify channel of a clocked model, if it has them
+
+    All events are written with a single statement for each, so this can be used for whole batches of ticks.
+
+    Args:
+        model (type): the clocked model the ticks were recorded for
+        events (typing.List[TickEvent]): the ticks that were recorded
+        timestamp (datetime.datetime): the timestamp of the ticks
+        using (str): the database the ticks were written to
+    """
+    temporal_options = model.temporal_options
+
+    outbox_model = temporal_options.outbox_model
+    if outbox_model is not None:
+        outbox_model.objects.using(using).bulk_create([
+            outbox_model(
+                entity=event.clocked,
+                tick=event.tick,
+                timestamp=timestamp,
+                changed_fields=event.changed_fields,
+                txid=models.Func(function='txid_current', output_field=models.BigIntegerField()),
+                **({'activity': event.activity} if temporal_options.activity_model else {})
+            )
+            for event in events
+        ])
+
+    _notify_tick_events(model, events, using)
+
+
+def republish_tick_event(model: type, event: TickEvent, using: str):
+    """
+    Replace the event of a tick that has gained more changed fields, e.g. from a coalesced save
+
+    The tick's outbox event is updated in place, and the notify channel is notified again with all of the
+    tick's changed fields.
+
+    Args:
+        model (type): the clocked model the tick was recorded for
+        event (TickEvent): the tick, with all of its changed fields
+        using (str): the database the tick was written to
+    """
+    outbox_model = model.temporal_options.outbox_model
+    if outbox_model is not None:
+        outbox_model.objects.using(using) \
+            .filter(entity=event.clocked, tick=event.tick) \
+            .update(changed_fields=event.changed_fields)
+
+    _notify_tick_events(model, [event], using)
+
+
+def _notify_tick_events(model: type, events: typing.List[TickEvent], using: str):
+    temporal_options = model.temporal_options
+    if temporal_options.notify_channel:
+        payloads = [
+            json.dumps({
+                'model': model._meta.label_lower,
+                'entity_id': event.clocked.pk,
+                'tick': event.tick,
+                'changed_fields': event.changed_fields,
+                'activity_id': event.activity.pk if event.activity is not None else None,
+            }, cls=DjangoJSONEncoder)
+            for event in events
+        ]
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                           [temporal_options.notify_channel, payloads])
+
+
+def read_outbox(model: type, after: OutboxCheckpoint = (0, 0), limit: int = 1000) -> typing.List[OutboxEvent]:
+    """
+    Read the next events from the outbox of a clocked model
+
+    Events are returned in the order of the transactions that wrote them, then of their ids. Only events of
+    transactions older than every transaction still in progress are returned, and any transaction that commits
+    later has a newer transaction id, so a consumer that checkpoints on the last event it read never skips an
+    event that commits late. Ids alone can't be used as a checkpoint, since a transaction can take its ids
+    from the sequence after a newer transaction that commits first.
+
+    Args:
+        model (type): the clocked model to read events for
+        after (OutboxCheckpoint): the checkpoint of the last event already consumed, from
+            ``outbox_checkpoint``
+        limit (int): maximum number of events to return
+
+    Returns:
+        typing.List[OutboxEvent]: the next events in the outbox
+    """
+    temporal_options = model.temporal_options
+    assert temporal_options.outbox_model is not None, '%s has no outbox' % model.__name__
+
+    columns = ['id', 'txid', 'entity_id', 'tick', 'timestamp', 'changed_fields']
+    if temporal_options.activity_model:
+        columns.append('activity_id')
+
+    after_txid, after_id = after
+    rows = temporal_options.outbox_model.objects \
+        .filter(models.Q(txid__gt=after_txid) | models.Q(txid=after_txid, id__gt=after_id)) \
+        .filter(txid__lt=RawSQL('txid_snapshot_xmin(txid_current_snapshot())', [])) \
+        .order_by('txid', 'id') \
+        .values_list(*columns)[:limit]
+
+    label = model._meta.label_lower
+    return [
+        OutboxEvent(id=row[0], txid=row[1], model=label, entity_id=row[2], tick=row[3], timestamp=row[4],
+                    changed_fields=row[5], activity_id=row[6] if len(row) > 6 else None)
+        for row in rows
+    ]
+
+
+def iter_outbox_batches(model: type,
+                        after: OutboxCheckpoint = (0, 0),
+                        batch_size: int = 1000) -> typing.Iterator[typing.List[OutboxEvent]]:
+    """
+    Iterate over the outbox of a clocked model in batches, until it has been drained
+
+    Store the checkpoint of the last event of each batch once it has been processed, and pass it as ``after``
+    to resume from that checkpoint.
+
+    Args:
+        model (type): the clocked model to read events for
+        after (OutboxCheckpoint): the checkpoint of the last event already consumed, from
+            ``outbox_checkpoint``
+        batch_size (int): maximum number of events in each batch
+    """
+    while True:
+        events = read_outbox(model, after, batch_size)
+        if not events:
+            return
+        yield events
+        after = outbox_checkpoint(events[-1])
@@ -0,0 +1,273 @@
+"""
+QuerySet and helpers for reading temporal history in SQL.
+
+Implements the ClockedQuerySet used as the default manager of Clocked models, and the helpers used to
+select the history row in effect at a given clock tick or timestamp.
+"""
+import datetime
+import itertools
+import typing
+
+from django.db import models
+from django.db.models.functions import Cast
+from psycopg2.extras import DateTimeTZRange
+
+
+def history_point_filter(point: typing.Union[int, datetime.datetime]) -> typing.Dict[str, typing.Any]:
+    """
+    Build the filter arguments that select the history row in effect at a tick or timestamp
+
+    Integers are treated as clock ticks and matched against ``vclock``; datetimes are matched against
+    ``effective``. Both lookups are served by the GiST exclusion constraints on the history tables.
+
+    Timestamps are cast explicitly because postgres will not match a naive ``timestamp`` against a
+    ``tstzrange``.
+
+    Args:
+        point (typing.Union[int, datetime.datetime]): clock tick or timestamp
+
+    Returns:
+        typing.Dict[str, typing.Any]: keyword arguments for ``QuerySet.filter``
+    """
+    if isinstance(point, datetime.datetime):
+        return {'effective__contains': Cast(models.Value(point), models.DateTimeField())}
+    return {'vclock__contains': point}
+
+
+def history_value_subquery(history_model: models.Model,
+                           field: str,
+                           point: typing.Union[int, datetime.datetime]) -> models.Subquery:
+    """
+    Build a correlated subquery for the value of a field at a tick or timestamp
+
+    Args:
+        history_model (models.Model): the FieldHistory model for the field
+        field (str): name of the tracked field
+        point (typing.Union[int, datetime.datetime]): clock tick or timestamp
+
+    Returns:
+        models.Subquery: subquery to annotate onto a queryset of the clocked model
+    """
+    history = history_model.objects \
+        .filter(entity=models.OuterRef('pk'), **history_point_filter(point)) \
+        .values(field)
+    return models.Subquery(history[:1])
+
+
+def activity_clock_query(clock_query: models.QuerySet, activity_model: type) -> models.QuerySet:
+    """
+    Apply an activity model's loading options to a query of clock ticks
+
+    Activity models can declare how their related objects should be loaded along with each tick, with paths
+    relative to the activity:
+
+    - ``temporal_select_related``: relations to join in the clock query
+    - ``temporal_prefetch_related``: relations to load with one extra query per relation
+    - ``temporal_only``: the only activity fields to load
+
+    For anything else, a ``temporal_queryset_options`` static method is given the clock query, and the
+    queryset it returns is used.
+
+    Args:
+        clock_query (models.QuerySet): query of EntityClock ticks
+        activity_model (type): the activity model of the clocked model
+
+    Returns:
+        models.QuerySet: the clock query, loading activities with their related objects
+    """
+    def activity_paths(paths):
+        return ['activity__%s' % path for path in paths]
+
+    clock_query = clock_query.select_related(
+        'activity', *activity_paths(getattr(activity_model, 'temporal_select_related', ())))
+
+    prefetch_related = getattr(activity_model, 'temporal_prefetch_related', ())
+    if prefetch_related:
+        clock_query = clock_query.prefetch_related(*activity_paths(prefetch_related))
+
+    only = getattr(activity_model, 'temporal_only', None)
+    if only is not None:
+        clock_query = clock_query.only('tick', 'timestamp', 'entity', 'activity', *activity_paths(only))
+
+    if hasattr(activity_model, 'temporal_queryset_options'):
+        clock_query = activity_model.temporal_queryset_options(clock_query)
+
+    return clock_query
+
+
+def iter_with_prefetch(queryset: models.QuerySet, chunk_size: int = 100) -> typing.Iterator[models.Model]:
+    """
+    Iterate over a queryset with a server-side cursor without losing its prefetch_related lookups
+
+    ``QuerySet.iterator`` ignores ``prefetch_related``, so the lookups are applied to each chunk of rows as it
+    is read instead, costing one query per lookup per chunk.
+
+    Args:
+        queryset (models.QuerySet): the queryset to iterate over
+        chunk_size (int): the number of rows to prefetch related objects for at a time
+    """
+    lookups = queryset._prefetch_related_lookups
+    if not lookups:
+        yield from queryset.iterator()
+        return
+
+    rows = queryset.prefetch_related(None).iterator()
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        models.prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def history_lookup_filter(model: type, key: str, value: typing.Any) -> typing.Optional[models.Q]:
+    """
+    Translate a ``<field>__ever`` or ``<field>__during`` lookup into a filter on the field's history
+
+    ``<field>__ever=value`` matches entities that have ever had the value. ``<field>__during=(value, period)``
+    matches entities that had the value at some point during a period, given as a ``DateTimeTZRange`` or a
+    ``(start, end)`` tuple. Both are answered from the history table, where they can use the indexes
+    configured with ``history_indexes``.
+
+    Args:
+        model (type): the clocked model being filtered
+        key (str): the lookup, e.g. ``status__ever``
+        value (typing.Any): the value of the lookup
+
+    Returns:
+        typing.Optional[models.Q]: the filter, or None if the lookup isn't a history lookup
+    """
+    field, _, lookup = key.rpartition('__')
+    history_models = getattr(model.temporal_options, 'history_models', None) or {}
+    if lookup not in ('ever', 'during') or field not in history_models:
+        return None
+
+    if lookup == 'ever':
+        history_filter = {field: value}
+    else:
+        value, period = value
+        if isinstance(period, tuple):
+            period = DateTimeTZRange(*period)
+        history_filter = {field: value, 'effective__overlap': period}
+
+    history = history_models[field].objects.filter(**history_filter).values('entity_id')
+    # Filter on the query rather than the queryset, which may be routed to a read database
+    return models.Q(pk__in=history.query)
+
+
+class ClockedQuerySet(models.QuerySet):
+    """QuerySet with temporal operations for Clocked models"""
+
+    def _filter_or_exclude(self, negate, *args, **kwargs):
+        """Adds support for ``<field>__ever`` and ``<field>__during`` lookups on tracked fields"""
+        history_filters = []
+        for key in list(kwargs):
+            history_filter = history_lookup_filter(self.model, key, kwargs[key])
+            if history_filter is not None:
+                history_filters.append(history_filter)
+                del kwargs[key]
+
+        return super()._filter_or_exclude(negate, *(args + tuple(history_filters)), **kwargs)
+
+    def temporal_diff(self,
+                      from_point: typing.Union[int, datetime.datetime],
+                      to_point: typing.Union[int, datetime.datetime]) -> typing.Dict[typing.Any, dict]:
+        """
+        Compute the tracked fields that differ between two ticks or timestamps
+
+        The before and after values of every tracked field are selected in a single query using correlated
+        subqueries against the history tables, so the cost does not depend on the number of ticks in
+        between.
+
+        Args:
+            from_point (typing.Union[int, datetime.datetime]): clock tick or timestamp to diff from
+            to_point (typing.Union[int, datetime.datetime]): clock tick or timestamp to diff to
+
+        Returns:
+            typing.Dict[typing.Any, dict]: mapping of primary key to ``{field_name: TemporalFieldDiff}`` for
+            every entity with at least one changed field
+        """
+        from .models import TemporalFieldDiff
+
+        history_models = self.model.temporal_options.history_models
+        annotations = {}
+        columns = []
+        for field in self.model.temporal_options.temporal_fields:
+            before, after = 'temporal_before_%s' % field, 'temporal_after_%s' % field
+            annotations[before] = history_value_subquery(history_models[field], field, from_point)
+            annotations[after] = history_value_subquery(history_models[field], field, to_point)
+            columns.append((field, before, after))
+
+        rows = self.annotate(**annotations).values('pk', *annotations.keys())
+
+        diffs = {}
+        for row in rows:
+            changed_fields = {
+                field: TemporalFieldDiff(before=row[before], after=row[after])
+                for field, before, after in columns
+                if row[before] != row[after]
+            }
+            if changed_fields:
+                diffs[row['pk']] = changed_fields
+
+        return diffs
+
+    def revert_to(self,
+                  point: typing.Union[int, datetime.datetime],
+                  activity: typing.Optional[models.Model] = None) -> int:
+        """
+        Restore the tracked fields of every object in the queryset to their values at a tick or timestamp
+
+        The restored values are recorded as a new tick for each object that changes, all with the same
+        activity, using a few multi-row statements per thousand objects. Objects that did not exist yet at
+        that point are left alone.
+
+        Args:
+            point (typing.Union[int, datetime.datetime]): clock tick or timestamp to revert to
+            activity (typing.Optional[models.Model]): activity to record the new ticks with
+
+        Returns:
+            int: the number of objects that were changed
+        """
+        from .revert import revert_queryset
+        return revert_queryset(self, point, activity)
+
+    def delete(self,
+               activity: typing.Optional[models.Model] = None) -> typing.Tuple[int, typing.Dict[str, int]]:
+        """
+        Soft delete every object in the queryset
+
+        Each object gets a tombstone tick, recorded with the activity, that closes its open history ranges,
+        and its ``deleted_tick`` is set, which hides it from the default manager. The objects are never
+        loaded; a few multi-row statements are run per thousand objects. Objects that are already deleted are
+        left alone.
+
+        Args:
+            activity (typing.Optional[models.Model]): activity to record the tombstone ticks with
+
+        Returns:
+            typing.Tuple[int, typing.Dict[str, int]]: the number of objects deleted, in total and by model,
+            like ``QuerySet.delete``
+        """
+        from .delete import delete_queryset
+        deleted = delete_queryset(self, activity)
+        return deleted, {self.model._meta.label: deleted}
+    delete.alters_data = True
+
+
+class ClockedManager(models.Manager.from_queryset(ClockedQuerySet)):
+    """
+    Manager for Clocked models
+
+    Deleted objects are hidden, unless ``include_deleted`` is set.
+    """
+
+    def __init__(self, include_deleted: bool = False):
+        super().__init__()
+        self.include_deleted = include_deleted
+
+    def get_queryset(self) -> ClockedQuerySet:
+        queryset = super().get_queryset()
+        if not self.include_deleted:
+            queryset = queryset.filter(deleted_tick__isnull=True)
+        return queryset
@@ -0,0 +1,32 @@
+"""
+Registry of clocked models.
+
+add_clock registers every model it decorates here, so that operations spanning all clocked models, such as
+finding everything an activity changed, can find their clock and history tables.
+"""
+import typing
+
+
+_clocked_models = []  # type: typing.List[type]
+
+
+def register_clocked_model(model: type):
+    """Add a model to the registry; called by add_clock"""
+    if model not in _clocked_models:
+        _clocked_models.append(model)
+
+
+def clocked_models(activity_model: typing.Optional[type] = None) -> typing.List[type]:
+    """
+    Returns the registered clocked models
+
+    Args:
+        activity_model (typing.Optional[type]): only return the models that record this activity model
+
+    Returns:
+        typing.List[type]: the clocked models, in the order they were registered
+    """
+    return [
+        model for model in _clocked_models
+        if activity_model is None or model.temporal_options.activity_model is activity_model
+    ]
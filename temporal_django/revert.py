@@ -0,0 +1,107 @@
+"""
+Reverting clocked objects to an earlier state.
+
+Implements the set-based revert behind ``ClockedQuerySet.revert_to``, which restores the tracked fields of
+many objects from their history and records the restored values as a new tick, using the bulk writes of
+temporal_batch.
+"""
+import datetime
+import itertools
+import typing
+
+from django.db import connections, models
+
+from .batch import _values_list_sql, temporal_batch
+from .query import history_point_filter, history_value_subquery
+
+
+def revert_queryset(queryset: models.QuerySet,
+                    point: typing.Union[int, datetime.datetime],
+                    activity: typing.Optional[models.Model] = None,
+                    chunk_size: int = 1000) -> int:
+    """
+    Restore the tracked fields of every object in a queryset to their values at a tick or timestamp
+
+    Objects are read with their values at that point in chunks. For each chunk, the tracked fields of the
+    objects that differ are written back with one UPDATE, and their new ticks are written by the batch with a
+    few multi-row statements. Objects that did not exist yet at that point, and deleted objects, are left
+    alone.
+
+    Args:
+        queryset (models.QuerySet): the objects to revert
+        point (typing.Union[int, datetime.datetime]): clock tick or timestamp to revert to
+        activity (typing.Optional[models.Model]): activity to record the new ticks with
+        chunk_size (int): the number of objects to revert at a time
+
+    Returns:
+        int: the number of objects that were changed
+    """
+    temporal_options = queryset.model.temporal_options
+    history_models = temporal_options.history_models
+
+    annotations = {
+        'temporal_revert_%s' % field: history_value_subquery(history_models[field], field, point)
+        for field in temporal_options.temporal_fields
+    }
+    # Every tracked field gets a history row when the object is created, so any of them shows it existed
+    first_field = temporal_options.temporal_fields[0]
+    existed = history_models[first_field].objects.filter(**history_point_filter(point)).values('entity_id')
+    objs = queryset.filter(pk__in=existed.query, deleted_tick__isnull=True).annotate(**annotations).iterator()
+
+    reverted = 0
+    with temporal_batch(activity) as batch:
+        while True:
+            chunk = list(itertools.islice(objs, chunk_size))
+            if not chunk:
+                return reverted
+
+            changed = []
+            for obj in chunk:
+                for field, model_field in temporal_options.temporal_model_fields:
+                    setattr(obj, model_field.attname, getattr(obj, 'temporal_revert_%s' % field))
+
+                obj.activity = activity
+                obj._state._django_temporal_add = False
+                temporal_options._check_activity(obj)
+                changed_fields = temporal_options._changed_fields(obj)
+                if changed_fields:
+                    temporal_options._record_tick(obj, changed_fields)
+                    changed.append(obj)
+
+            if changed:
+                _update_tracked_fields(queryset.model, changed)
+                batch.flush()
+                reverted += len(changed)
+
+
+def _update_tracked_fields(model: type, objs: typing.List[models.Model]):
+    """Write the tracked fields of many objects in one statement"""
+    # The objects come from one queryset, so they are all written to the same database
+    using, _ = objs[0]._temporal_databases()
+    connection = connections[using]
+    model_fields = [model_field for _, model_field in model.temporal_options.temporal_model_fields]
+    rows = [
+        [obj.pk] + [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields]
+        for obj in objs
+    ]
+
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """ UPDATE {table_name} AS entity
+                SET {assignments}
+                FROM (VALUES {values}) AS v ({columns})
+                WHERE entity.{pk} = v.temporal_pk
+            """.format(
+                table_name=quote_name(model._meta.db_table),
+                assignments=', '.join(
+                    '{column} = v.{column}::{db_type}'.format(column=quote_name(field.column),
+                                                              db_type=field.db_type(connection))
+                    for field in model_fields
+                ),
+                values=_values_list_sql(rows),
+                columns=', '.join(['temporal_pk'] + [quote_name(field.column) for field in model_fields]),
+                pk=quote_name(model._meta.pk.column),
+            ),
+            [value for row in rows for value in row]
+        )
@@ -0,0 +1,38 @@
+"""
+Routing of history reads to a read replica.
+
+Closed history never changes, so it can be read from a replica even while it lags behind the primary. Set
+``TEMPORAL_READ_DATABASE`` to the alias of the replica in your Django settings, and timelines, first and
+latest ticks and point-in-time reads are served from it, falling back to the primary for objects whose latest
+tick the replica hasn't replayed yet. Add ``TemporalReadRouter`` to ``DATABASE_ROUTERS`` to also send every
+other read of clock and history models, such as the ``<field>_history`` managers, to the replica.
+"""
+import typing
+
+from django.conf import settings
+
+
+def read_database() -> typing.Optional[str]:
+    """The database alias configured for history reads, if any"""
+    return getattr(settings, 'TEMPORAL_READ_DATABASE', None)
+
+
+class TemporalReadRouter:
+    """Database router sending reads of clock and history models to ``TEMPORAL_READ_DATABASE``"""
+
+    def db_for_read(self, model, **hints):
+        from .models import EntityClock, FieldHistory
+
+        if issubclass(model, (EntityClock, FieldHistory)):
+            return read_database()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        from .models import EntityClock, FieldHistory
+
+        history_models = (EntityClock, FieldHistory)
+        if read_database() is not None and \
+                (isinstance(obj1, history_models) or isinstance(obj2, history_models)):
+            # History read from the replica still belongs to the object on the primary
+            return True
+        return None
@@ -0,0 +1,94 @@
+"""
+Server-side prepared statements for the SQL run on every tick.
+
+Every save of a clocked object runs the same handful of statements against its clock and history tables.
+Set ``TEMPORAL_PREPARED_STATEMENTS = True`` in your Django settings to prepare each of them once per database
+connection, the first time it is used, and execute the prepared statement from then on, so postgres doesn't
+parse and plan the same SQL on every save. It is off by default, since prepared statements break behind a
+pooler in transaction mode, such as PgBouncer, where consecutive statements may run on different sessions.
+"""
+import hashlib
+import typing
+import weakref
+
+from django.conf import settings
+from django.db import connections, models, router
+
+
+# The names of the statements prepared on each raw database connection, or None when they need to be re-read
+_prepared = weakref.WeakKeyDictionary()  # type: typing.MutableMapping[typing.Any, typing.Optional[set]]
+
+
+def execute_prepared(sql: str, params: typing.List[typing.Any], using: str):
+    """
+    Execute a statement as a prepared statement, if they are turned on
+
+    The statement is prepared in the same round trip as its first execution on each connection.
+
+    Args:
+        sql (str): the statement, with a ``%s`` placeholder for each parameter
+        params (typing.List[typing.Any]): the parameters of the statement
+        using (str): the alias of the database to execute the statement on
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if not getattr(settings, 'TEMPORAL_PREPARED_STATEMENTS', False):
+            cursor.execute(sql, params)
+            return
+
+        numbered_sql = sql % tuple('$%s' % (i + 1) for i in range(len(params)))
+        name = 'temporal_%s' % hashlib.md5(numbered_sql.encode('utf-8')).hexdigest()[:20]
+        execute_sql = 'EXECUTE %s (%s)' % (name, ', '.join(['%s'] * len(params)))
+
+        names = _prepared_names(connection, cursor)
+        if name in names:
+            cursor.execute(execute_sql, params)
+            return
+
+        try:
+            cursor.execute('PREPARE %s AS %s; %s' % (name, numbered_sql, execute_sql), params)
+        except Exception:
+            # PREPARE isn't transactional and may or may not have run, so check before the next use
+            _prepared[connection.connection] = None
+            raise
+        names.add(name)
+
+
+def insert_prepared(obj: models.Model):
+    """
+    Insert a new model instance using a prepared statement
+
+    Like ``Model.save`` for a new object, the instance is written to the database the routers pick for it and
+    field defaults and ``pre_save`` hooks such as ``auto_now_add`` are applied, but no signals are sent.
+
+    Args:
+        obj (models.Model): the instance to insert, with its primary key already set
+    """
+    using = router.db_for_write(type(obj), instance=obj)
+    connection = connections[using]
+    opts = obj._meta
+    fields = opts.local_concrete_fields
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        connection.ops.quote_name(opts.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+    execute_prepared(sql, params, using)
+
+    obj._state.adding = False
+    obj._state.db = using
+
+
+def _prepared_names(connection, cursor) -> typing.Set[str]:
+    """The names of the statements prepared on a connection"""
+    raw_connection = connection.connection
+    names = _prepared.get(raw_connection)
+    if names is None:
+        if raw_connection in _prepared:
+            cursor.execute("SELECT name FROM pg_prepared_statements WHERE name LIKE 'temporal\\_%'")
+            names = {row[0] for row in cursor.fetchall()}
+        else:
+            names = set()
+        _prepared[raw_connection] = names
+    return names
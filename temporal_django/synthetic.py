@@ -0,0 +1,357 @@
+"""
+Synthetic history for testing at production scale.
+
+generate_history creates objects of a clocked model with a given number of ticks each, writing the objects,
+their clock and the history of every tracked field straight to the tables with ``COPY`` instead of saving
+them one tick at a time. The history is valid: each field's ``vclock`` and ``effective`` ranges cover every
+tick from the first on without overlapping, the latest ranges are open, and the objects hold the values of
+their latest ticks, so they can be read and saved like any other object afterwards.
+
+Every tick changes each tracked field with a configurable probability, and at least one field. The first tick
+sets every field. The time between an object's ticks is random, exponentially distributed around a mean.
+No outbox events are written.
+"""
+import datetime
+import decimal
+import io
+import random
+import time
+import typing
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+
+
+GeneratedHistory = typing.NamedTuple('GeneratedHistory', [
+    ('entities', int),
+    ('ticks', int),
+    ('history_rows', int),
+    ('seconds', float),
+])
+
+
+def generate_history(model: type,
+                     entities: int,
+                     ticks: int,
+                     change_rates: typing.Optional[typing.Dict[str, float]] = None,
+                     default_change_rate: float = 0.5,
+                     start: typing.Optional[datetime.datetime] = None,
+                     mean_interval: datetime.timedelta = datetime.timedelta(hours=1),
+                     seed: typing.Optional[int] = None,
+                     chunk_size: int = 1000) -> GeneratedHistory:
+    """
+    Create objects of a clocked model with synthetic history
+
+    Args:
+        model (type): the clocked model
+        entities (int): the number of objects to create
+        ticks (int): the number of ticks of each object
+        change_rates (typing.Optional[typing.Dict[str, float]]): the probability that a tick changes a tracked
+            field, by field
+        default_change_rate (float): the probability that a tick changes any other tracked field
+        start (typing.Optional[datetime.datetime]): when the first ticks happen, by default far enough in the
+            past for the latest ticks to happen around now
+        mean_interval (datetime.timedelta): the mean time between an object's ticks
+        seed (typing.Optional[int]): seed for the random generator, to generate the same values and tick times
+            every time. Primary keys are always new, so the same seed can be used again on the same database
+        chunk_size (int): the number of objects to write with each ``COPY``
+
+    Returns:
+        GeneratedHistory: the number of objects, ticks and history rows written, and how long it took
+
+    Raises:
+        ValueError: if the model has fields synthetic values can't be generated for
+    """
+    temporal_options = model.temporal_options
+    assert entities > 0 and ticks > 0, 'Generate at least one object with at least one tick'
+    for field in change_rates or {}:
+        assert field in temporal_options.temporal_fields, '%s is not a temporal field on %s' % (
+            field, model.__name__)
+    if model._meta.parents:
+        raise ValueError('Synthetic history can\'t be generated for %s, which inherits from another '
+                         'concrete model' % model.__name__)
+
+    rates = [(field, (change_rates or {}).get(field, default_change_rate))
+             for field in temporal_options.temporal_fields]
+    if start is None:
+        start = timezone.now() - mean_interval * ticks
+    if settings.USE_TZ and timezone.is_naive(start):
+        start = timezone.make_aware(start)
+
+    generator = _HistoryGenerator(model, random.Random(seed), rates, mean_interval)
+    began = time.perf_counter()
+    history_rows = 0
+    with transaction.atomic():
+        activity_ids = _create_activities(model, ticks)
+        for offset in range(0, entities, chunk_size):
+            count = min(chunk_size, entities - offset)
+            history_rows += generator.write_chunk(_entity_ids(model, count), ticks, start, activity_ids)
+
+    return GeneratedHistory(entities, entities * ticks, history_rows, time.perf_counter() - began)
+
+
+def _create_activities(model: type, ticks: int) -> typing.Optional[list]:
+    """Create an activity for each tick number, shared by the objects' ticks with that number"""
+    activity_model = model.temporal_options.activity_model
+    if activity_model is None:
+        return None
+    try:
+        with transaction.atomic():
+            activities = activity_model.objects.bulk_create([activity_model() for _ in range(ticks)])
+    except IntegrityError as e:
+        raise ValueError('Synthetic history needs activities of %s with default values: %s' % (
+            activity_model.__name__, e))
+    return [activity.pk for activity in activities]
+
+
+def _entity_ids(model: type, count: int) -> list:
+    """Primary keys for new objects, from the table's sequence or random UUIDs"""
+    pk = model._meta.pk
+    if isinstance(pk, models.UUIDField):
+        return [uuid.uuid4() for _ in range(count)]
+    if isinstance(pk, models.AutoField):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                           [model._meta.db_table, pk.column, count])
+            return [row[0] for row in cursor.fetchall()]
+    raise ValueError('Synthetic history can\'t be generated for %s, which has a %s primary key' % (
+        model.__name__, type(pk).__name__))
+
+
+class _HistoryGenerator:
+    """Writes the objects, clock and field history of chunks of synthetic objects"""
+
+    def __init__(self,
+                 model: type,
+                 rng: random.Random,
+                 rates: typing.List[typing.Tuple[str, float]],
+                 mean_interval: datetime.timedelta):
+        self.model = model
+        self.rng = rng
+        self.rates = rates
+        self.mean_seconds = mean_interval.total_seconds()
+        self.counter = 0
+
+        self.entity_fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+        tracked_fields = {field for field, _ in rates}
+        for field in self.entity_fields:
+            generated = field.name in tracked_fields or not (field.has_default() or field.null)
+            if generated and not field.null and not _can_generate(field):
+                # Fail before writing anything
+                raise ValueError('Synthetic values can\'t be generated for %s.%s, a %s' % (
+                    model.__name__, field.name, field.get_internal_type()))
+
+    def write_chunk(self,
+                    entity_ids: list,
+                    ticks: int,
+                    start: datetime.datetime,
+                    activity_ids: typing.Optional[list]) -> int:
+        """Write a chunk of objects with all of their ticks, returning the number of history rows written"""
+        temporal_options = self.model.temporal_options
+        model_fields = dict(temporal_options.temporal_model_fields)
+        entity_rows = io.StringIO()
+        clock_rows = io.StringIO()
+        history_rows = {field: io.StringIO() for field in model_fields}
+        history_count = 0
+
+        for entity_id in entity_ids:
+            times = self._tick_times(start, ticks)
+            # The open history row of each field: (first tick, value)
+            current = {}
+            for tick, timestamp in enumerate(times, 1):
+                clock = [uuid.uuid4(), tick, entity_id, timestamp]
+                if activity_ids is not None:
+                    clock.append(activity_ids[tick - 1])
+                _write_row(clock_rows, clock)
+
+                for field in self._changed_fields(tick):
+                    if field in current:
+                        first_tick, value = current[field]
+                        self._write_history(history_rows[field], entity_id, times, first_tick, tick, value)
+                        history_count += 1
+                    current[field] = (tick, self.value(model_fields[field], timestamp))
+
+            for field, (first_tick, value) in current.items():
+                self._write_history(history_rows[field], entity_id, times, first_tick, None, value)
+                history_count += 1
+            _write_row(entity_rows, [entity_id] + [
+                self._entity_value(field, current, ticks, times[-1]) for field in self.entity_fields
+            ])
+
+        pk_column = self.model._meta.pk.column
+        _copy(self.model._meta.db_table, [pk_column] + [f.column for f in self.entity_fields], entity_rows)
+        clock_columns = ['id', 'tick', 'entity_id', 'timestamp']
+        if activity_ids is not None:
+            clock_columns.append('activity_id')
+        _copy(temporal_options.clock_model._meta.db_table, clock_columns, clock_rows)
+        for field, rows in history_rows.items():
+            history_model = temporal_options.history_models[field]
+            _copy(history_model._meta.db_table,
+                  ['id', 'entity_id', 'effective', 'vclock', model_fields[field].column], rows)
+        return history_count
+
+    def value(self, field: models.Field, timestamp: datetime.datetime) -> typing.Any:
+        """A synthetic value for a field, converted for the database"""
+        self.counter += 1
+        value = _generate_value(field, self.rng, self.counter, timestamp)
+        return field.get_db_prep_save(value, connection)
+
+    def _tick_times(self, start: datetime.datetime, ticks: int) -> typing.List[datetime.datetime]:
+        """Increasing times of an object's ticks, at random intervals"""
+        offset = self.rng.uniform(0, self.mean_seconds)
+        times = []
+        for _ in range(ticks):
+            times.append(start + datetime.timedelta(seconds=offset))
+            offset += max(self.rng.expovariate(1 / self.mean_seconds) if self.mean_seconds else 0, 1e-3)
+        return times
+
+    def _changed_fields(self, tick: int) -> typing.List[str]:
+        """The fields a tick changes: all of them at first, then each at its change rate, but at least one"""
+        if tick == 1:
+            return [field for field, _ in self.rates]
+        changed = [field for field, rate in self.rates if self.rng.random() < rate]
+        if not changed:
+            # Saves that change nothing don't record a tick
+            changed = [self._weighted_field()]
+        return changed
+
+    def _weighted_field(self) -> str:
+        """A random field, picked in proportion to the change rates"""
+        total = sum(rate for _, rate in self.rates)
+        if not total:
+            return self.rng.choice(self.rates)[0]
+        point = self.rng.uniform(0, total)
+        for field, rate in self.rates[:-1]:
+            point -= rate
+            if point <= 0:
+                return field
+        return self.rates[-1][0]
+
+    def _write_history(self, rows: io.StringIO, entity_id: typing.Any, times: list, first_tick: int,
+                       end_tick: typing.Optional[int], value: typing.Any):
+        upper_time = times[end_tick - 1] if end_tick is not None else None
+        _write_row(rows, [
+            uuid.uuid4(),
+            entity_id,
+            _Range(times[first_tick - 1], upper_time),
+            _Range(first_tick, end_tick),
+            value,
+        ])
+
+    def _entity_value(self, field: models.Field, current: dict, ticks: int,
+                      timestamp: datetime.datetime) -> typing.Any:
+        if field.name in current:
+            return current[field.name][1]
+        if field.name == 'vclock':
+            return ticks
+        if field.name == 'deleted_tick':
+            return None
+        if field.has_default():
+            return field.get_db_prep_save(field.get_default(), connection)
+        if field.null:
+            return None
+        return self.value(field, timestamp)
+
+
+class _Range:
+    """A half-open range to write in PostgreSQL's range syntax, unbounded above if upper is None"""
+
+    def __init__(self, lower: typing.Any, upper: typing.Any):
+        self.lower = lower
+        self.upper = upper
+
+    def __str__(self):
+        return '[%s,%s)' % (_format(self.lower), _format(self.upper) if self.upper is not None else '')
+
+
+def _text_value(field: models.Field, rng: random.Random, counter: int,
+                timestamp: datetime.datetime) -> str:
+    value = '%s-%s' % (field.name, counter)
+    return value[-field.max_length:] if field.max_length else value
+
+
+def _decimal_value(field: models.Field, rng: random.Random, counter: int,
+                   timestamp: datetime.datetime) -> decimal.Decimal:
+    whole_digits = min(field.max_digits - field.decimal_places, 9)
+    return decimal.Decimal(rng.randint(0, 10 ** whole_digits - 1))
+
+
+def _integer_value(field: models.Field, rng: random.Random, counter: int,
+                   timestamp: datetime.datetime) -> int:
+    return rng.randint(0, 32767)
+
+
+def _boolean_value(field: models.Field, rng: random.Random, counter: int,
+                   timestamp: datetime.datetime) -> bool:
+    return rng.random() < 0.5
+
+
+_VALUE_GENERATORS = {
+    'CharField': _text_value,
+    'TextField': _text_value,
+    'SlugField': _text_value,
+    'EmailField': _text_value,
+    'URLField': _text_value,
+    'IntegerField': _integer_value,
+    'BigIntegerField': _integer_value,
+    'SmallIntegerField': _integer_value,
+    'PositiveIntegerField': _integer_value,
+    'PositiveSmallIntegerField': _integer_value,
+    'FloatField': lambda field, rng, counter, timestamp: rng.uniform(0, 1000),
+    'DecimalField': _decimal_value,
+    'BooleanField': _boolean_value,
+    'NullBooleanField': _boolean_value,
+    'DateTimeField': lambda field, rng, counter, timestamp: timestamp,
+    'DateField': lambda field, rng, counter, timestamp: timestamp.date(),
+    'UUIDField': lambda field, rng, counter, timestamp: uuid.UUID(int=rng.getrandbits(128), version=4),
+    'JSONField': lambda field, rng, counter, timestamp: {'field': field.name, 'counter': counter},
+}
+
+
+def _generate_value(field: models.Field,
+                    rng: random.Random,
+                    counter: int,
+                    timestamp: datetime.datetime) -> typing.Any:
+    """A synthetic value for a model field of a common type, or None for nullable fields of other types"""
+    if field.choices:
+        return rng.choice([choice for choice, _ in field.flatchoices])
+    generator = _VALUE_GENERATORS.get(field.get_internal_type())
+    return generator(field, rng, counter, timestamp) if generator is not None else None
+
+
+def _can_generate(field: models.Field) -> bool:
+    """Whether synthetic values can be generated for a model field"""
+    return bool(field.choices) or field.get_internal_type() in _VALUE_GENERATORS
+
+
+def _format(value: typing.Any) -> str:
+    """Format a value as text for COPY, before escaping"""
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, 'adapted'):
+        # psycopg2's Json adapter
+        return value.dumps(value.adapted)
+    return str(value)
+
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _write_row(rows: io.StringIO, values: list):
+    rows.write('\t'.join(
+        '\\N' if value is None else _format(value).translate(_COPY_ESCAPES) for value in values
+    ))
+    rows.write('\n')
+
+
+def _copy(table_name: str, columns: typing.List[str], rows: io.StringIO):
+    rows.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert('COPY %s (%s) FROM STDIN' % (
+            connection.ops.quote_name(table_name),
+            ', '.join(connection.ops.quote_name(column) for column in columns),
+        ), rows)
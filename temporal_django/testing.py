@@ -0,0 +1,97 @@
+"""
+Test helpers for pinning the queries temporal operations make.
+
+Performance regressions in temporal code usually show up as extra round trips: one more statement per save,
+or one query per tick of a timeline. ``QueryBudgetMixin.assertStatements`` checks the exact sequence of
+statements a block of code runs, summarized as their shapes, e.g. ``INSERT tests_item_clock``, so tests fail
+when a statement is added, removed, reordered or starts touching other tables, and say which.
+
+Shapes see through the ways temporal_django sends SQL: prepared statements have the shape of the statement
+they execute, whether or not they were prepared in the same round trip, and server-side cursors have the
+shape of the query they were declared for. Rows fetched from a server-side cursor aren't statements of their
+own, so long timelines don't change their shape.
+"""
+import contextlib
+import re
+import typing
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+_PREPARE_AND_EXECUTE = re.compile(r'^PREPARE (\w+) AS (.*); EXECUTE \1 \(', re.DOTALL)
+_EXECUTE = re.compile(r'^EXECUTE (\w+)')
+_DECLARE_CURSOR = re.compile(r'^DECLARE \S+ .*?CURSOR .*?FOR (.*)', re.DOTALL)
+# Tables follow these keywords; names followed by a parenthesis are functions, e.g. FROM unnest(...)
+_TABLE = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+"?(\w+)"?(?=[\s,;)]|$)', re.IGNORECASE)
+
+
+def statement_shape(sql: str, prepared: typing.Optional[typing.Dict[str, str]] = None) -> str:
+    """
+    Summarize a statement as its command and the tables it reads or writes
+
+    Args:
+        sql (str): the statement
+        prepared (typing.Optional[typing.Dict[str, str]]): the SQL of prepared statements by name, to see
+            through ``EXECUTE``
+
+    Returns:
+        str: the shape, e.g. ``SELECT tests_item_clock, tests_itemactivity`` or ``SAVEPOINT``
+    """
+    sql = sql.strip()
+    match = _PREPARE_AND_EXECUTE.match(sql)
+    if match is not None:
+        sql = match.group(2).strip()
+    match = _EXECUTE.match(sql)
+    if match is not None and prepared and match.group(1) in prepared:
+        sql = prepared[match.group(1)].strip()
+    match = _DECLARE_CURSOR.match(sql)
+    if match is not None:
+        sql = match.group(1).strip()
+
+    words = sql.split(None, 2)
+    command = words[0].upper()
+    if command in ('SAVEPOINT', 'RELEASE', 'ROLLBACK'):
+        return ' '.join(word.upper() for word in words[:2] if not word.startswith('"'))
+
+    tables = []
+    for table in _TABLE.findall(sql):
+        if table not in tables:
+            tables.append(table)
+    return ' '.join([command, ', '.join(tables)]).strip()
+
+
+def statement_shapes(captured_queries: typing.List[typing.Dict[str, str]], connection) -> typing.List[str]:
+    """The shapes of the statements captured by a ``CaptureQueriesContext``"""
+    prepared = {}
+    if any(_EXECUTE.match(query['sql']) for query in captured_queries):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT name, statement FROM pg_prepared_statements')
+            prepared = {
+                name: re.sub(r'^PREPARE \w+ AS ', '', statement, flags=re.IGNORECASE).split('; EXECUTE ')[0]
+                for name, statement in cursor.fetchall()
+            }
+    return [statement_shape(query['sql'], prepared) for query in captured_queries]
+
+
+class QueryBudgetMixin:
+    """TestCase mixin for pinning the statements that a block of code runs"""
+
+    @contextlib.contextmanager
+    def assertStatements(self, *shapes: str, using: str = DEFAULT_DB_ALIAS):
+        """
+        Assert that a block runs exactly the given statements, in order
+
+        Args:
+            *shapes (str): the shape of each statement, as returned by ``statement_shape``
+            using (str): the database alias to capture statements on
+        """
+        connection = connections[using]
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        actual = statement_shapes(context.captured_queries, connection)
+        self.assertEqual(actual, list(shapes), 'Ran %d statements, expected %d:\n%s' % (
+            len(actual), len(shapes),
+            '\n'.join('%d. %s' % (i, query['sql']) for i, query in enumerate(context.captured_queries, 1)),
+        ))
@@ -0,0 +1 @@
+from temporal_django.management.commands.temporal_audit import Command  # noqa
@@ -0,0 +1 @@
+from temporal_django.management.commands.temporal_generate_history import Command  # noqa
@@ -1,8 +1,10 @@
 import uuid
 
+from django.contrib.postgres.fields import JSONField
 from django.db import models
 
 from temporal_django import Clocked, add_clock
+from temporal_django.cache import HistoryCache
 
 
 class TestModelActivity(models.Model):
@@ -70,3 +72,102 @@ class TestModelActivityWithEfficientRelationship(models.Model):
 class TestModelWithActivityWithEfficientRelationship(Clocked):
     """Another test model using the same activity model as the first"""
     title = models.CharField(max_length=100)
+
+
+class TestModelActivityWithDeclaredOptions(models.Model):
+    """An activity declaring how its related objects are loaded with each tick"""
+    desc = models.TextField()
+    notes = models.TextField(blank=True)
+    stub = models.ForeignKey(Stub, related_name='+')
+    tags = models.ManyToManyField(Stub, related_name='+')
+
+    temporal_select_related = ['stub']
+    temporal_prefetch_related = ['tags']
+    temporal_only = ['desc', 'stub__title']
+
+
+@add_clock('title', 'num', activity_model=TestModelActivityWithDeclaredOptions)
+class TestModelWithDeclaredActivityOptions(Clocked):
+    """A test model whose activity declares its loading options"""
+    title = models.CharField(max_length=100)
+    num = models.IntegerField()
+
+
+@add_clock('title', 'num', history_cache=HistoryCache(max_entries=16, cache_alias='default'))
+class CachedHistoryModel(Clocked):
+    """A test model with a cache in front of its history reads"""
+    title = models.CharField(max_length=100)
+    num = models.IntegerField()
+
+
+@add_clock('title', 'notes', 'attachment', 'data', digest_fields={'notes': 16, 'attachment': 16, 'data': 16})
+class DigestModel(Clocked):
+    """A test model that only keeps a digest of the original value of large notes, attachments and data"""
+    title = models.CharField(max_length=100)
+    notes = models.TextField(null=True)
+    attachment = models.BinaryField(null=True)
+    data = JSONField(null=True)
+
+
+@add_clock('title', 'num', activity_model=TestModelActivity, outbox=True, notify_channel='temporal_test')
+class OutboxModel(Clocked):
+    """A test model publishing its ticks to an outbox"""
+    title = models.CharField(max_length=100)
+    num = models.IntegerField()
+
+
+@add_clock('status', 'num', history_indexes={'status': ['btree', 'hash', 'gist', 'brin']},
+           vclock_exclusion=False)
+class IndexedHistoryModel(Clocked):
+    """A test model with indexes on the values in its history, and no vclock exclusion constraint"""
+    status = models.CharField(max_length=100)
+    num = models.IntegerField()
+
+
+@add_clock('title', 'num', outbox=True, coalesce_saves=True, history_cache=HistoryCache())
+class CoalescedModel(Clocked):
+    """A test model recording one tick per transaction"""
+    title = models.CharField(max_length=100)
+    num = models.IntegerField()
+
+
+@add_clock('title', 'num', 'notes', 'status', 'amount', 'flag', 'due', 'score',
+           'ref', 'data', 'seen', 'address')
+class ManyFieldsModel(Clocked):
+    """A test model tracking many fields, of many types, alongside untracked fields"""
+    title = models.CharField(max_length=100)
+    num = models.IntegerField()
+    notes = models.TextField(blank=True)
+    status = models.CharField(max_length=20, default='NEW',
+                              choices=[('NEW', 'New'), ('OPEN', 'Open'), ('CLOSED', 'Closed')])
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    flag = models.BooleanField(default=False)
+    due = models.DateField(null=True)
+    score = models.FloatField(default=0)
+    ref = models.UUIDField(null=True)
+    data = JSONField(null=True)
+    seen = models.DateTimeField(null=True)
+    address = models.GenericIPAddressField(null=True)
+
+    label = models.CharField(max_length=20)
+    priority = models.IntegerField(default=3)
+    remarks = models.TextField(null=True)
+
+
+@add_clock('title')
+class NaturalKeyModel(Clocked):
+    """A test model whose primary key is one of its values"""
+    code = models.CharField(max_length=10, primary_key=True)
+    title = models.CharField(max_length=100)
+
+
+@add_clock('address')
+class AddressModel(Clocked):
+    """A test model with a required field of a type synthetic values aren't generated for"""
+    address = models.GenericIPAddressField()
+
+
+@add_clock('num')
+class InheritingModel(Clocked, Stub):
+    """A test model inheriting from another concrete model"""
+    num = models.IntegerField()
@@ -34,7 +34,17 @@ def run_tests():
                     'HOST': postgresql.dsn()['host'],
                     'PORT': postgresql.dsn()['port'],
                 },
+                # Reads the same database, but over its own connection, so it can't see uncommitted writes
+                'replica': {
+                    'ENGINE': 'django.db.backends.postgresql',
+                    'NAME': postgresql.dsn()['database'],
+                    'USER': postgresql.dsn()['user'],
+                    'HOST': postgresql.dsn()['host'],
+                    'PORT': postgresql.dsn()['port'],
+                    'TEST': {'MIRROR': 'default'},
+                },
             },
+            'DATABASE_ROUTERS': ['temporal_django.routers.TemporalReadRouter'],
         }
 
         # Making Django run this way is a two-step process. First, call
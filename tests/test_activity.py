@@ -1,7 +1,22 @@
+import datetime
+
 from django.test import TestCase
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from freezegun import freeze_time
+
+from temporal_django.activity import activity_changes
+from temporal_django.registry import clocked_models
 
-from .models import TestModel, TestModelActivity, NoActivityModel, AnotherTestModel
+from .models import (
+    TestModel,
+    TestModelActivity,
+    NoActivityModel,
+    AnotherTestModel,
+    OutboxModel,
+    Stub,
+    TestModelActivityWithDeclaredOptions,
+    TestModelWithDeclaredActivityOptions,
+)
 
 
 class ActivityTests(TestCase):
@@ -105,3 +120,110 @@ class ActivityTests(TestCase):
         obj.save()
 
         self.assertEqual(obj.first_tick().activity, act)
+
+
+class ActivityChangesTests(TestCase):
+    def test_registry(self):
+        """Every clocked model should be registered, and can be looked up by activity model"""
+        self.assertIn(NoActivityModel, clocked_models())
+        self.assertEqual(clocked_models(TestModelActivity), [TestModel, AnotherTestModel, OutboxModel])
+
+    def test_activity_changes(self):
+        """Everything an activity changed should be found across models in one query"""
+        with freeze_time('2017-11-01'):
+            obj1 = TestModel(title='Test', num=1)
+            obj1.save(activity=TestModelActivity(desc='Create the first object'))
+
+        act = TestModelActivity(desc='Edit one object and create another')
+        with freeze_time('2017-11-02'):
+            obj1.num = 2
+            obj1.save(activity=act)
+        with freeze_time('2017-11-03'):
+            obj2 = AnotherTestModel(title='Another')
+            obj2.save(activity=act)
+
+        with self.assertNumQueries(1):
+            changes = activity_changes(act)
+
+        self.assertEqual([(c.model, c.entity_id, c.tick) for c in changes],
+                         [(TestModel, obj1.pk, 2), (AnotherTestModel, obj2.pk, 1)])
+        self.assertEqual(changes[0].changed_fields, {'num': 2})
+        self.assertEqual(changes[0].timestamp, datetime.datetime(2017, 11, 2))
+        self.assertEqual(changes[1].changed_fields, {'title': 'Another'})
+
+        self.assertEqual(activity_changes(TestModelActivityWithDeclaredOptions(pk=1)), [])
+        self.assertEqual(activity_changes(Stub(pk=1)), [])
+
+    def test_deletion_activity_changes(self):
+        """Deletions should be found as ticks that changed no fields"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+        act = TestModelActivity(desc='Delete the object')
+        obj.delete(activity=act)
+
+        changes = activity_changes(act)
+        self.assertEqual([(c.model, c.entity_id, c.tick, c.changed_fields) for c in changes],
+                         [(TestModel, obj.pk, 2, {})])
+
+    def test_activity_index(self):
+        """Clock tables should be indexed on the activity"""
+        for model in clocked_models(TestModelActivity):
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(
+                    cursor, model.temporal_options.clock_model._meta.db_table)
+            self.assertIn(['activity_id'], [c['columns'] for c in constraints.values() if c['index']])
+
+
+class ActivityLoadingOptionsTests(TestCase):
+    def setUp(self):
+        self.stubs = [Stub.objects.create(title='Stub %s' % i) for i in range(3)]
+        self.obj = TestModelWithDeclaredActivityOptions(title='Test', num=0)
+        for i in range(5):
+            with freeze_time(datetime.datetime(2017, 11, 1 + i)):
+                self.obj.num = i
+                self.obj.save(activity=self._activity('Tick %s' % (i + 1)))
+
+    def _activity(self, desc):
+        activity = TestModelActivityWithDeclaredOptions.objects.create(desc=desc, stub=self.stubs[0])
+        activity.tags.set(self.stubs)
+        return activity
+
+    def assertActivitiesLoaded(self, clocks):
+        with self.assertNumQueries(0):
+            for clock in clocks:
+                self.assertEqual(clock.activity.desc, 'Tick %s' % clock.tick)
+                self.assertEqual(clock.activity.stub.title, 'Stub 0')
+                self.assertEqual(len(clock.activity.tags.all()), 3)
+
+    def test_timeline(self):
+        """The timeline should load activities and their relations without a query per tick"""
+        obj = TestModelWithDeclaredActivityOptions.objects.get(pk=self.obj.pk)
+
+        # One query for the clock, one for the tags and one for each field
+        with self.assertNumQueries(4):
+            timeline = obj.temporal_timeline()
+        self.assertEqual(len(timeline), 5)
+        self.assertActivitiesLoaded([entry.clock for entry in timeline])
+
+        with self.assertNumQueries(4):
+            timeline = obj.temporal_timeline(limit=2, reverse=True)
+        self.assertActivitiesLoaded([entry.clock for entry in timeline])
+
+    def test_only(self):
+        """Only the declared activity fields should be loaded"""
+        clock = self.obj._temporal_clock_query().first()
+        self.assertEqual(clock.activity.get_deferred_fields(), {'notes'})
+
+    def test_as_of_and_ticks(self):
+        """Point-in-time reads and first/latest tick should load activities the same way"""
+        obj = TestModelWithDeclaredActivityOptions.objects.get(pk=self.obj.pk)
+
+        # One query for the clock, one for the tags and one for the values
+        with self.assertNumQueries(3):
+            snapshot = obj.temporal_as_of(datetime.datetime(2017, 11, 3, 12))
+        self.assertEqual(snapshot.values['num'], 2)
+        self.assertActivitiesLoaded([snapshot.clock])
+
+        with self.assertNumQueries(4):
+            ticks = [obj.first_tick(), obj.latest_tick()]
+        self.assertActivitiesLoaded(ticks)
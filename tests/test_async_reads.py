@@ -0,0 +1,147 @@
+import asyncio
+import datetime
+
+from django.core.cache import caches
+from django.db import InterfaceError, ProgrammingError, connection, connections
+from django.test import TransactionTestCase, override_settings
+from freezegun import freeze_time
+
+from temporal_django.async_reads import close_read_threads, run_read
+from temporal_django.cache import history_cache_key
+
+from .models import CachedHistoryModel, TestModel, TestModelActivity
+
+
+class AsyncReadTests(TransactionTestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.obj = TestModel(title='Test', num=1)
+        with freeze_time('2017-11-01'):
+            self.obj.save(activity=TestModelActivity(desc='Create the object'))
+        with freeze_time('2017-11-02'):
+            self.obj.title = 'Test 2'
+            self.obj.save(activity=TestModelActivity(desc='Edit the title'))
+        with freeze_time('2017-11-03'):
+            self.obj.num = 2
+            self.obj.save(activity=TestModelActivity(desc='Edit the number'))
+        self.obj = TestModel.objects.get(pk=self.obj.pk)
+
+    def tearDown(self):
+        self.loop.close()
+        close_read_threads()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_timeline(self):
+        """Async timelines should match the synchronous ones, however they are paginated"""
+        for kwargs in ({}, {'lightweight': True}, {'reverse': True}, {'since_tick': 2},
+                       {'limit': 2, 'reverse': True}, {'until_tick': 0, 'limit': 2}):
+            timeline = self.run_async(self.obj.atemporal_timeline(**kwargs))
+            self.assertEqual(timeline, self.obj.temporal_timeline(**kwargs), kwargs)
+
+        timeline = self.run_async(self.obj.atemporal_timeline())
+        self.assertEqual([(entry.clock.activity.desc, sorted(entry.changed_fields)) for entry in timeline], [
+            ('Create the object', ['num', 'title']),
+            ('Edit the title', ['title']),
+            ('Edit the number', ['num']),
+        ])
+
+    def test_cached_timeline(self):
+        """Async timelines should be cached and served from the history cache"""
+        history_cache = CachedHistoryModel.temporal_options.history_cache
+        history_cache.clear()
+        caches['default'].clear()
+        obj = CachedHistoryModel(title='Test', num=1)
+        obj.save()
+        obj.title = 'Test 2'
+        obj.save()
+
+        timeline = self.run_async(obj.atemporal_timeline())
+        self.assertEqual(timeline, obj.temporal_timeline())
+        self.assertEqual(history_cache.get(history_cache_key('timeline', obj, 2)), timeline)
+
+        cached = self.run_async(obj.atemporal_timeline())
+        self.assertEqual(cached, timeline)
+        self.assertIsNot(cached, timeline)
+
+    def test_ticks_and_as_of(self):
+        """Async first and latest ticks and point-in-time reads should match the synchronous ones"""
+        first_tick = self.run_async(self.obj.afirst_tick())
+        self.assertEqual((first_tick.tick, first_tick.activity.desc), (1, 'Create the object'))
+        self.assertEqual(self.run_async(self.obj.alatest_tick()).tick, 3)
+
+        # Cached on the instance like the synchronous ones
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj.latest_tick().tick, 3)
+
+        self.assertEqual(self.run_async(self.obj.atemporal_as_of(2)).values, {'title': 'Test 2', 'num': 1})
+        self.assertEqual(self.run_async(self.obj.atemporal_as_of(datetime.datetime(2017, 11, 1, 12))).values,
+                         {'title': 'Test', 'num': 1})
+        self.assertIsNone(self.run_async(self.obj.atemporal_as_of(0)))
+
+    def connection_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            return cursor.fetchone()[0]
+
+    def wait_for_connection_count(self, count):
+        # Backends leave pg_stat_activity shortly after their connections are closed
+        for _ in range(50):
+            if self.connection_count() <= count:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(0.1)')
+        self.assertEqual(self.connection_count(), count)
+
+    @override_settings(TEMPORAL_ASYNC_READ_THREADS=2)
+    def test_concurrent_reads_reuse_connections(self):
+        """Many reads at once should share the read threads, which keep their connections until closed"""
+        async def read_timelines():
+            return await asyncio.gather(*(
+                TestModel.objects.get(pk=self.obj.pk).atemporal_timeline(lightweight=True) for _ in range(20)
+            ))
+
+        before = self.connection_count()
+        for _ in range(2):
+            timelines = self.run_async(read_timelines())
+            self.assertTrue(all(timeline == timelines[0] for timeline in timelines))
+            self.assertEqual(len(timelines[0]), 3)
+            self.assertLessEqual(self.connection_count(), before + 2)
+
+        close_read_threads()
+        self.wait_for_connection_count(before)
+
+    @override_settings(TEMPORAL_ASYNC_READ_THREADS=1)
+    def test_broken_connection(self):
+        """A read thread should keep its connection after errors, unless it broke"""
+        def fail_query():
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT * FROM temporal_missing_table')
+
+        def backend_pid():
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                return cursor.fetchone()[0]
+
+        pid = self.run_async(run_read(backend_pid))
+        with self.assertRaises(ProgrammingError):
+            self.run_async(run_read(fail_query))
+        self.assertEqual(self.run_async(run_read(backend_pid)), pid)
+
+        def break_connection():
+            connections['default'].connection.close()
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        self.assertEqual(self.run_async(self.obj.alatest_tick()).tick, 3)
+        with self.assertRaises(InterfaceError):
+            self.run_async(run_read(break_connection))
+        self.assertEqual(self.run_async(self.obj.atemporal_as_of(2)).values, {'title': 'Test 2', 'num': 1})
+
+    @override_settings(TEMPORAL_ASYNC_READ_THREADS=0)
+    def test_no_read_threads(self):
+        """Without read threads, reads should run on the calling thread"""
+        before = self.connection_count()
+        self.assertEqual(self.run_async(self.obj.atemporal_timeline()), self.obj.temporal_timeline())
+        self.assertEqual(self.connection_count(), before)
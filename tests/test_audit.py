@@ -0,0 +1,95 @@
+import datetime
+import io
+import json
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from freezegun import freeze_time
+
+from temporal_django.audit import audit_stream
+
+from .models import AnotherTestModel, NoActivityModel, TestModel, TestModelActivity
+
+
+class AuditStreamTests(TestCase):
+    def setUp(self):
+        with freeze_time('2017-11-01'):
+            self.obj1 = TestModel(title='Test', num=1)
+            self.obj1.save(activity=TestModelActivity(desc='Create the first object'))
+        with freeze_time('2017-11-02'):
+            self.obj2 = NoActivityModel(title='No activity', num=1)
+            self.obj2.save()
+        with freeze_time('2017-11-03'):
+            self.obj1.num = 2
+            self.obj1.save(activity=TestModelActivity(desc='Edit the first object'))
+        with freeze_time('2017-11-04'):
+            self.obj3 = AnotherTestModel(title='Another')
+            self.obj3.save(activity=TestModelActivity(desc='Create another object'))
+        with freeze_time('2017-11-05'):
+            self.obj2.title = 'Still no activity'
+            self.obj2.save()
+
+    def test_merged_in_time_order(self):
+        """Changes to every clocked model should be merged into a single stream in time order"""
+        entries = list(audit_stream(datetime.datetime(2017, 11, 1), datetime.datetime(2017, 12, 1)))
+
+        self.assertEqual([(e.model, e.entity_id, e.tick) for e in entries], [
+            (TestModel, self.obj1.pk, 1),
+            (NoActivityModel, self.obj2.pk, 1),
+            (TestModel, self.obj1.pk, 2),
+            (AnotherTestModel, self.obj3.pk, 1),
+            (NoActivityModel, self.obj2.pk, 2),
+        ])
+        self.assertEqual([e.timestamp.day for e in entries], [1, 2, 3, 4, 5])
+        self.assertEqual(entries[0].changed_fields, {'title': 'Test', 'num': 1})
+        self.assertEqual(entries[2].changed_fields, {'num': 2})
+        self.assertEqual(entries[4].changed_fields, {'title': 'Still no activity'})
+        self.assertEqual(entries[2].activity_id, self.obj1.latest_tick().activity_id)
+        self.assertIsNone(entries[1].activity_id)
+
+    def test_window_and_models(self):
+        """Only changes in the window, to the requested models, should be streamed"""
+        entries = list(audit_stream(datetime.datetime(2017, 11, 2),
+                                    datetime.datetime(2017, 11, 5),
+                                    models=[TestModel, NoActivityModel]))
+
+        self.assertEqual([(e.model, e.tick) for e in entries], [(NoActivityModel, 1), (TestModel, 2)])
+
+    def test_batches(self):
+        """Changed fields should be looked up once per history table for each batch"""
+        since, until = datetime.datetime(2017, 11, 1), datetime.datetime(2017, 12, 1)
+        models = [TestModel, NoActivityModel]
+
+        # One query per clock table, and one per history table of each model in the batch
+        with self.assertNumQueries(2 + 4):
+            entries = list(audit_stream(since, until, models=models))
+        with self.assertNumQueries(2 + 2 * 4):
+            self.assertEqual(list(audit_stream(since, until, models=models, batch_size=2)), entries)
+
+
+class AuditCommandTests(TestCase):
+    def test_command(self):
+        """The management command should write the stream as JSON lines"""
+        with freeze_time('2017-11-01'):
+            obj = NoActivityModel(title='Test', num=1)
+            obj.save()
+
+        out = io.StringIO()
+        call_command('temporal_audit', '--since=2017-11-01', '--until=2017-11-02',
+                     '--model=tests.noactivitymodel', stdout=out)
+
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], [{
+            'model': 'tests.noactivitymodel',
+            'entity_id': obj.pk,
+            'tick': 1,
+            'timestamp': '2017-11-01T00:00:00',
+            'activity_id': None,
+            'changed_fields': {'title': 'Test', 'num': 1},
+        }])
+
+    def test_command_errors(self):
+        """Bad arguments should be reported"""
+        with self.assertRaises(CommandError):
+            call_command('temporal_audit', '--since=yesterday', '--until=2017-11-02')
+        with self.assertRaises(CommandError):
+            call_command('temporal_audit', '--since=2017-11-01', '--until=2017-11-02', '--model=tests.stub')
@@ -0,0 +1,114 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from temporal_django.batch import temporal_batch
+
+from .models import TestModel, TestModelActivity, AnotherTestModel, NoActivityModel
+
+
+class BatchTests(TestCase):
+    def test_batch_shares_activity(self):
+        """Every save in a batch should be recorded with the batch's activity, which is saved once"""
+        act = TestModelActivity(desc='Create many objects')
+
+        with temporal_batch(act):
+            objs = [TestModel(title='Test %s' % i, num=i) for i in range(5)]
+            for obj in objs:
+                obj.save()
+            other = AnotherTestModel(title='Another')
+            other.save()
+
+        self.assertEqual(TestModelActivity.objects.count(), 1)
+        for obj in objs + [other]:
+            self.assertEqual(obj.vclock, 1)
+            self.assertEqual(obj.first_tick().activity, act)
+
+        self.assertEqual(TestModel.objects.get(pk=objs[3].pk).vclock, 1)
+        self.assertEqual(objs[3].temporal_timeline()[0].changed_fields['num'].value, 3)
+
+    def test_batch_writes_history_in_bulk(self):
+        """The clock and history rows of a batch should be written with one statement per table"""
+        objs = [NoActivityModel(title='Test %s' % i, num=i) for i in range(10)]
+        for obj in objs:
+            obj.save()
+
+        clock_table = NoActivityModel.temporal_options.clock_model._meta.db_table
+        history_table = NoActivityModel.temporal_options.history_models['title']._meta.db_table
+
+        with CaptureQueriesContext(connection) as queries:
+            with temporal_batch():
+                for obj in objs:
+                    obj.title = 'Edited %s' % obj.num
+                    obj.save()
+
+        def statements(prefix, table):
+            return [q for q in queries.captured_queries if q['sql'].startswith(prefix + ' "%s"' % table)]
+
+        self.assertEqual(len(statements('INSERT INTO', clock_table)), 1)
+        self.assertEqual(len(statements('INSERT INTO', history_table)), 1)
+
+        for obj in objs:
+            saved_obj = NoActivityModel.objects.get(pk=obj.pk)
+            self.assertEqual(saved_obj.vclock, 2)
+            self.assertEqual(saved_obj.title_history.get(vclock__contains=1).title, 'Test %s' % obj.num)
+            self.assertEqual(saved_obj.title_history.get(vclock__contains=2).title, 'Edited %s' % obj.num)
+
+    def test_batch_coalesces_repeated_saves(self):
+        """Saving an object twice in a batch should only record one tick"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+
+        with temporal_batch(TestModelActivity(desc='Edit the object twice')):
+            obj.title = 'Test 2'
+            obj.save()
+            obj.num = 2
+            obj.save()
+
+        timeline = obj.temporal_timeline()
+        self.assertEqual(len(timeline), 2)
+        self.assertEqual(timeline[1].changed_fields['title'].value, 'Test 2')
+        self.assertEqual(timeline[1].changed_fields['num'].value, 2)
+        self.assertEqual(TestModel.objects.get(pk=obj.pk).vclock, 2)
+
+    def test_batch_is_atomic(self):
+        """Nothing in a batch should be saved if the block fails"""
+        with self.assertRaises(RuntimeError):
+            with temporal_batch(TestModelActivity(desc='Fail halfway')):
+                TestModel(title='Test', num=1).save()
+                raise RuntimeError('Halfway')
+
+        self.assertEqual(TestModel.objects.count(), 0)
+        self.assertEqual(TestModelActivity.objects.count(), 0)
+
+    def test_nested_batches(self):
+        """A nested batch should write the ticks of the enclosing batch before its own"""
+        obj = NoActivityModel(title='Test', num=1)
+        obj.save()
+
+        with temporal_batch():
+            obj.title = 'Outer'
+            obj.save()
+            with temporal_batch():
+                obj.num = 2
+                obj.save()
+            obj.title = 'Outer again'
+            obj.save()
+
+        self.assertEqual(NoActivityModel.objects.get(pk=obj.pk).vclock, 4)
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Test', 'num': 1}), (2, {'title': 'Outer'}), (3, {'num': 2}),
+                          (4, {'title': 'Outer again'})])
+
+    def test_batch_shares_timestamp(self):
+        """The clocks of a batch should have the timestamp its history took effect at"""
+        objs = [NoActivityModel(title='Test %s' % i, num=i) for i in range(3)]
+        with temporal_batch():
+            for obj in objs:
+                obj.save()
+
+        for obj in objs:
+            clock = obj.first_tick()
+            self.assertEqual(clock.timestamp, objs[0].first_tick().timestamp)
+            self.assertEqual(clock.timestamp, obj.title_history.get().effective.lower)
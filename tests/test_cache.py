@@ -0,0 +1,110 @@
+import datetime
+
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TransactionTestCase
+from freezegun import freeze_time
+
+from temporal_django.cache import HistoryCache, history_cache_key
+
+from .models import CachedHistoryModel
+
+
+class HistoryCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.history_cache = CachedHistoryModel.temporal_options.history_cache
+        self.history_cache.clear()
+        caches['default'].clear()
+
+        with freeze_time('2017-10-31'):
+            self.obj = CachedHistoryModel(title='Test', num=1)
+            self.obj.save()
+
+        with freeze_time('2017-11-01'):
+            self.obj.title = 'Test 2'
+            self.obj.save()
+
+    def test_cached_timeline(self):
+        """Repeated timeline reads should be served from the cache until the next tick"""
+        with self.assertNumQueries(3):
+            timeline = self.obj.temporal_timeline()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj.temporal_timeline(), timeline)
+
+        self.obj.num = 2
+        self.obj.save()
+
+        with self.assertNumQueries(3):
+            timeline = self.obj.temporal_timeline()
+
+        self.assertEqual(len(timeline), 3)
+        self.assertEqual(timeline[2].changed_fields['num'].value, 2)
+
+    def test_cached_as_of_closed_ranges(self):
+        """Reads of settled history should be cached, reads of the current state should not"""
+        with self.assertNumQueries(2):
+            snapshot = self.obj.temporal_as_of(datetime.datetime(2017, 10, 31, 12))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj.temporal_as_of(datetime.datetime(2017, 10, 31, 12)), snapshot)
+
+        self.assertEqual(snapshot.values, {'title': 'Test', 'num': 1})
+
+        # The latest tick is still open, so a later tick could change what was in effect at this time
+        self.obj.temporal_as_of(datetime.datetime(2017, 11, 2))
+        with self.assertNumQueries(2):
+            self.obj.temporal_as_of(datetime.datetime(2017, 11, 2))
+
+    def test_shared_cache_backend(self):
+        """History should be shared through Django's cache framework when the LRU is cold"""
+        snapshot = self.obj.temporal_as_of(1)
+        self.history_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj.temporal_as_of(1).values, snapshot.values)
+
+    def test_rolled_back_reads_not_cached(self):
+        """Reads of ticks recorded by a transaction that rolls back should never be cached"""
+        with transaction.atomic():
+            self.obj.title = 'Rolled back'
+            self.obj.save()
+            self.assertEqual(len(self.obj.temporal_timeline()), 3)
+            self.assertEqual(self.obj.temporal_as_of(3).values['title'], 'Rolled back')
+            transaction.set_rollback(True)
+
+        self.history_cache.clear()
+        self.assertIsNone(caches['default'].get(history_cache_key('timeline', self.obj, 3)))
+        self.assertIsNone(caches['default'].get(history_cache_key('as_of', self.obj, 3)))
+
+        obj = CachedHistoryModel.objects.get(pk=self.obj.pk)
+        self.assertEqual([tick.clock.tick for tick in obj.temporal_timeline()], [1, 2])
+
+    def test_reads_cached_on_commit(self):
+        """Reads in a transaction should be cached once it commits"""
+        with transaction.atomic():
+            timeline = self.obj.temporal_timeline()
+            self.assertIsNone(self.history_cache.get(history_cache_key('timeline', self.obj, 2)))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj.temporal_timeline(), timeline)
+
+    def test_stale_instance_timeline(self):
+        """A timeline cached from a stale instance should stop at that instance's vclock"""
+        stale = CachedHistoryModel.objects.get(pk=self.obj.pk)
+        self.obj.num = 2
+        self.obj.save()
+
+        self.assertEqual([tick.clock.tick for tick in stale.temporal_timeline()], [1, 2])
+        self.assertEqual([tick.clock.tick for tick in self.obj.temporal_timeline()], [1, 2, 3])
+
+    def test_lru_eviction(self):
+        """The least recently used entries should be evicted once the LRU is full"""
+        history_cache = HistoryCache(max_entries=2)
+        history_cache.set('a', 1)
+        history_cache.set('b', 2)
+        self.assertEqual(history_cache.get('a'), 1)
+        history_cache.set('c', 3)
+
+        self.assertIsNone(history_cache.get('b'))
+        self.assertEqual(history_cache.get('a'), 1)
+        self.assertEqual(history_cache.get('c'), 3)
@@ -1,5 +1,6 @@
 import datetime
 
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.test import TestCase
 from freezegun import freeze_time
@@ -60,6 +61,41 @@ class ClockedTests(TestCase):
         self.assertEqual(created_obj.latest_tick().tick, 2)
         self.assertEqual(created_obj.latest_tick().tick, edited_obj.vclock)
 
+    def test_first_and_latest_tick_cached(self):
+        """first_tick and latest_tick should only query once per instance, and follow new ticks"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(obj.first_tick().tick, 1)
+            self.assertEqual(obj.latest_tick().tick, 1)
+
+        loaded_obj = TestModel.objects.get(pk=obj.pk)
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertEqual(loaded_obj.first_tick().tick, 1)
+                self.assertEqual(loaded_obj.latest_tick().tick, 1)
+
+        loaded_obj.title = 'Test 2'
+        loaded_obj.save(activity=TestModelActivity(desc='Edit the object'))
+        with self.assertNumQueries(0):
+            self.assertEqual(loaded_obj.first_tick().tick, 1)
+            self.assertEqual(loaded_obj.latest_tick().tick, 2)
+            self.assertEqual(loaded_obj.latest_tick().activity.desc, 'Edit the object')
+
+        obj.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(obj.latest_tick().tick, 2)
+
+    def test_clock_entity_index(self):
+        """The clock table should have an entity and tick index that covers the timestamp and activity"""
+        clock_table = TestModel.temporal_options.clock_model._meta.db_table
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, clock_table)
+
+        self.assertIn(['entity_id', 'tick', 'timestamp', 'activity_id'],
+                      [constraint['columns'] for constraint in constraints.values()])
+
     def test_no_changes_no_tick(self):
         """Verify that if you don't change anything, but do a save, that no tick is created"""
         obj = TestModel(title='Test', num=1)
@@ -168,3 +204,31 @@ class ClockedTests(TestCase):
         self.assertEqual(saved_obj.title, 'Object')
         self.assertEqual(saved_obj.clock.count(), 1)
         self.assertEqual(saved_obj.title_history.count(), 1)
+
+    def test_temporal_as_of(self):
+        """The state of an object should be readable at any tick or timestamp"""
+        with freeze_time('2017-10-31'):
+            obj = TestModel(title='Test', num=1)
+            obj.save(activity=TestModelActivity(desc='Create the object'))
+
+        with freeze_time('2017-11-01'):
+            obj.title = 'Test 2'
+            obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+        snapshot = obj.temporal_as_of(1)
+        self.assertEqual(snapshot.clock.tick, 1)
+        self.assertEqual(snapshot.clock.activity.desc, 'Create the object')
+        self.assertEqual(snapshot.values, {'title': 'Test', 'num': 1})
+
+        snapshot = obj.temporal_as_of(datetime.datetime(2017, 11, 1, 12))
+        self.assertEqual(snapshot.clock.tick, 2)
+        self.assertEqual(snapshot.values, {'title': 'Test 2', 'num': 1})
+
+    def test_temporal_as_of_before_creation(self):
+        """There is no state to read before the object was created"""
+        with freeze_time('2017-10-31'):
+            obj = NoActivityModel(title='Object', num=1)
+            obj.save()
+
+        self.assertIsNone(obj.temporal_as_of(datetime.datetime(2017, 10, 30)))
+        self.assertIsNone(obj.temporal_as_of(0))
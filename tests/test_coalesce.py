@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from .models import CoalescedModel
+
+
+class CoalesceTests(TransactionTestCase):
+    def test_create_and_edit(self):
+        """Saves after the first in a transaction should be folded into its tick"""
+        with transaction.atomic():
+            obj = CoalescedModel(title='Draft', num=1)
+            obj.save()
+            obj.title = 'Draft 2'
+            obj.save()
+            obj.num = 2
+            obj.save()
+
+        self.assertEqual(obj.vclock, 1)
+        self.assertEqual(CoalescedModel.objects.get(pk=obj.pk).vclock, 1)
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Draft 2', 'num': 2})])
+
+        # A later transaction records a new tick
+        obj.title = 'Final'
+        obj.save()
+        self.assertEqual(obj.vclock, 2)
+        self.assertEqual(obj.temporal_as_of(1).values, {'title': 'Draft 2', 'num': 2})
+
+    def test_edit(self):
+        """Fields first changed by a later save should be added to the tick"""
+        obj = CoalescedModel(title='Test', num=1)
+        obj.save()
+
+        with transaction.atomic():
+            obj.title = 'Test 2'
+            obj.save()
+            obj.num = 2
+            obj.save()
+            obj.title = 'Test 3'
+            obj.save()
+
+        self.assertEqual(obj.vclock, 2)
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Test', 'num': 1}), (2, {'title': 'Test 3', 'num': 2})])
+        self.assertEqual(obj.temporal_as_of(1).values, {'title': 'Test', 'num': 1})
+
+        events = CoalescedModel.temporal_options.outbox_model.objects.all()
+        self.assertEqual([(event.tick, event.changed_fields) for event in events],
+                         [(1, ['title', 'num']), (2, ['title', 'num'])])
+
+    def test_rolled_back_tick(self):
+        """Ticks rolled back with a savepoint shouldn't be coalesced into"""
+        obj = CoalescedModel(title='Test', num=1)
+        obj.save()
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    obj.title = 'Rolled back'
+                    obj.save()
+                    raise RuntimeError()
+            except RuntimeError:
+                pass
+
+            obj = CoalescedModel.objects.get(pk=obj.pk)
+            obj.num = 2
+            obj.save()
+
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Test', 'num': 1}), (2, {'num': 2})])
+
+    def test_rolled_back_transaction(self):
+        """Ticks rolled back with their transaction shouldn't be coalesced into by stale objects"""
+        obj = CoalescedModel(title='Test', num=1)
+        obj.save()
+
+        try:
+            with transaction.atomic():
+                obj.title = 'Rolled back'
+                obj.save()
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+
+        # obj still thinks tick 2 is its latest
+        self.assertEqual(obj.vclock, 2)
+        with transaction.atomic():
+            obj.num = 2
+            obj.save()
+
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Test', 'num': 1}), (3, {'num': 2})])
+
+    def test_cached_reads(self):
+        """Reads of a tick before it is folded into shouldn't be cached"""
+        with transaction.atomic():
+            obj = CoalescedModel(title='Draft', num=1)
+            obj.save()
+            self.assertEqual(obj.temporal_timeline()[0].changed_fields['title'].value, 'Draft')
+            self.assertEqual(obj.temporal_as_of(1).values, {'title': 'Draft', 'num': 1})
+            obj.title = 'Draft 2'
+            obj.save()
+
+        self.assertEqual(obj.temporal_timeline()[0].changed_fields['title'].value, 'Draft 2')
+        self.assertEqual(obj.temporal_as_of(1).values, {'title': 'Draft 2', 'num': 1})
+
+    @override_settings(TEMPORAL_READ_DATABASE='replica')
+    def test_replica_reads(self):
+        """Ticks should be checked on the primary, as the replica can't see the transaction writing them"""
+        with transaction.atomic():
+            obj = CoalescedModel(title='Draft', num=1)
+            obj.save()
+            obj.title = 'Draft 2'
+            obj.save()
+
+        self.assertEqual(obj.vclock, 1)
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual([(entry.tick, entry.changed_fields) for entry in timeline],
+                         [(1, {'title': 'Draft 2', 'num': 1})])
@@ -0,0 +1,162 @@
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase
+from django.views.generic import View
+from django.views.generic.detail import SingleObjectMixin
+from freezegun import freeze_time
+
+from temporal_django.conditional import (ClockConditionalGetMiddleware, ClockConditionalMixin,
+                                         ClockValidators, clock_validators, conditional_response)
+
+from .models import ManyFieldsModel, NoActivityModel, Stub
+
+
+class TitleView(SingleObjectMixin, View):
+    model = NoActivityModel
+
+    def get(self, request, *args, **kwargs):
+        obj = self.get_object()
+        return HttpResponse('%s: %s' % (obj.title, len(obj.temporal_timeline())))
+
+    def post(self, request, *args, **kwargs):
+        obj = self.get_object()
+        obj.title = request.POST['title']
+        obj.save()
+        return HttpResponse(obj.title)
+
+
+class ConditionalTitleView(ClockConditionalMixin, TitleView):
+    pass
+
+
+class ConditionalTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        with freeze_time('2017-11-01 12:00:00'):
+            self.obj = NoActivityModel(title='Test', num=1)
+            self.obj.save()
+        with freeze_time('2017-11-02 12:00:00'):
+            self.obj.title = 'Test 2'
+            self.obj.save()
+        self.etag = '"%s-2"' % self.obj.pk
+
+    def test_validators(self):
+        """Successful GETs should carry the vclock as the ETag and the latest tick's time as Last-Modified"""
+        response = ConditionalTitleView.as_view()(self.factory.get('/'), pk=self.obj.pk)
+        self.assertEqual(response.content, b'Test 2: 2')
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Last-Modified'], 'Thu, 02 Nov 2017 12:00:00 GMT')
+
+        # Writes change the object, so they don't get headers read before them
+        response = ConditionalTitleView.as_view()(self.factory.post('/', {'title': 'Test 3'}), pk=self.obj.pk)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_not_modified(self):
+        """A matching If-None-Match should be answered with one query, without loading the object"""
+        with self.assertNumQueries(1):
+            response = ConditionalTitleView.as_view()(
+                self.factory.get('/', HTTP_IF_NONE_MATCH=self.etag), pk=self.obj.pk)
+        self.assertEqual(response.status_code, 304)
+
+        response = ConditionalTitleView.as_view()(
+            self.factory.get('/', HTTP_IF_MODIFIED_SINCE='Thu, 02 Nov 2017 12:00:00 GMT'), pk=self.obj.pk)
+        self.assertEqual(response.status_code, 304)
+
+        response = ConditionalTitleView.as_view()(
+            self.factory.get('/', HTTP_IF_NONE_MATCH='"%s-1"' % self.obj.pk), pk=self.obj.pk)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_if_match(self):
+        """A stale If-Match should be rejected before anything is saved"""
+        request = self.factory.post('/', {'title': 'Lost update'}, HTTP_IF_MATCH='"%s-1"' % self.obj.pk)
+        response = ConditionalTitleView.as_view()(request, pk=self.obj.pk)
+        self.assertEqual(response.status_code, 412)
+        self.obj.refresh_from_db()
+        self.assertEqual((self.obj.title, self.obj.vclock), ('Test 2', 2))
+
+        request = self.factory.post('/', {'title': 'Test 3'}, HTTP_IF_MATCH=self.etag)
+        response = ConditionalTitleView.as_view()(request, pk=self.obj.pk)
+        self.assertEqual(response.status_code, 200)
+        self.obj.refresh_from_db()
+        self.assertEqual((self.obj.title, self.obj.vclock), ('Test 3', 3))
+
+    def test_missing_objects(self):
+        """Missing, deleted and malformed objects should be left to the view"""
+        deleted = NoActivityModel(title='Deleted', num=2)
+        deleted.save()
+        deleted.delete()
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='*')
+        with self.assertRaises(Http404):
+            ConditionalTitleView.as_view()(request, pk=deleted.pk)
+        self.assertIsNone(clock_validators(NoActivityModel.objects.all(), 'not-a-pk'))
+
+    def test_no_last_modified(self):
+        """Validators without a Last-Modified time should be checked against the ETag alone"""
+        validators = ClockValidators(etag=self.etag, last_modified=None)
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=self.etag,
+                                   HTTP_IF_MODIFIED_SINCE='Thu, 02 Nov 2017 12:00:00 GMT')
+        self.assertEqual(conditional_response(request, validators).status_code, 304)
+
+        request = self.factory.get('/', HTTP_IF_MODIFIED_SINCE='Thu, 02 Nov 2017 12:00:00 GMT')
+        self.assertIsNone(conditional_response(request, validators))
+
+    def test_untracked_fields(self):
+        """Saving fields without history should change the ETag, though it records no tick"""
+        obj = ManyFieldsModel(title='Test', num=1, label='Draft')
+        obj.save()
+        validators = clock_validators(ManyFieldsModel.objects.all(), obj.pk)
+        self.assertIsNone(validators.last_modified)
+
+        for field, value in [('label', 'Final'), ('priority', 1), ('remarks', 'Checked')]:
+            setattr(obj, field, value)
+            obj.save()
+            self.assertEqual(obj.vclock, 1)
+
+            request = self.factory.get('/', HTTP_IF_NONE_MATCH=validators.etag)
+            new_validators = clock_validators(ManyFieldsModel.objects.all(), obj.pk)
+            self.assertIsNone(conditional_response(request, new_validators), field)
+            request = self.factory.post('/', HTTP_IF_MATCH=validators.etag)
+            self.assertEqual(conditional_response(request, new_validators).status_code, 412, field)
+            validators = new_validators
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=validators.etag)
+        self.assertEqual(conditional_response(request, validators).status_code, 304)
+
+    def test_middleware(self):
+        """The middleware should do the same for class-based views of clocked models"""
+        middleware = ClockConditionalGetMiddleware()
+        view = TitleView.as_view()
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=self.etag)
+        with self.assertNumQueries(1):
+            response = middleware.process_view(request, view, (), {'pk': self.obj.pk})
+        self.assertEqual(response.status_code, 304)
+
+        request = self.factory.get('/')
+        self.assertIsNone(middleware.process_view(request, view, (), {'pk': self.obj.pk}))
+        response = middleware.process_response(request, view(request, pk=self.obj.pk))
+        self.assertEqual(response['ETag'], self.etag)
+
+        # Views with their own get_queryset are left to the mixin
+        class FilteredTitleView(TitleView):
+            def get_queryset(self):
+                return super().get_queryset().filter(num__gt=1)
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=self.etag)
+        response = middleware.process_view(request, FilteredTitleView.as_view(), (), {'pk': self.obj.pk})
+        self.assertIsNone(response)
+
+        # So are views of other models, views without a primary key, and missing objects
+        class StubView(SingleObjectMixin, View):
+            model = Stub
+
+        self.assertIsNone(middleware.process_view(request, StubView.as_view(), (), {'pk': 1}))
+        self.assertIsNone(middleware.process_view(request, view, (), {'slug': 'test'}))
+        self.assertIsNone(middleware.process_view(request, view, (), {'pk': self.obj.pk + 100}))
+
+        # The mixin reuses what the middleware read
+        request = self.factory.get('/')
+        middleware.process_view(request, ConditionalTitleView.as_view(), (), {'pk': self.obj.pk})
+        with self.assertNumQueries(4):
+            response = ConditionalTitleView.as_view()(request, pk=self.obj.pk)
+        self.assertEqual(response['ETag'], self.etag)
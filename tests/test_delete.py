@@ -0,0 +1,120 @@
+import datetime
+
+from django.test import TestCase
+from freezegun import freeze_time
+
+from temporal_django.batch import temporal_batch
+from temporal_django.delete import delete_entities
+
+from .models import NoActivityModel, OutboxModel, TestModel, TestModelActivity
+
+
+class DeleteTests(TestCase):
+    def test_delete_instance(self):
+        """Deleting an object should record a tombstone tick and hide it, while keeping its history"""
+        obj = TestModel(title='Test', num=1)
+        with freeze_time('2017-11-01'):
+            obj.save(activity=TestModelActivity(desc='Create the object'))
+        with freeze_time('2017-11-02'):
+            obj.title = 'Test 2'
+            obj.save(activity=TestModelActivity(desc='Edit the object'))
+        with freeze_time('2017-11-03'):
+            self.assertEqual(obj.delete(activity=TestModelActivity(desc='Delete the object')),
+                             (1, {'tests.TestModel': 1}))
+
+        self.assertEqual((obj.vclock, obj.deleted_tick), (3, 3))
+        self.assertEqual(obj.latest_tick().activity.desc, 'Delete the object')
+        self.assertFalse(TestModel.objects.filter(pk=obj.pk).exists())
+
+        deleted_obj = TestModel.all_objects.get(pk=obj.pk)
+        self.assertEqual((deleted_obj.vclock, deleted_obj.deleted_tick), (3, 3))
+        self.assertEqual(deleted_obj.temporal_as_of(2).values, {'title': 'Test 2', 'num': 1})
+        self.assertEqual(deleted_obj.temporal_as_of(datetime.datetime(2017, 11, 1, 12)).values,
+                         {'title': 'Test', 'num': 1})
+        self.assertIsNone(deleted_obj.temporal_as_of(3))
+        self.assertIsNone(deleted_obj.temporal_as_of(datetime.datetime(2017, 11, 4)))
+
+        timeline = deleted_obj.temporal_timeline()
+        self.assertEqual([entry.clock.tick for entry in timeline], [1, 2, 3])
+        self.assertEqual(timeline[2].changed_fields, {})
+
+        # Every history range is closed at the tombstone
+        for field in ('title', 'num'):
+            history = getattr(deleted_obj, '%s_history' % field).order_by('vclock').last()
+            self.assertEqual(history.vclock.upper, 3)
+            self.assertEqual(history.effective.upper.date(), datetime.date(2017, 11, 3))
+
+    def test_delete_misuse(self):
+        """Deleted objects can't be saved or deleted again, and activities are required as for saving"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+
+        with self.assertRaisesMessage(ValueError, 'An activity is required'):
+            obj.delete()
+        with self.assertRaisesMessage(ValueError, 'you cannot supply an activity'):
+            NoActivityModel.objects.all().delete(activity=TestModelActivity(desc='Delete'))
+
+        obj.delete(activity=TestModelActivity(desc='Delete the object'))
+        with self.assertRaisesMessage(ValueError, 'has already been deleted'):
+            obj.delete(activity=TestModelActivity(desc='Delete it again'))
+        with self.assertRaisesMessage(ValueError, 'cannot be saved'):
+            obj.save(activity=TestModelActivity(desc='Edit the deleted object'))
+
+    def test_delete_no_entities(self):
+        """Deleting no objects should record no ticks"""
+        self.assertEqual(delete_entities(NoActivityModel, []), [])
+        self.assertFalse(NoActivityModel.temporal_options.clock_model.objects.exists())
+
+    def test_delete_queryset(self):
+        """Deleting a queryset should tombstone every object in it without loading them"""
+        objs = [NoActivityModel(title='Test %s' % i, num=i) for i in range(5)]
+        for obj in objs:
+            obj.save()
+        objs[0].title = 'Edited'
+        objs[0].save()
+
+        # Read the objects, then write the clock, each history table and the objects, in a savepoint
+        with self.assertNumQueries(1 + 4 + 2):
+            deleted = NoActivityModel.objects.filter(num__lt=3).delete()
+
+        self.assertEqual(deleted, (3, {'tests.NoActivityModel': 3}))
+        self.assertEqual(sorted(NoActivityModel.objects.values_list('num', flat=True)), [3, 4])
+        self.assertEqual(
+            list(NoActivityModel.all_objects.order_by('num').values_list('vclock', 'deleted_tick')),
+            [(3, 3), (2, 2), (2, 2), (1, None), (1, None)])
+        self.assertEqual(NoActivityModel.all_objects.get(pk=objs[0].pk).temporal_as_of(2).values,
+                         {'title': 'Edited', 'num': 0})
+
+        # The tombstones close the history at the time they were recorded
+        deleted_obj = NoActivityModel.all_objects.get(pk=objs[1].pk)
+        self.assertEqual(deleted_obj.title_history.get().effective.upper, deleted_obj.latest_tick().timestamp)
+
+        # Deleting again leaves deleted objects alone
+        self.assertEqual(NoActivityModel.all_objects.delete(), (2, {'tests.NoActivityModel': 2}))
+        self.assertEqual(NoActivityModel.objects.count(), 0)
+
+    def test_delete_in_batch(self):
+        """Deletes inside a batch should use its activity and come after the ticks saved before them"""
+        old_obj = OutboxModel(title='Old', num=0)
+        old_obj.save(activity=TestModelActivity(desc='Create the old object'))
+
+        with temporal_batch(TestModelActivity(desc='Create and delete')) as batch:
+            obj = OutboxModel(title='Test', num=1)
+            obj.save()
+            OutboxModel.objects.filter(pk=obj.pk).delete(
+                activity=TestModelActivity(desc='Delete the new object'))
+            old_obj.delete()
+
+        obj = OutboxModel.all_objects.get(pk=obj.pk)
+        self.assertEqual(obj.deleted_tick, 2)
+        self.assertEqual([clock.activity.desc for clock in obj.clock.all()],
+                         ['Create and delete', 'Delete the new object'])
+        self.assertEqual(old_obj.latest_tick().activity, batch.activity)
+
+        events = OutboxModel.temporal_options.outbox_model.objects.all()
+        self.assertEqual([(event.entity_id, event.tick, event.changed_fields) for event in events], [
+            (old_obj.pk, 1, ['title', 'num']),
+            (obj.pk, 1, ['title', 'num']),
+            (obj.pk, 2, []),
+            (old_obj.pk, 2, []),
+        ])
@@ -0,0 +1,60 @@
+import datetime
+
+from django.test import TestCase
+from freezegun import freeze_time
+
+from .models import TestModel, TestModelActivity
+
+
+class DiffTests(TestCase):
+    def setUp(self):
+        with freeze_time('2017-10-31'):
+            self.obj = TestModel(title='Test', num=1)
+            self.obj.save(activity=TestModelActivity(desc='Create the object'))
+
+        with freeze_time('2017-11-01'):
+            self.obj.title = 'Test 2'
+            self.obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+        with freeze_time('2017-11-02'):
+            self.obj.num = 5
+            self.obj.save(activity=TestModelActivity(desc='Do a third edit'))
+
+    def test_diff_between_ticks(self):
+        """Diffing two ticks should return the before and after values of the changed fields"""
+        with self.assertNumQueries(1):
+            diff = self.obj.temporal_diff(1, 3)
+
+        self.assertEqual(diff['title'], ('Test', 'Test 2'))
+        self.assertEqual(diff['num'].before, 1)
+        self.assertEqual(diff['num'].after, 5)
+
+        # Fields that didn't change between the two ticks are left out
+        self.assertEqual(set(self.obj.temporal_diff(2, 3)), {'num'})
+        self.assertEqual(self.obj.temporal_diff(3, 3), {})
+
+    def test_diff_between_timestamps(self):
+        """Datetimes should be resolved against the effective ranges"""
+        diff = self.obj.temporal_diff(datetime.datetime(2017, 10, 31, 12), datetime.datetime(2017, 11, 1, 12))
+
+        self.assertEqual(diff, {'title': ('Test', 'Test 2')})
+
+    def test_queryset_diff(self):
+        """The queryset variant should diff every selected entity in one query"""
+        with freeze_time('2017-10-31'):
+            other = TestModel(title='Other', num=10)
+            other.save(activity=TestModelActivity(desc='Create another object'))
+            unchanged = TestModel(title='Unchanged', num=10)
+            unchanged.save(activity=TestModelActivity(desc='Create an unchanged object'))
+
+        with freeze_time('2017-11-05'):
+            other.num = 11
+            other.save(activity=TestModelActivity(desc='Edit the other object'))
+
+        with self.assertNumQueries(1):
+            diffs = TestModel.objects.temporal_diff(datetime.datetime(2017, 10, 31, 12),
+                                                    datetime.datetime(2017, 11, 6))
+
+        self.assertEqual(set(diffs), {self.obj.pk, other.pk})
+        self.assertEqual(diffs[other.pk], {'num': (10, 11)})
+        self.assertEqual(diffs[self.obj.pk]['title'], ('Test', 'Test 2'))
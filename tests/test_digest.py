@@ -0,0 +1,75 @@
+import json
+
+from django.test import TestCase
+
+from temporal_django.clocked_option import ValueDigest
+
+from .models import DigestModel
+
+
+class DigestTests(TestCase):
+    def test_large_values_kept_as_digest(self):
+        """Only a digest of large values should be kept on loaded instances"""
+        DigestModel(title='Test', notes='A' * 1000).save()
+
+        obj = DigestModel.objects.first()
+        previous = obj._state._django_temporal_previous
+
+        self.assertEqual(previous['title'], 'Test')
+        self.assertIsInstance(previous['notes'], ValueDigest)
+        self.assertEqual(previous['notes'].size, 1000)
+
+    def test_small_values_kept_in_full(self):
+        """Values under the threshold should still be compared directly"""
+        DigestModel(title='Test', notes='Short').save()
+
+        obj = DigestModel.objects.first()
+        self.assertEqual(obj._state._django_temporal_previous['notes'], 'Short')
+
+    def test_change_detection_with_digest(self):
+        """Changes to large values should be detected from their digest"""
+        DigestModel(title='Test', notes='A' * 1000).save()
+        obj = DigestModel.objects.first()
+
+        # Saving the same value shouldn't create a tick
+        obj.notes = 'A' * 1000
+        obj.save()
+        self.assertEqual(obj.vclock, 1)
+
+        # Same size, different content
+        obj.notes = 'A' * 999 + 'B'
+        obj.save()
+        self.assertEqual(obj.vclock, 2)
+
+        # Going from a large to a small value, and back
+        obj.notes = None
+        obj.save()
+        obj.notes = 'B' * 1000
+        obj.save()
+        self.assertEqual(obj.vclock, 4)
+        self.assertIsInstance(obj._state._django_temporal_previous['notes'], ValueDigest)
+
+        timeline = obj.temporal_timeline()
+        self.assertEqual(timeline[1].changed_fields['notes'].value, 'A' * 999 + 'B')
+        self.assertIsNone(timeline[2].changed_fields['notes'].value)
+
+    def test_binary_and_json_digests(self):
+        """Binary values should be digested by their bytes and other values by their JSON"""
+        DigestModel(title='Test', attachment=b'A' * 100, data={'items': list(range(20))}).save()
+        obj = DigestModel.objects.first()
+        previous = obj._state._django_temporal_previous
+
+        self.assertEqual(previous['attachment'].size, 100)
+        self.assertEqual(previous['data'].size, len(json.dumps({'items': list(range(20))})))
+
+        # Unchanged values shouldn't create a tick
+        obj.attachment = b'A' * 100
+        obj.data = {'items': list(range(20))}
+        obj.save()
+        self.assertEqual(obj.vclock, 1)
+
+        obj.attachment = b'A' * 99 + b'B'
+        obj.data = {'items': list(range(1, 21))}
+        obj.save()
+        self.assertEqual(obj.vclock, 2)
+        self.assertEqual(set(obj.temporal_timeline()[1].changed_fields), {'attachment', 'data'})
@@ -0,0 +1,74 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from freezegun import freeze_time
+
+from .models import IndexedHistoryModel
+
+
+class HistoryLookupTests(TestCase):
+    def setUp(self):
+        with freeze_time('2025-01-01'):
+            self.suspended_last_year = IndexedHistoryModel(status='ACTIVE', num=1)
+            self.suspended_last_year.save()
+            self.suspended_this_year = IndexedHistoryModel(status='ACTIVE', num=2)
+            self.suspended_this_year.save()
+            self.never_suspended = IndexedHistoryModel(status='ACTIVE', num=3)
+            self.never_suspended.save()
+
+        with freeze_time('2025-03-01'):
+            self.suspended_last_year.status = 'SUSPENDED'
+            self.suspended_last_year.save()
+
+        with freeze_time('2025-04-01'):
+            self.suspended_last_year.status = 'ACTIVE'
+            self.suspended_last_year.save()
+
+        with freeze_time('2026-02-01'):
+            self.suspended_this_year.status = 'SUSPENDED'
+            self.suspended_this_year.save()
+
+    def test_ever_lookup(self):
+        """status__ever should find entities that had a value at any point"""
+        ever_suspended = IndexedHistoryModel.objects.filter(status__ever='SUSPENDED')
+        self.assertEqual(set(ever_suspended), {self.suspended_last_year, self.suspended_this_year})
+
+        never_suspended = IndexedHistoryModel.objects.exclude(status__ever='SUSPENDED')
+        self.assertEqual(list(never_suspended), [self.never_suspended])
+
+        # History lookups combine with regular ones
+        self.assertEqual(list(IndexedHistoryModel.objects.filter(status__ever='SUSPENDED', status='ACTIVE')),
+                         [self.suspended_last_year])
+
+    def test_during_lookup(self):
+        """status__during should find entities that had a value during a period"""
+        suspended_2025 = IndexedHistoryModel.objects.filter(
+            status__during=('SUSPENDED', (datetime.datetime(2025, 1, 1), datetime.datetime(2026, 1, 1))))
+        self.assertEqual(list(suspended_2025), [self.suspended_last_year])
+
+        active_2026 = IndexedHistoryModel.objects.filter(
+            status__during=('ACTIVE', (datetime.datetime(2026, 1, 1), None)))
+        self.assertEqual(set(active_2026), {self.suspended_last_year, self.suspended_this_year,
+                                            self.never_suspended})
+
+    def test_value_indexes_created(self):
+        """The configured indexes should exist on the history table"""
+        history_table = IndexedHistoryModel.temporal_options.history_models['status']._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s', [history_table])
+            index_definitions = [row[0] for row in cursor.fetchall()]
+
+        self.assertTrue(any('USING btree (status)' in d for d in index_definitions))
+        self.assertTrue(any('USING hash (status)' in d for d in index_definitions))
+        self.assertTrue(any('USING gist (status, effective)' in d for d in index_definitions))
+        self.assertTrue(any('USING brin (lower(effective))' in d for d in index_definitions))
+        self.assertFalse(any('USING gist' in d and 'vclock' in d for d in index_definitions))
+        self.assertTrue(any('USING btree (entity_id, lower(vclock))' in d for d in index_definitions))
+
+    def test_time_window_scan(self):
+        """History can be scanned by when values took effect, e.g. with the BRIN index"""
+        history_model = IndexedHistoryModel.temporal_options.history_models['status']
+        changed_2026 = history_model.objects.filter(
+            effective__startswith__gte=datetime.datetime(2026, 1, 1)).values_list('entity_id', 'status')
+        self.assertEqual(set(changed_2026), {(self.suspended_this_year.pk, 'SUSPENDED')})
@@ -20,14 +20,14 @@ class MisuseTests(TestCase):
 
     def test_no_delete(self):
         """
-        You shouldn't be able to delete temporal objects. No destroying history.
+        You shouldn't be able to delete temporal objects from the database. No destroying history.
         """
         obj = NoActivityModel(title='Test 1', num=1)
         obj.save()
         self.assertEquals(NoActivityModel.objects.count(), 1)
 
         with self.assertRaisesMessage(ValueError, 'cannot delete'):
-            obj.delete()
+            NoActivityModel._base_manager.filter(pk=obj.pk).delete()
 
     def test_temporal_field_not_in_model(self):
         """You shouldn't be able to try to define a temporal field that doesn't exist"""
@@ -0,0 +1,205 @@
+import datetime
+
+from django.apps import apps
+from django.db import IntegrityError, connection
+from django.db.migrations.state import ProjectState
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from psycopg2.extras import DateTimeTZRange, NumericRange
+
+from temporal_django.db_extensions import GistExclusionConstraint, HashIndex
+from temporal_django.operations import (AddIndexConcurrently, AddValidatedExclusionConstraint,
+                                        _execute_with_progress, add_index_concurrently,
+                                        add_validated_exclusion_constraint)
+
+from .models import IndexedHistoryModel, NoActivityModel
+
+
+class OperationTests(TransactionTestCase):
+    def setUp(self):
+        self.history_model = NoActivityModel.temporal_options.history_models['title']
+        self.constraint = [
+            index for index in self.history_model._meta.indexes
+            if isinstance(index, GistExclusionConstraint) and index.name.endswith('vclock')
+        ][0]
+
+        self.obj = NoActivityModel(title='Test 0', num=0)
+        self.obj.save()
+        for i in range(1, 5):
+            self.obj.title = 'Test %s' % i
+            self.obj.save()
+
+        self._drop_constraint()
+
+    def tearDown(self):
+        # Schema changes outlive the test, so put the constraint back
+        self.history_model.objects.all().delete()
+        self._drop_constraint()
+        with connection.schema_editor() as editor:
+            editor.add_index(self.history_model, self.constraint)
+
+    def _drop_constraint(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s' % (
+                self.history_model._meta.db_table, self.constraint.name))
+
+    def _index_names(self, model):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+    def _migrate(self, operation, backwards=False, **editor_kwargs):
+        """Run an operation as a migration of the tests app would"""
+        from_state = ProjectState.from_apps(apps)
+        to_state = from_state.clone()
+        operation.state_forwards('tests', to_state)
+        with connection.schema_editor(atomic=False, **editor_kwargs) as editor:
+            if backwards:
+                operation.database_backwards('tests', editor, to_state, from_state)
+            else:
+                operation.database_forwards('tests', editor, from_state, to_state)
+        return editor
+
+    def test_add_exclusion_constraint(self):
+        """The constraint should be added after validating the existing rows, and enforced afterwards"""
+        operation = AddValidatedExclusionConstraint('noactivitymodelhistory_title', self.constraint)
+        self.assertEqual(operation.describe(),
+                         'Create exclusion constraint %s on model noactivitymodelhistory_title after '
+                         'validating its rows' % self.constraint.name)
+        with self.assertLogs('temporal_django.operations') as logs:
+            self._migrate(operation)
+
+        self.assertTrue(any('validated, 0 conflicting rows' in line for line in logs.output))
+        self.assertIn(self.constraint.name, self._index_names(self.history_model))
+
+        first = self.history_model.objects.order_by('vclock').first()
+        with self.assertRaisesMessage(IntegrityError, 'violates exclusion constraint'):
+            self.history_model.objects.create(entity=self.obj, title='Conflict', vclock=NumericRange(2, 3),
+                                              effective=first.effective)
+
+    def test_conflicting_rows(self):
+        """Conflicting rows should be reported before the constraint is added"""
+        # Overlaps the vclock ranges of the first rows but not their effective ranges
+        past = timezone.now() - datetime.timedelta(days=1)
+        self.history_model.objects.create(entity=self.obj, title='Conflict', vclock=NumericRange(1, 3),
+                                          effective=DateTimeTZRange(past, past + datetime.timedelta(hours=1)))
+        # Other entities and empty ranges never conflict
+        other = NoActivityModel(title='Other', num=0)
+        other.save()
+        self.history_model.objects.create(entity=self.obj, title='Empty', vclock=NumericRange(empty=True),
+                                          effective=DateTimeTZRange(past, past))
+
+        message = '2 rows of %s conflict' % self.history_model._meta.db_table
+        with self.assertRaisesMessage(IntegrityError, message):
+            with connection.schema_editor(atomic=False) as editor:
+                add_validated_exclusion_constraint(editor, self.history_model, self.constraint)
+        self.assertNotIn(self.constraint.name, self._index_names(self.history_model))
+
+    def test_unbounded_conflicts(self):
+        """Ranges unbounded below or above should conflict with every range they overlap"""
+        vclocks = [NumericRange(None, 1), NumericRange(None, 2), NumericRange(3, None)]
+        for days, vclock in enumerate(vclocks, 1):
+            past = timezone.now() - datetime.timedelta(days=days)
+            effective = DateTimeTZRange(past, past + datetime.timedelta(hours=1))
+            self.history_model.objects.create(entity=self.obj, title='Conflict', vclock=vclock,
+                                              effective=effective)
+
+        # All but the first unbounded range and [2,3) overlap an earlier range
+        message = '5 rows of %s conflict' % self.history_model._meta.db_table
+        with self.assertRaisesMessage(IntegrityError, message):
+            with connection.schema_editor(atomic=False) as editor:
+                add_validated_exclusion_constraint(editor, self.history_model, self.constraint)
+
+    def test_collect_sql(self):
+        """The SQL of the operations should be collected without validating or building anything"""
+        operation = AddValidatedExclusionConstraint('noactivitymodelhistory_title', self.constraint)
+        sql = self._migrate(operation, collect_sql=True).collected_sql
+        self.assertEqual(sql[0], "SET lock_timeout = '5s';")
+        self.assertIn('ADD CONSTRAINT %s EXCLUDE USING gist' % self.constraint.name, sql[1])
+        self.assertNotIn(self.constraint.name, self._index_names(self.history_model))
+
+        history_model = IndexedHistoryModel.temporal_options.history_models['status']
+        index = [index for index in history_model._meta.indexes if isinstance(index, HashIndex)][0]
+        operation = AddIndexConcurrently('indexedhistorymodelhistory_status', index)
+        sql = self._migrate(operation, collect_sql=True).collected_sql
+        self.assertEqual(sql, [index.remove_sql(history_model, None, concurrently=True),
+                               index.create_sql(history_model, None, concurrently=True)])
+
+    def test_requires_non_atomic_migration(self):
+        """Concurrent builds can't run in a transaction"""
+        operation = AddValidatedExclusionConstraint('noactivitymodelhistory_title', self.constraint,
+                                                    lock_timeout='1s')
+        self.assertEqual(operation.deconstruct()[2]['lock_timeout'], '1s')
+
+        with self.assertRaisesMessage(AssertionError, 'set atomic = False'):
+            with connection.schema_editor() as editor:
+                add_validated_exclusion_constraint(editor, self.history_model, self.constraint)
+
+    def test_add_index_concurrently(self):
+        """Expression indexes should be built concurrently, unless a valid index already exists"""
+        history_model = IndexedHistoryModel.temporal_options.history_models['status']
+        index = [index for index in history_model._meta.indexes if isinstance(index, HashIndex)][0]
+        with connection.schema_editor() as editor:
+            editor.remove_index(history_model, index)
+        self.assertNotIn(index.name, self._index_names(history_model))
+
+        with connection.schema_editor(atomic=False) as editor:
+            add_index_concurrently(editor, history_model, index)
+        self.assertIn(index.name, self._index_names(history_model))
+
+        # A valid index is kept
+        with CaptureQueriesContext(connection) as queries:
+            with connection.schema_editor(atomic=False) as editor:
+                add_index_concurrently(editor, history_model, index)
+        self.assertFalse([query['sql'] for query in queries.captured_queries if 'INDEX' in query['sql']])
+
+        # An invalid index is built again
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE pg_index SET indisvalid = false WHERE indexrelid = %s::regclass',
+                           [index.name])
+        with CaptureQueriesContext(connection) as queries:
+            with connection.schema_editor(atomic=False) as editor:
+                add_index_concurrently(editor, history_model, index)
+        self.assertEqual([query['sql'].split(' ')[0] for query in queries.captured_queries
+                          if 'INDEX' in query['sql']], ['DROP', 'CREATE'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indisvalid FROM pg_index WHERE indexrelid = %s::regclass', [index.name])
+            self.assertTrue(cursor.fetchone()[0])
+
+    def test_index_migration(self):
+        """Indexes should be added and removed concurrently by migrations"""
+        history_model = IndexedHistoryModel.temporal_options.history_models['status']
+        index = [index for index in history_model._meta.indexes if isinstance(index, HashIndex)][0]
+        operation = AddIndexConcurrently('indexedhistorymodelhistory_status', index)
+        self.assertEqual(operation.describe(), 'Create index %s concurrently on model %s' % (
+            index.name, 'indexedhistorymodelhistory_status'))
+
+        self._migrate(operation, backwards=True)
+        self.assertNotIn(index.name, self._index_names(history_model))
+        self._migrate(operation)
+        self.assertIn(index.name, self._index_names(history_model))
+
+        with self.assertRaisesMessage(AssertionError, 'only supports ExpressionIndex'):
+            AddIndexConcurrently('noactivitymodelhistory_title', self.constraint)
+
+    def test_build_progress(self):
+        """The progress of index builds should be logged while they run"""
+        with connection.cursor() as cursor:
+            # Lies about being immutable, so that it can slow down an index build
+            cursor.execute("""
+                CREATE FUNCTION temporal_slow_key(value text) RETURNS text IMMUTABLE
+                AS $$ SELECT value FROM pg_sleep(0.05) $$ LANGUAGE SQL
+            """)
+        try:
+            sql = 'CREATE INDEX CONCURRENTLY temporal_slow_idx ON %s (temporal_slow_key(title))' % (
+                self.history_model._meta.db_table)
+            with self.assertLogs('temporal_django.operations') as logs:
+                with connection.schema_editor(atomic=False) as editor:
+                    _execute_with_progress(editor, sql, 'temporal_slow_idx', interval=0.02)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('DROP INDEX IF EXISTS temporal_slow_idx')
+                cursor.execute('DROP FUNCTION temporal_slow_key(text)')
+
+        self.assertTrue(any('tuples' in line for line in logs.output), logs.output)
+        self.assertIn('INFO:temporal_django.operations:temporal_slow_idx: built', logs.output)
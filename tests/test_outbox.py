@@ -0,0 +1,103 @@
+import json
+import select
+
+import psycopg2
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from temporal_django.batch import temporal_batch
+from temporal_django.outbox import iter_outbox_batches, outbox_checkpoint, read_outbox
+
+from .models import OutboxModel, TestModelActivity
+
+
+class OutboxTests(TransactionTestCase):
+    def test_ticks_written_to_outbox(self):
+        """Every tick should be written to the outbox with its changed fields and activity"""
+        act = TestModelActivity(desc='Create the object')
+        obj = OutboxModel(title='Test', num=1)
+        obj.save(activity=act)
+
+        obj.num = 2
+        obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+        events = read_outbox(OutboxModel)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0].model, 'tests.outboxmodel')
+        self.assertEqual(events[0].entity_id, obj.pk)
+        self.assertEqual(events[0].tick, 1)
+        self.assertEqual(sorted(events[0].changed_fields), ['num', 'title'])
+        self.assertEqual(events[0].activity_id, act.pk)
+        self.assertEqual(events[1].tick, 2)
+        self.assertEqual(events[1].changed_fields, ['num'])
+
+        self.assertEqual(read_outbox(OutboxModel, after=outbox_checkpoint(events[1])), [])
+
+    def test_batched_consumer(self):
+        """The consumer should read the outbox in batches from a checkpoint"""
+        with temporal_batch(TestModelActivity(desc='Create many objects')):
+            for i in range(5):
+                OutboxModel(title='Test %s' % i, num=i).save()
+
+        batches = list(iter_outbox_batches(OutboxModel, batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+
+        checkpoint = outbox_checkpoint(batches[0][-1])
+        remaining = [event
+                     for batch in iter_outbox_batches(OutboxModel, after=checkpoint)
+                     for event in batch]
+        self.assertEqual(remaining, batches[1] + batches[2])
+
+    def test_late_commit(self):
+        """An event of a transaction that commits after a newer one shouldn't be skipped, whatever its id"""
+        obj = OutboxModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+        checkpoint = outbox_checkpoint(read_outbox(OutboxModel)[-1])
+
+        outbox_table = OutboxModel.temporal_options.outbox_model._meta.db_table
+        other = psycopg2.connect(**connection.get_connection_params())
+        try:
+            with transaction.atomic():
+                # This transaction starts first, but the other one takes the next id from the sequence
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT txid_current()')
+                other.cursor().execute(
+                    'INSERT INTO %s (entity_id, tick, timestamp, changed_fields, txid, activity_id) '
+                    'SELECT entity_id, 99, now(), changed_fields, txid_current(), activity_id FROM %s' % (
+                        outbox_table, outbox_table))
+                obj.num = 2
+                obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+            events = read_outbox(OutboxModel, after=checkpoint)
+            self.assertEqual([event.tick for event in events], [2])
+            checkpoint = outbox_checkpoint(events[-1])
+
+            other.commit()
+            late_events = read_outbox(OutboxModel, after=checkpoint)
+            self.assertEqual([event.tick for event in late_events], [99])
+            self.assertLess(late_events[0].id, events[0].id)
+        finally:
+            other.close()
+
+    def test_notify(self):
+        """Listeners on the notify channel should be told about every committed tick"""
+        params = connection.get_connection_params()
+        listener = psycopg2.connect(**params)
+        listener.autocommit = True
+        try:
+            listener.cursor().execute('LISTEN temporal_test')
+
+            obj = OutboxModel(title='Test', num=1)
+            obj.save(activity=TestModelActivity(desc='Create the object'))
+
+            select.select([listener], [], [], 5)
+            listener.poll()
+            self.assertEqual(len(listener.notifies), 1)
+
+            payload = json.loads(listener.notifies[0].payload)
+            self.assertEqual(payload['model'], 'tests.outboxmodel')
+            self.assertEqual(payload['entity_id'], obj.pk)
+            self.assertEqual(payload['tick'], 1)
+            self.assertEqual(sorted(payload['changed_fields']), ['num', 'title'])
+        finally:
+            listener.close()
@@ -0,0 +1,194 @@
+from django.test import TestCase, override_settings
+
+from temporal_django.testing import QueryBudgetMixin, statement_shape
+
+from .models import (AnotherTestModel, ManyFieldsModel, Stub, TestModel, TestModelActivity,
+                     TestModelActivityWithDeclaredOptions, TestModelWithDeclaredActivityOptions)
+
+
+# Models tracking 1, 2 and 8 fields, with and without activities
+MODELS = [AnotherTestModel, TestModel, ManyFieldsModel]
+
+
+@override_settings(TEMPORAL_PREPARED_STATEMENTS=True)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Pin the statements every temporal operation runs
+
+    A change to any of these is a change to the number of round trips of that operation, so update them
+    deliberately. Tests run inside a transaction, so saves show savepoints where they would otherwise begin
+    and commit a transaction.
+    """
+
+    def setUp(self):
+        # Prepare the statements of every model on this connection, whatever ran on it before
+        for model in MODELS:
+            self.create(model)
+
+    def create(self, model, ticks=1):
+        obj = self.new(model)
+        for tick in range(1, ticks + 1):
+            obj.title = 'Test %s' % tick
+            obj.save(activity=self.activity(model, tick))
+        return model.objects.get(pk=obj.pk)
+
+    def new(self, model):
+        return model(title='Test', **({'num': 1} if 'num' in model.temporal_options.temporal_fields else {}))
+
+    def activity(self, model, tick):
+        if model.temporal_options.activity_model is None:
+            return None
+        return TestModelActivity(desc='Tick %s' % tick)
+
+    def activity_statements(self, model):
+        if model.temporal_options.activity_model is None:
+            return []
+        return ['INSERT %s' % model.temporal_options.activity_model._meta.db_table]
+
+    def clock_select(self, model):
+        temporal_options = model.temporal_options
+        tables = [temporal_options.clock_model._meta.db_table]
+        if temporal_options.activity_model is not None:
+            tables.append(temporal_options.activity_model._meta.db_table)
+        return 'SELECT %s' % ', '.join(tables)
+
+    def history_tables(self, model):
+        return [model.temporal_options.history_models[field]._meta.db_table
+                for field in model.temporal_options.temporal_fields]
+
+    def test_create(self):
+        """Creating an object writes the object, then its tick and a row per field, then its vclock"""
+        for model in MODELS:
+            with self.subTest(model=model.__name__):
+                obj = self.new(model)
+                table = model._meta.db_table
+                # Django tries to update objects whose primary key is already set by a default first
+                existing_update = ['UPDATE %s' % table] if model._meta.pk.has_default() else []
+                with self.assertStatements(
+                        'SAVEPOINT',
+                        *self.activity_statements(model),
+                        *existing_update,
+                        'INSERT %s' % table,
+                        'SAVEPOINT',
+                        'INSERT %s' % model.temporal_options.clock_model._meta.db_table,
+                        *['INSERT %s' % history_table for history_table in self.history_tables(model)],
+                        'UPDATE %s' % table,
+                        'RELEASE SAVEPOINT',
+                        'RELEASE SAVEPOINT'):
+                    obj.save(activity=self.activity(model, 1))
+
+    def test_update(self):
+        """Updating a field closes its open history row and opens another, however many fields are tracked"""
+        for model in MODELS:
+            with self.subTest(model=model.__name__):
+                obj = self.create(model)
+                obj.title = 'Edited'
+                table = model._meta.db_table
+                title_history_table = model.temporal_options.history_models['title']._meta.db_table
+                with self.assertStatements(
+                        'SAVEPOINT',
+                        *self.activity_statements(model),
+                        'UPDATE %s' % table,
+                        'SAVEPOINT',
+                        'INSERT %s' % model.temporal_options.clock_model._meta.db_table,
+                        'UPDATE %s' % title_history_table,
+                        'INSERT %s' % title_history_table,
+                        'UPDATE %s' % table,
+                        'RELEASE SAVEPOINT',
+                        'RELEASE SAVEPOINT'):
+                    obj.save(activity=self.activity(model, 2))
+
+    def test_no_op_save(self):
+        """Saving without changes records no tick; the activity is saved before the changes are known"""
+        for model in MODELS:
+            with self.subTest(model=model.__name__):
+                obj = self.create(model)
+                with self.assertStatements(
+                        'SAVEPOINT',
+                        *self.activity_statements(model),
+                        'UPDATE %s' % model._meta.db_table,
+                        'SAVEPOINT',
+                        'RELEASE SAVEPOINT',
+                        'RELEASE SAVEPOINT'):
+                    obj.save(activity=self.activity(model, 2))
+
+    def test_timeline(self):
+        """A timeline reads each history table and the clock once, however many ticks there are"""
+        for model in MODELS:
+            for ticks in (1, 5):
+                with self.subTest(model=model.__name__, ticks=ticks):
+                    obj = self.create(model, ticks)
+                    with self.assertStatements(
+                            *['SELECT %s' % history_table for history_table in self.history_tables(model)],
+                            self.clock_select(model)):
+                        self.assertEqual(len(obj.temporal_timeline()), ticks)
+
+                    clock_table = model.temporal_options.clock_model._meta.db_table
+                    with self.assertStatements(
+                            *['SELECT %s' % history_table for history_table in self.history_tables(model)],
+                            'SELECT %s' % clock_table):
+                        self.assertEqual(len(obj.temporal_timeline(lightweight=True)), ticks)
+
+    def test_first_and_latest_tick(self):
+        """The first and latest ticks are one query each, with their activity, and are then cached"""
+        for model in MODELS:
+            with self.subTest(model=model.__name__):
+                obj = self.create(model, ticks=3)
+                with self.assertStatements(self.clock_select(model)):
+                    self.assertEqual(obj.first_tick().tick, 1)
+                with self.assertStatements(self.clock_select(model)):
+                    self.assertEqual(obj.latest_tick().tick, 3)
+                with self.assertStatements():
+                    obj.first_tick()
+                    obj.latest_tick()
+                    obj.date_modified()
+
+    def test_activity_prefetch(self):
+        """Activities are loaded with their declared relations in a fixed number of queries"""
+        stub = Stub.objects.create(title='Stub')
+        obj = TestModelWithDeclaredActivityOptions(title='Test', num=0)
+        for tick in range(1, 6):
+            obj.num = tick
+            activity = TestModelActivityWithDeclaredOptions(desc='Tick %s' % tick, stub=stub)
+            obj.save(activity=activity)
+            activity.tags.add(stub)
+        obj = TestModelWithDeclaredActivityOptions.objects.get(pk=obj.pk)
+
+        clock_select = 'SELECT tests_testmodelwithdeclaredactivityoptions_clock, ' \
+                       'tests_testmodelactivitywithdeclaredoptions, tests_stub'
+        tags_select = 'SELECT tests_stub, tests_testmodelactivitywithdeclaredoptions_tags'
+        with self.assertStatements(
+                'SELECT tests_testmodelwithdeclaredactivityoptions_history_title',
+                'SELECT tests_testmodelwithdeclaredactivityoptions_history_num',
+                clock_select,
+                tags_select):
+            timeline = obj.temporal_timeline()
+        with self.assertStatements():
+            self.assertEqual([[tag.title for tag in entry.clock.activity.tags.all()] for entry in timeline],
+                             [['Stub']] * 5)
+
+        with self.assertStatements(clock_select, tags_select):
+            obj.latest_tick()
+
+
+class StatementShapeTests(TestCase):
+    def test_shapes(self):
+        self.assertEqual(statement_shape('SAVEPOINT "s1_x2"'), 'SAVEPOINT')
+        self.assertEqual(statement_shape('RELEASE SAVEPOINT "s1_x2"'), 'RELEASE SAVEPOINT')
+        self.assertEqual(
+            statement_shape('SELECT "a"."id" FROM "a" INNER JOIN "b" ON ("a"."b_id" = "b"."id") '
+                            'WHERE "a"."id" IN (SELECT "id" FROM "a")'),
+            'SELECT a, b')
+        self.assertEqual(statement_shape('INSERT INTO "a" ("id") SELECT * FROM unnest(%s)'), 'INSERT a')
+
+    def test_prepared_statements(self):
+        self.assertEqual(
+            statement_shape('PREPARE temporal_1 AS INSERT INTO "a" VALUES ($1); EXECUTE temporal_1 (1)'),
+            'INSERT a')
+        self.assertEqual(statement_shape('EXECUTE temporal_1 (1)', {'temporal_1': 'UPDATE "a" SET x = $1'}),
+                         'UPDATE a')
+
+    def test_server_side_cursors(self):
+        self.assertEqual(
+            statement_shape('DECLARE "_django_curs_1" NO SCROLL CURSOR WITH HOLD FOR SELECT "id" FROM "a"'),
+            'SELECT a')
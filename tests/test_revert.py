@@ -0,0 +1,99 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from freezegun import freeze_time
+
+from temporal_django.batch import temporal_batch
+
+from .models import TestModel, TestModelActivity, NoActivityModel
+
+
+class RevertTests(TestCase):
+    def test_revert_instance(self):
+        """Reverting an object should restore its values as of a tick or timestamp as a new tick"""
+        obj = TestModel(title='Test', num=1)
+        with freeze_time('2017-11-01'):
+            obj.save(activity=TestModelActivity(desc='Create the object'))
+        with freeze_time('2017-11-02'):
+            obj.title = 'Test 2'
+            obj.save(activity=TestModelActivity(desc='Edit the title'))
+        with freeze_time('2017-11-03'):
+            obj.num = 3
+            obj.save(activity=TestModelActivity(desc='Edit the number'))
+
+        obj.revert_to(datetime.datetime(2017, 11, 2, 12),
+                      activity=TestModelActivity(desc='Revert the number'))
+        saved_obj = TestModel.objects.get(pk=obj.pk)
+        self.assertEqual((saved_obj.title, saved_obj.num, saved_obj.vclock), ('Test 2', 1, 4))
+        timeline = saved_obj.temporal_timeline()
+        self.assertEqual(timeline[3].clock.activity.desc, 'Revert the number')
+        self.assertEqual(set(timeline[3].changed_fields), {'num'})
+
+        obj.revert_to(1, activity=TestModelActivity(desc='Revert to the start'))
+        saved_obj = TestModel.objects.get(pk=obj.pk)
+        self.assertEqual((saved_obj.title, saved_obj.num, saved_obj.vclock), ('Test', 1, 5))
+
+        with self.assertRaisesMessage(ValueError, 'did not exist'):
+            obj.revert_to(datetime.datetime(2017, 10, 1))
+
+    def test_revert_queryset(self):
+        """Reverting a queryset should restore every object that existed and changed since then"""
+        with freeze_time('2017-11-01'):
+            objs = [NoActivityModel(title='Test %s' % i, num=i) for i in range(6)]
+            for obj in objs:
+                obj.save()
+        with freeze_time('2017-11-02'):
+            with temporal_batch():
+                for obj in objs[:4]:
+                    obj.title = 'Bad load'
+                    obj.save()
+            late_obj = NoActivityModel(title='Late', num=10)
+            late_obj.save()
+
+        reverted = NoActivityModel.objects.all().revert_to(datetime.datetime(2017, 11, 1, 12))
+        self.assertEqual(reverted, 4)
+
+        for i, obj in enumerate(objs):
+            saved_obj = NoActivityModel.objects.get(pk=obj.pk)
+            self.assertEqual((saved_obj.title, saved_obj.num), ('Test %s' % i, i))
+            self.assertEqual(saved_obj.vclock, 3 if i < 4 else 1)
+            current_title = saved_obj.title_history.get(vclock__contains=saved_obj.vclock)
+            self.assertEqual(current_title.title, 'Test %s' % i)
+
+        late_obj = NoActivityModel.objects.get(pk=late_obj.pk)
+        self.assertEqual((late_obj.title, late_obj.vclock), ('Late', 1))
+
+    def test_revert_queryset_with_activity(self):
+        """Every reverted object should share the activity, which is saved once"""
+        objs = [TestModel(title='Test %s' % i, num=i) for i in range(3)]
+        for obj in objs:
+            obj.save(activity=TestModelActivity(desc='Create the object'))
+            obj.title = 'Edited'
+            obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+        activity = TestModelActivity(desc='Revert the edits')
+        self.assertEqual(TestModel.objects.filter(title='Edited').revert_to(1, activity=activity), 3)
+
+        for obj in TestModel.objects.all():
+            self.assertEqual(obj.latest_tick().activity, activity)
+            self.assertTrue(obj.title.startswith('Test'))
+
+    def test_revert_queryset_statements(self):
+        """The number of statements should not depend on the number of objects reverted"""
+        def revert_statements(count):
+            objs = [NoActivityModel(title='Test', num=i) for i in range(count)]
+            for obj in objs:
+                obj.save()
+            with temporal_batch():
+                for obj in objs:
+                    obj.title = 'Edited'
+                    obj.save()
+
+            with CaptureQueriesContext(connection) as queries:
+                reverted = NoActivityModel.objects.filter(pk__in=[obj.pk for obj in objs]).revert_to(1)
+            self.assertEqual(reverted, count)
+            return len(queries.captured_queries)
+
+        self.assertEqual(revert_statements(2), revert_statements(20))
@@ -0,0 +1,110 @@
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from temporal_django.batch import temporal_batch
+
+from .models import NoActivityModel, OutboxModel, TestModel, TestModelActivity
+
+
+@override_settings(TEMPORAL_READ_DATABASE='replica')
+class ReadRoutingTests(TransactionTestCase):
+    def test_history_read_from_replica(self):
+        """Timelines, ticks and history managers should be read from the read database"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+        obj.title = 'Test 2'
+        obj.save(activity=TestModelActivity(desc='Edit the object'))
+        obj = TestModel.objects.get(pk=obj.pk)
+
+        with CaptureQueriesContext(connections['default']) as primary_queries:
+            with CaptureQueriesContext(connections['replica']) as replica_queries:
+                timeline = obj.temporal_timeline()
+                first_tick, latest_tick = obj.first_tick(), obj.latest_tick()
+                snapshot = obj.temporal_as_of(1)
+                titles = list(obj.title_history.order_by('vclock').values_list('title', flat=True))
+
+        self.assertEqual(len(primary_queries), 0)
+        self.assertEqual(len(replica_queries), 10)
+        self.assertEqual([entry.clock.tick for entry in timeline], [1, 2])
+        self.assertEqual((first_tick.tick, latest_tick.tick), (1, 2))
+        self.assertEqual(latest_tick.activity.desc, 'Edit the object')
+        self.assertEqual(snapshot.values['title'], 'Test')
+        self.assertEqual(titles, ['Test', 'Test 2'])
+
+    def test_fall_back_when_replica_lags(self):
+        """Ticks the read database hasn't replayed yet should be read from the primary"""
+        obj = NoActivityModel(title='Test', num=1)
+        obj.save()
+
+        # Changes in an open transaction are invisible to the replica's connection, just like replication lag
+        with transaction.atomic():
+            obj.title = 'Test 2'
+            obj.save()
+            loaded_obj = NoActivityModel.objects.get(pk=obj.pk)
+
+            self.assertEqual(loaded_obj.latest_tick().tick, 2)
+            self.assertEqual(len(loaded_obj.temporal_timeline()), 2)
+            self.assertEqual(loaded_obj.temporal_as_of(2).values['title'], 'Test 2')
+
+            # Closed history the replica already has is still read from it
+            with CaptureQueriesContext(connections['default']) as primary_queries:
+                self.assertEqual(len(loaded_obj.temporal_timeline(until_tick=1)), 1)
+                self.assertEqual(loaded_obj.first_tick().tick, 1)
+            self.assertEqual(len(primary_queries), 0)
+
+    def test_history_lookups(self):
+        """Filtering on history should still work when history is read from another database"""
+        obj = NoActivityModel(title='Test', num=1)
+        obj.save()
+        obj.title = 'Test 2'
+        obj.save()
+
+        self.assertEqual(list(NoActivityModel.objects.filter(title__ever='Test')), [obj])
+
+
+class WriteRouter:
+    """Sends writes of OutboxModel, its activities and its history to the replica alias"""
+
+    def db_for_write(self, model, **hints):
+        options = OutboxModel.temporal_options
+        if model in (OutboxModel, TestModelActivity, options.clock_model, options.outbox_model) or \
+                model in options.history_models.values():
+            return 'replica'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same database
+        return True
+
+
+@override_settings(DATABASE_ROUTERS=[WriteRouter()])
+class WriteRoutingTests(TransactionTestCase):
+    def test_history_written_with_object(self):
+        """Clock, history and outbox rows should be written to the database the object is written to"""
+        options = OutboxModel.temporal_options
+        models = [options.clock_model, options.outbox_model] + list(options.history_models.values())
+        tables = [model._meta.db_table for model in models]
+
+        with CaptureQueriesContext(connections['default']) as primary_queries:
+            with CaptureQueriesContext(connections['replica']) as replica_queries:
+                obj = OutboxModel(title='Test', num=1)
+                obj.save(activity=TestModelActivity(desc='Create the object'))
+                obj.title = 'Test 2'
+                obj.save(activity=TestModelActivity(desc='Edit the object'))
+                with temporal_batch(TestModelActivity(desc='Edit in a batch')):
+                    obj.num = 2
+                    obj.save()
+                obj.delete(activity=TestModelActivity(desc='Delete the object'))
+
+        self.assertFalse([query['sql'] for query in primary_queries.captured_queries
+                          if any(table in query['sql'] for table in tables)])
+        for table in tables:
+            self.assertTrue([query for query in replica_queries.captured_queries
+                             if table in query['sql']], table)
+
+        obj = OutboxModel.all_objects.get(pk=obj.pk)
+        self.assertEqual((obj.vclock, obj.deleted_tick), (4, 4))
+        self.assertEqual([entry.clock.activity.desc for entry in obj.temporal_timeline()],
+                         ['Create the object', 'Edit the object', 'Edit in a batch', 'Delete the object'])
+        self.assertEqual(options.outbox_model.objects.filter(entity=obj).count(), 4)
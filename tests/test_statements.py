@@ -0,0 +1,52 @@
+from django.db import DataError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from temporal_django.statements import execute_prepared
+
+from .models import NoActivityModel
+
+
+class PreparedStatementTests(TestCase):
+    def _save_queries(self, obj):
+        with CaptureQueriesContext(connection) as queries:
+            obj.save()
+        return [query['sql'] for query in queries.captured_queries]
+
+    @override_settings(TEMPORAL_PREPARED_STATEMENTS=True)
+    def test_statements_are_reused(self):
+        """The clock and history statements should only be prepared once per connection"""
+        obj = NoActivityModel(title='Test', num=1)
+        obj.save()
+        obj.title = 'Test 2'
+        obj.save()
+
+        obj.title = 'Test 3'
+        queries = self._save_queries(obj)
+        self.assertFalse([sql for sql in queries if 'PREPARE' in sql])
+        self.assertEqual(len([sql for sql in queries if sql.startswith('EXECUTE temporal_')]), 3)
+
+        saved_obj = NoActivityModel.objects.get(pk=obj.pk)
+        self.assertEqual(saved_obj.vclock, 3)
+        self.assertEqual(saved_obj.title_history.get(vclock__contains=2).title, 'Test 2')
+        self.assertEqual(saved_obj.title_history.get(vclock__contains=3).title, 'Test 3')
+        self.assertEqual(saved_obj.latest_tick().tick, 3)
+
+    @override_settings(TEMPORAL_PREPARED_STATEMENTS=True)
+    def test_failed_execution(self):
+        """A statement should still be usable after its first execution fails"""
+        with self.assertRaises(DataError):
+            with transaction.atomic():
+                execute_prepared('SELECT %s::integer + 1', ['not a number'], 'default')
+
+        # The failed statement was prepared anyway, so it is executed without preparing it again
+        with CaptureQueriesContext(connection) as queries:
+            execute_prepared('SELECT %s::integer + 1', ['1'], 'default')
+        self.assertTrue(queries.captured_queries[-1]['sql'].startswith('EXECUTE temporal_'))
+
+    def test_off_by_default(self):
+        """Plain SQL should be sent unless prepared statements are turned on"""
+        obj = NoActivityModel(title='Test', num=1)
+        queries = self._save_queries(obj)
+        self.assertFalse([sql for sql in queries if 'PREPARE' in sql or 'EXECUTE' in sql])
+        self.assertEqual(NoActivityModel.objects.get(pk=obj.pk).title_history.get().title, 'Test')
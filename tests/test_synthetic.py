@@ -0,0 +1,153 @@
+import datetime
+import decimal
+import io
+import uuid
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from temporal_django.synthetic import generate_history
+
+from .models import (AddressModel, InheritingModel, ManyFieldsModel, NaturalKeyModel, NoActivityModel,
+                     TestModel, TestModelActivity, TestModelWithActivityWithRelationship)
+
+
+class SyntheticHistoryTests(TestCase):
+    def assertValidHistory(self, obj):
+        """Every field's ranges should start at its first tick and follow each other up to an open range"""
+        for field, history_model in type(obj).temporal_options.history_models.items():
+            rows = list(history_model.objects.filter(entity=obj).order_by('vclock'))
+            self.assertEqual(rows[0].vclock.lower, 1)
+            for row, next_row in zip(rows, rows[1:]):
+                self.assertEqual(row.vclock.upper, next_row.vclock.lower)
+                self.assertEqual(row.effective.upper, next_row.effective.lower)
+                self.assertLess(row.effective.lower, row.effective.upper)
+            self.assertIsNone(rows[-1].vclock.upper)
+            self.assertIsNone(rows[-1].effective.upper)
+            self.assertEqual(getattr(rows[-1], field), getattr(obj, field))
+
+    def test_generate_history(self):
+        """The command should create objects with valid history that can be read and saved afterwards"""
+        out = io.StringIO()
+        call_command('temporal_generate_history', 'tests.TestModel', entities=3, ticks=5, seed=1,
+                     start='2017-11-01', stdout=out)
+        self.assertIn('Created 3 tests.TestModel objects with 15 ticks', out.getvalue())
+
+        self.assertEqual(TestModel.objects.count(), 3)
+        for obj in TestModel.objects.all():
+            self.assertEqual(obj.vclock, 5)
+            self.assertValidHistory(obj)
+
+            timeline = obj.temporal_timeline()
+            self.assertEqual([entry.clock.tick for entry in timeline], [1, 2, 3, 4, 5])
+            self.assertEqual(set(timeline[0].changed_fields), {'title', 'num'})
+            self.assertTrue(all(entry.changed_fields for entry in timeline))
+            self.assertGreaterEqual(timeline[0].clock.timestamp, datetime.datetime(2017, 11, 1))
+            self.assertEqual(obj.temporal_as_of(5).values, {'title': obj.title, 'num': obj.num})
+
+            obj.title = 'Saved afterwards'
+            obj.save(activity=TestModelActivity(desc='Edit a synthetic object'))
+            self.assertEqual(obj.latest_tick().tick, 6)
+
+    def test_same_seed(self):
+        """The same seed should generate the same values again, for new objects"""
+        for _ in range(2):
+            generate_history(TestModel, entities=2, ticks=3, seed=5, start=datetime.datetime(2017, 11, 1))
+        self.assertEqual(TestModel.objects.count(), 4)
+
+        # Each object's history is generated twice
+        title_history = TestModel.temporal_options.history_models['title']
+        histories = sorted(
+            list(title_history.objects.filter(entity=obj).order_by('vclock').values_list('title', 'vclock'))
+            for obj in TestModel.objects.all()
+        )
+        self.assertEqual(histories[::2], histories[1::2])
+
+    def test_change_rates(self):
+        """Fields should change at their rates, and objects with serial keys should use their sequence"""
+        generated = generate_history(NoActivityModel, entities=4, ticks=10, change_rates={'num': 0},
+                                     seed=2, chunk_size=3)
+        self.assertEqual(generated.history_rows, 4 * (10 + 1))
+
+        num_history = NoActivityModel.temporal_options.history_models['num']
+        for obj in NoActivityModel.objects.all():
+            self.assertEqual(num_history.objects.filter(entity=obj).count(), 1)
+            self.assertValidHistory(obj)
+
+        obj = NoActivityModel(title='Saved afterwards', num=1)
+        obj.save()
+        self.assertEqual(NoActivityModel.objects.count(), 5)
+
+    def test_field_types(self):
+        """Values of every supported type should be written and read back as the same values"""
+        generate_history(ManyFieldsModel, entities=3, ticks=4, seed=3)
+
+        for obj in ManyFieldsModel.objects.all():
+            self.assertValidHistory(obj)
+            self.assertIn(obj.status, ['NEW', 'OPEN', 'CLOSED'])
+            self.assertIsInstance(obj.amount, decimal.Decimal)
+            self.assertIsInstance(obj.flag, bool)
+            self.assertIsInstance(obj.due, datetime.date)
+            self.assertIsInstance(obj.score, float)
+            self.assertIsInstance(obj.ref, uuid.UUID)
+            self.assertEqual(set(obj.data), {'field', 'counter'})
+            self.assertIsInstance(obj.seen, datetime.datetime)
+            self.assertIsNone(obj.address)
+
+            # Untracked fields get their default, nothing if they are nullable, or a synthetic value
+            self.assertEqual(obj.priority, 3)
+            self.assertIsNone(obj.remarks)
+            self.assertTrue(obj.label.startswith('label-'))
+
+            self.assertEqual(obj.temporal_as_of(4).values['data'], obj.data)
+
+    def test_no_change_rates(self):
+        """Every tick should still change a field when no field is ever meant to change"""
+        generated = generate_history(NoActivityModel, entities=2, ticks=3, default_change_rate=0, seed=4)
+        self.assertEqual(generated.history_rows, 2 * (2 + 2))
+        for obj in NoActivityModel.objects.all():
+            self.assertTrue(all(entry.changed_fields for entry in obj.temporal_timeline()))
+
+    @override_settings(USE_TZ=True)
+    def test_time_zones(self):
+        """Naive start times should be made aware when time zones are enabled"""
+        call_command('temporal_generate_history', 'tests.NoActivityModel', entities=1, ticks=2,
+                     start='2017-11-01', stdout=io.StringIO())
+        generate_history(NoActivityModel, entities=1, ticks=2, start=datetime.datetime(2017, 11, 1))
+        for obj in NoActivityModel.objects.all():
+            self.assertGreaterEqual(obj.first_tick().timestamp,
+                                    timezone.make_aware(datetime.datetime(2017, 11, 1)))
+
+    def test_unsupported_models(self):
+        """Models whose history can't be generated should be reported before anything is written"""
+        with self.assertRaisesMessage(ValueError, 'NaturalKeyModel, which has a CharField primary key'):
+            generate_history(NaturalKeyModel, entities=1, ticks=1)
+        with self.assertRaisesMessage(ValueError, 'AddressModel.address, a GenericIPAddressField'):
+            generate_history(AddressModel, entities=1, ticks=1)
+        with self.assertRaisesMessage(ValueError, 'InheritingModel, which inherits from another concrete'):
+            generate_history(InheritingModel, entities=1, ticks=1)
+        self.assertFalse(NaturalKeyModel.all_objects.exists())
+        self.assertFalse(AddressModel.all_objects.exists())
+
+    def test_invalid_arguments(self):
+        """Bad arguments and models that values can't be generated for should be reported"""
+        with self.assertRaisesMessage(CommandError, "'colour' is not a tracked field"):
+            call_command('temporal_generate_history', 'tests.TestModel', entities=1, ticks=1,
+                         change_rates=['colour=0.5'])
+        with self.assertRaisesMessage(CommandError, "'2' is not a change rate"):
+            call_command('temporal_generate_history', 'tests.TestModel', entities=1, ticks=1,
+                         change_rates=['num=2'])
+        with self.assertRaisesMessage(CommandError, 'needs activities of TestModelActivityWithRelationship'):
+            call_command('temporal_generate_history', 'tests.TestModelWithActivityWithRelationship',
+                         entities=1, ticks=1)
+        self.assertFalse(TestModelWithActivityWithRelationship.all_objects.exists())
+
+        with self.assertRaisesMessage(CommandError, "Unknown model 'tests.Nothing'"):
+            call_command('temporal_generate_history', 'tests.Nothing')
+        with self.assertRaisesMessage(CommandError, "Unknown model 'nothing'"):
+            call_command('temporal_generate_history', 'nothing')
+        with self.assertRaisesMessage(CommandError, '--entities and --ticks must be at least 1'):
+            call_command('temporal_generate_history', 'tests.TestModel', entities=0)
+        with self.assertRaisesMessage(CommandError, "'often' is not a change rate"):
+            call_command('temporal_generate_history', 'tests.TestModel', change_rates=['num=often'])
@@ -0,0 +1,140 @@
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test import TestCase
+
+from temporal_django.models import LightweightTimelineTick
+
+from .models import NoActivityModel, TestModel, TestModelActivity
+
+
+class PaginatedTimelineTests(TestCase):
+    def setUp(self):
+        self.obj = NoActivityModel(title='Title 1', num=1)
+        self.obj.save()
+
+        # Ticks 2-10 alternate between changing the title and the number
+        for tick in range(2, 11):
+            if tick % 2:
+                self.obj.title = 'Title %s' % tick
+            else:
+                self.obj.num = tick
+            self.obj.save()
+
+    def test_keyset_pages(self):
+        """Pages of the timeline should follow on from each other by tick"""
+        with self.assertNumQueries(3):  # One query for the clock page, one for each field
+            page = self.obj.temporal_timeline(limit=4)
+
+        self.assertEqual([t.clock.tick for t in page], [1, 2, 3, 4])
+
+        page = self.obj.temporal_timeline(since_tick=page[-1].clock.tick + 1, limit=4)
+        self.assertEqual([t.clock.tick for t in page], [5, 6, 7, 8])
+        self.assertEqual(page[0].changed_fields['title'].value, 'Title 5')
+        self.assertNotIn('num', page[0].changed_fields)
+        self.assertEqual(page[1].changed_fields['num'].value, 6)
+        self.assertNotIn('title', page[1].changed_fields)
+
+        page = self.obj.temporal_timeline(since_tick=9, limit=4)
+        self.assertEqual([t.clock.tick for t in page], [9, 10])
+
+        self.assertEqual(self.obj.temporal_timeline(since_tick=11, limit=4), [])
+
+    def test_reverse_pages(self):
+        """Reversed pages should return the latest ticks first"""
+        page = self.obj.temporal_timeline(limit=3, reverse=True)
+        self.assertEqual([t.clock.tick for t in page], [10, 9, 8])
+        self.assertEqual(page[0].changed_fields['num'].value, 10)
+        self.assertEqual(page[1].changed_fields['title'].value, 'Title 9')
+
+        page = self.obj.temporal_timeline(until_tick=page[-1].clock.tick - 1, limit=3, reverse=True)
+        self.assertEqual([t.clock.tick for t in page], [7, 6, 5])
+        self.assertEqual(page[2].changed_fields, {'title': ('Title 5', 'title')})
+
+    def test_tick_range(self):
+        """A range of ticks should include the changes made at both ends"""
+        timeline = self.obj.temporal_timeline(since_tick=3, until_tick=4)
+
+        self.assertEqual([t.clock.tick for t in timeline], [3, 4])
+        self.assertEqual(timeline[0].changed_fields['title'].value, 'Title 3')
+        self.assertEqual(timeline[1].changed_fields['num'].value, 4)
+
+    def test_streaming_timeline(self):
+        """The generator variant should produce the same timeline as the list"""
+        with self.assertNumQueries(3):
+            streamed = list(self.obj.iter_temporal_timeline())
+
+        self.assertEqual(streamed, self.obj.temporal_timeline())
+        self.assertEqual(len(streamed), 10)
+        self.assertEqual(streamed[0].changed_fields['title'].value, 'Title 1')
+        self.assertEqual(streamed[0].changed_fields['num'].value, 1)
+
+    def test_pages_read_from_index(self):
+        """Pages of UUID-keyed objects should be read from the index on entity and first tick"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+        history_table = TestModel.temporal_options.history_models['title']._meta.db_table
+
+        for kwargs in ({'since_tick': 2, 'until_tick': 5}, {'since_tick': None, 'until_tick': 5}):
+            sql, params = obj._temporal_history_query('title', reverse=False, using='default', **kwargs) \
+                .query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            self.assertIn('%s_entity_vclock' % history_table, plan, kwargs)
+
+
+class LightweightTimelineTests(TestCase):
+    def _as_lightweight(self, timeline, activity=True):
+        return [
+            LightweightTimelineTick(
+                tick=entry.clock.tick,
+                timestamp=entry.clock.timestamp,
+                activity_id=entry.clock.activity_id if activity else None,
+                changed_fields={field: history.value for field, history in entry.changed_fields.items()},
+            )
+            for entry in timeline
+        ]
+
+    def test_matches_timeline(self):
+        """The lightweight timeline should hold the same ticks and values as the full one"""
+        obj = TestModel(title='Test', num=1)
+        obj.save(activity=TestModelActivity(desc='Create the object'))
+        for i in range(2, 6):
+            obj.num = i
+            obj.save(activity=TestModelActivity(desc='Edit the object'))
+
+        instances = []
+
+        def record_instance(sender, instance, **kwargs):
+            instances.append(instance)
+
+        post_init.connect(record_instance)
+        try:
+            with self.assertNumQueries(3):  # One query for the clock, one for each field
+                timeline = obj.temporal_timeline(lightweight=True)
+        finally:
+            post_init.disconnect(record_instance)
+
+        self.assertEqual(instances, [])
+        self.assertEqual(timeline, self._as_lightweight(obj.temporal_timeline()))
+        self.assertEqual(timeline[0].changed_fields, {'title': 'Test', 'num': 1})
+        self.assertEqual(timeline[4].as_dict()['changed_fields'], {'num': 5})
+        self.assertFalse(hasattr(timeline[0], '__dict__'))
+
+        self.assertEqual(obj.temporal_timeline(since_tick=2, limit=2, reverse=True, lightweight=True),
+                         self._as_lightweight(obj.temporal_timeline(since_tick=2, limit=2, reverse=True)))
+
+    def test_no_activity(self):
+        """The lightweight timeline should work for models without an activity"""
+        obj = NoActivityModel(title='Test', num=1)
+        obj.save()
+        obj.title = 'Test 2'
+        obj.save()
+
+        timeline = obj.temporal_timeline(lightweight=True)
+        self.assertEqual(timeline, self._as_lightweight(obj.temporal_timeline(), activity=False))
+        self.assertEqual(repr(timeline[1]),
+                         'LightweightTimelineTick(tick=2, timestamp=%r, activity_id=None, '
+                         "changed_fields={'title': 'Test 2'})" % timeline[1].timestamp)
+        self.assertIsNone(timeline[1].activity_id)